@@ -88,7 +88,7 @@ class AdClickAdmin(admin.ModelAdmin):
     list_display = ['advertisement', 'ip_address', 'user', 'timestamp']
     list_filter = ['timestamp', 'advertisement__position']
     search_fields = ['advertisement__title', 'ip_address']
-    readonly_fields = ['advertisement', 'ip_address', 'user_agent', 'referer', 'timestamp', 'user']
+    readonly_fields = ['advertisement', 'ip_address', 'visitor_id', 'user_agent', 'referer', 'timestamp', 'user']
     
     def has_add_permission(self, request):
         return False
@@ -98,7 +98,7 @@ class AdImpressionAdmin(admin.ModelAdmin):
     list_display = ['advertisement', 'ip_address', 'user', 'page_url', 'timestamp']
     list_filter = ['timestamp', 'advertisement__position']
     search_fields = ['advertisement__title', 'ip_address', 'page_url']
-    readonly_fields = ['advertisement', 'ip_address', 'page_url', 'timestamp', 'user']
+    readonly_fields = ['advertisement', 'ip_address', 'visitor_id', 'page_url', 'timestamp', 'user']
     
     def has_add_permission(self, request):
         return False
\ No newline at end of file
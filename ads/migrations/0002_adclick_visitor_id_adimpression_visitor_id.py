@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2026-10-17 18:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ads', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='adclick',
+            name='visitor_id',
+            field=models.CharField(blank=True, max_length=40),
+        ),
+        migrations.AddField(
+            model_name='adimpression',
+            name='visitor_id',
+            field=models.CharField(blank=True, max_length=40),
+        ),
+    ]
@@ -117,6 +117,7 @@ class AdClick(models.Model):
     """Track individual ad clicks for analytics"""
     advertisement = models.ForeignKey(Advertisement, on_delete=models.CASCADE)
     ip_address = models.GenericIPAddressField()
+    visitor_id = models.CharField(max_length=40, blank=True)  # Cookieless id, see blogs/visitor_id.py
     user_agent = models.TextField()
     referer = models.URLField(blank=True)
     timestamp = models.DateTimeField(auto_now_add=True)
@@ -129,6 +130,7 @@ class AdImpression(models.Model):
     """Track ad impressions"""
     advertisement = models.ForeignKey(Advertisement, on_delete=models.CASCADE)
     ip_address = models.GenericIPAddressField()
+    visitor_id = models.CharField(max_length=40, blank=True)  # Cookieless id, see blogs/visitor_id.py
     page_url = models.URLField()
     timestamp = models.DateTimeField(auto_now_add=True)
     user = models.ForeignKey('auth.User', on_delete=models.SET_NULL, null=True, blank=True)
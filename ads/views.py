@@ -7,12 +7,18 @@ from django.utils import timezone
 from django.contrib.admin.views.decorators import staff_member_required
 from django.db.models import Sum, Count, Q
 from .models import Advertisement, AdClick, AdImpression
+from blogs.bot_detection import is_bot
+from blogs.visitor_id import visitor_ids
 import json
 from datetime import datetime, timedelta
 
 @never_cache
 def track_impression(request, ad_id):
     """Track ad impression via pixel"""
+    # Crawlers still get the pixel, but are not counted
+    if is_bot(request):
+        return gif_pixel_response()
+
     try:
         ad = Advertisement.objects.get(pk=ad_id, is_active=True)
         
@@ -20,6 +26,7 @@ def track_impression(request, ad_id):
         AdImpression.objects.create(
             advertisement=ad,
             ip_address=get_client_ip(request),
+            visitor_id=visitor_ids(request).visitor_id,
             page_url=request.META.get('HTTP_REFERER', ''),
             user=request.user if request.user.is_authenticated else None
         )
@@ -30,7 +37,10 @@ def track_impression(request, ad_id):
     except Advertisement.DoesNotExist:
         pass
     
-    # Return 1x1 transparent pixel
+    return gif_pixel_response()
+
+def gif_pixel_response():
+    """Return 1x1 transparent pixel"""
     pixel_data = b'\x47\x49\x46\x38\x39\x61\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\x00\x00\x00\x21\xF9\x04\x01\x00\x00\x00\x00\x2C\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02\x04\x01\x00\x3B'
     response = HttpResponse(pixel_data, content_type='image/gif')
     response['Cache-Control'] = 'no-cache, no-store, must-revalidate'
@@ -44,10 +54,13 @@ def track_click(request, ad_id):
     try:
         ad = get_object_or_404(Advertisement, pk=ad_id, is_active=True)
         
-        # Create click record
+        # Create click record (crawlers following the link are only redirected)
+        if is_bot(request):
+            return redirect(ad.click_url or '/')
         AdClick.objects.create(
             advertisement=ad,
             ip_address=get_client_ip(request),
+            visitor_id=visitor_ids(request).visitor_id,
             user_agent=request.META.get('HTTP_USER_AGENT', ''),
             referer=request.META.get('HTTP_REFERER', ''),
             user=request.user if request.user.is_authenticated else None
@@ -122,7 +135,7 @@ def ad_analytics(request):
 @csrf_exempt
 def ad_ajax_impression(request):
     """AJAX endpoint for impression tracking"""
-    if request.method == 'POST':
+    if request.method == 'POST' and not is_bot(request):
         try:
             data = json.loads(request.body)
             ad_id = data.get('ad_id')
@@ -132,6 +145,7 @@ def ad_ajax_impression(request):
             AdImpression.objects.create(
                 advertisement=ad,
                 ip_address=get_client_ip(request),
+                visitor_id=visitor_ids(request).visitor_id,
                 page_url=data.get('page_url', ''),
                 user=request.user if request.user.is_authenticated else None
             )
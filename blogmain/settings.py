@@ -230,7 +230,13 @@ else:
             'BACKEND': 'django.core.cache.backends.redis.RedisCache',
             'LOCATION': 'redis://127.0.0.1:6379/3',
             'TIMEOUT': 3600,  # 1 hour
-        }
+        },
+        'linked_bodies': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            # Own DB: REDIS_URL (DB 4) holds live counters and buffers a cache clear() must not touch
+            'LOCATION': 'redis://127.0.0.1:6379/5',
+            'TIMEOUT': 7 * 86400,
+        },
     }
 
 # Cache middleware settings
@@ -560,6 +566,177 @@ PERFORMANCE_SETTINGS = {
     'PRELOAD_CRITICAL_RESOURCES': True,
 }
 
+# Background Jobs (featured-image derivatives, video metadata)
+# Drained by `python manage.py run_worker`
+BACKGROUND_JOBS = {
+    'ASYNC': True,  # False = process inline in the request that saves the post
+    'WORKERS': 2,  # Processes per run_worker instance
+    'MAX_ATTEMPTS': 3,
+    'RETRY_BACKOFF': 30,  # Seconds, doubled on each retry
+    'LOCK_TIMEOUT': 300,  # Seconds without a heartbeat before a running job is considered abandoned
+    'HEARTBEAT_INTERVAL': 60,  # Seconds between locked_at refreshes while a job runs (well under LOCK_TIMEOUT)
+    'POLL_INTERVAL': 5,  # Seconds between polls when the queue is empty
+}
+
+# Redis used directly by the write-behind counters and buffers (not the cache)
+REDIS_URL = config('REDIS_URL', default='redis://127.0.0.1:6379/4')
+
+# View counting (blogs/view_counter.py)
+# 'redis': HINCRBY per view, flushed to Blog.views by `python manage.py flush_view_counts`
+# (or the run_worker loop). 'db': atomic UPDATE per view, no Redis needed.
+VIEW_COUNTER = {
+    'BACKEND': 'db' if DEBUG else 'redis',
+    'FLUSH_INTERVAL': 60,  # Seconds between flushes
+    'FLUSH_BATCH_SIZE': 500,  # Posts per UPDATE ... CASE statement
+}
+
+# Auto-link keywords (blogs/keyword_index.py): one Aho-Corasick automaton over
+# every published post's SEO keywords, title and tags, kept per process and
+# rebuilt when a signal bumps the shared version and the keyword set changed.
+KEYWORD_INDEX = {
+    'CHECK_SECONDS': 10,  # How often web processes check the shared version
+}
+
+# Auto-linked article bodies (blogs/linked_body.py), keyed by post, body hash,
+# related posts and a link-graph version that publishing or editing any post
+# bumps. Prefill with `python manage.py warm_linked_bodies`.
+LINKED_BODIES = {
+    'TIMEOUT': 7 * 86400,  # Entries for old versions just age out
+    'WARM_COUNT': 200,  # Most viewed posts prefilled by warm_linked_bodies
+}
+
+# Broken-link checks (blogs/link_checker.py): thread pool sharing one HTTP
+# connection pool, with per-host limits. Statuses are cached for every post and
+# re-checked when due; broken links sooner, backing off while they stay broken.
+LINK_CHECKER = {
+    'WORKERS': 16,
+    'PER_HOST': 2,  # Requests in flight per host
+    'HOST_DELAY': 0.5,  # Seconds between request starts per host
+    'TIMEOUT': 10,
+    'POOL_HOSTS': 100,  # Hosts with pooled keep-alive connections
+    'USER_AGENT': 'Mozilla/5.0 (compatible; BlogLinkChecker/1.0)',
+    'OK_TTL': 7 * 86400,
+    'BROKEN_TTL': 6 * 3600,  # Doubles per consecutive failure...
+    'MAX_BROKEN_TTL': 3 * 86400,  # ...up to this
+    'ERROR_TTL': 3600,  # Timeouts, connection errors, 429
+    'RETAIN': 30 * 86400,  # How long statuses stay in the cache
+}
+
+# Related posts (blogs/related_posts.py): TF-IDF + tags + category neighbour lists,
+# memory-mapped from INDEX_DIR. Rebuilt by `python manage.py build_related_index`
+# (nightly from cron), updated per post by the background worker on publish/edit.
+RELATED_POSTS = {
+    'INDEX_DIR': BASE_DIR / 'var' / 'related_posts',
+    'TOP_K': 20,  # Neighbours stored per post
+    'TEXT_WEIGHT': 0.7,
+    'TAG_WEIGHT': 0.2,
+    'CATEGORY_WEIGHT': 0.1,
+    'MIN_SCORE': 0.05,  # Weaker neighbours are not stored
+    'MAX_FEATURES': 100000,  # TF-IDF vocabulary size (unigrams + bigrams)
+    'BLOCK_SIZE': 256,  # Posts scored per block during a full build
+    'RELOAD_SECONDS': 30,  # How often web processes check for a new index version
+}
+
+# Trending posts (blogs/trending.py): per-hour Redis sorted sets per site, category
+# and tag, scored with exponential decay. 'db' = order by all-time views instead.
+TRENDING = {
+    'BACKEND': 'db' if DEBUG else 'redis',
+    'HALF_LIFE_HOURS': 24,  # A view counts half as much after this long
+    'WINDOW_HOURS': 72,  # Hours of hits kept and scored
+    'REFRESH_SECONDS': 60,  # How long a computed score set is reused
+}
+
+# Analytics event ingestion (blogs/analytics_buffer.py)
+# Events are buffered and written with bulk_create, then forwarded to GA4 in
+# batches. 'redis': shared list drained by `python manage.py flush_analytics`
+# (or the run_worker loop). 'memory': per-process buffer with a flusher thread.
+ANALYTICS_BUFFER = {
+    'BACKEND': 'memory' if DEBUG else 'redis',
+    'MAX_EVENTS': 50000,  # Oldest events are dropped (and counted) beyond this
+    'BATCH_SIZE': 500,  # Rows per bulk_create
+    'FLUSH_INTERVAL': 5,  # Seconds between flushes
+    'GA4_TIMEOUT': 5,  # Seconds per Measurement Protocol request
+}
+
+# Analytics beacon (blogs.analytics_views.beacon): one sendBeacon per page lifetime
+ANALYTICS_BEACON = {
+    'MAX_BYTES': 64 * 1024,  # Larger bodies are rejected with 413
+    'MAX_PAGES': 10,  # Page records per beacon
+    'MAX_EVENTS': 200,  # Events per beacon, across all pages
+    'CONTENT_MODELS': ['blogs.blog'],  # Content references the beacon may attach events to
+}
+
+# Crawler and bot filtering (blogs/bot_detection.py). Requests judged automated
+# skip page-view events, view counts, analysis refreshes, beacons and ad tracking.
+# Counters of filtered vs human traffic: `python manage.py traffic_stats`.
+BOT_DETECTION = {
+    'ENABLED': True,
+    'BACKEND': 'memory' if DEBUG else 'redis',  # Where the counters and rate windows live
+    # Published crawler ranges; extend with CRAWLER_NETWORK_FILES, e.g. Google's
+    # googlebot.json or Bing's bingbot.json, or a text file with one CIDR per line
+    'CRAWLER_NETWORKS': [
+        '66.249.64.0/19',  # Googlebot
+        '2001:4860:4801::/48',  # Googlebot
+        '40.77.167.0/24',  # Bingbot
+        '157.55.39.0/24',  # Bingbot
+        '207.46.13.0/24',  # Bingbot
+        '17.241.0.0/16',  # Applebot
+        '17.22.237.0/24',  # Applebot
+    ],
+    'CRAWLER_NETWORK_FILES': [],
+    'REQUIRE_BROWSER_HEADERS': True,  # No Accept or Accept-Language header = bot
+    'RATE_LIMIT': 120,  # Article views per IP and User-Agent per window before it counts as a bot (0 = off)
+    'RATE_WINDOW': 60,  # Seconds
+}
+
+# Cookieless visitor/session ids (blogs/visitor_id.py): a daily-rotating HMAC of the
+# client's network prefix and User-Agent, used by analytics and ad tracking.
+VISITOR_IDS = {
+    'IPV4_PREFIX': 24,  # Bits of the address that identify a visitor
+    'IPV6_PREFIX': 48,
+    'SESSION_MINUTES': 30,  # Length of a session bucket
+}
+
+# Per-post daily analytics rollups (blogs/analytics_rollup.py), read by the reports.
+# Updated by the run_worker loop or `python manage.py rollup_analytics`.
+ANALYTICS_ROLLUP = {
+    'INTERVAL': 300,  # Seconds between rollup runs in run_worker
+    'CHUNK_SIZE': 50000,  # Event ids folded in per transaction
+    'LAG': 120,  # Seconds; rows inserted more recently wait for the next run (must exceed any flush transaction)
+    'INSIGHTS_CACHE_TTL': 600,  # Seconds get_content_performance_insights is cached
+}
+
+# Raw analytics exports (blogs/analytics_export.py): `python manage.py export_analytics`
+# or the staff endpoint /api/analytics/export/
+ANALYTICS_EXPORT = {
+    'CHUNK_SIZE': 10000,  # Rows fetched per server-side cursor round trip
+    'BATCH_SIZE': 100000,  # Rows per write (one Parquet row group)
+    'PARQUET_PART_ROWS': 5000000,  # Rows per Parquet part file (the resume granularity)
+    'PARQUET_COMPRESSION': 'zstd',
+}
+
+# Monthly partitions of AnalyticsEvent / CoreWebVitals (blogs/partitions.py)
+# Maintained daily by `python manage.py manage_analytics_partitions`.
+# Daily rollups are kept forever; only raw rows expire.
+ANALYTICS_PARTITIONS = {
+    'MONTHS_AHEAD': 3,  # Partitions created ahead of time
+    'RETENTION_MONTHS': 13,  # Whole months of raw rows kept before a partition is dropped
+    'COPY_CHUNK_SIZE': 50000,  # Rows per transaction when copying pre-partitioning data
+}
+
+# On-demand responsive images (served by blogs.views.resized_image)
+# Derivatives are rendered on first request and kept in a bounded LRU disk cache.
+# Trim it from cron with `python manage.py prune_image_cache`.
+RESPONSIVE_IMAGES = {
+    'ENABLED': True,  # False = use the eagerly generated resized/ files
+    'WIDTHS': [150, 320, 480, 768, 1024, 1280],  # Only these can be requested
+    'BODY_WIDTHS': [320, 480, 768, 1024],  # srcset for images inside post bodies
+    'QUALITY': {'avif': 55, 'webp': 80, 'jpeg': 80},
+    'CACHE_DIR': MEDIA_ROOT / '_resized_cache',
+    'CACHE_MAX_BYTES': 2 * 1024 * 1024 * 1024,  # 2GB
+    'MAX_AGE': 60 * 60 * 24 * 365,  # URLs are versioned, so cache for a year
+}
+
 # Security Settings
 SECURITY_SETTINGS = {
     'ENABLE_RATE_LIMITING': True,
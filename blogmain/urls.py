@@ -64,7 +64,7 @@ urlpatterns = [
     path('search/', BlogsView.search, name='search'),
     
     # New API endpoints for advanced features
-    #path('api/analytics/', include('blogs.analytics_urls')),
+    path('api/analytics/', include('blogs.analytics_urls')),
     #path('api/ai-content/', include('blogs.ai_content_urls')),
     #path('api/voice-search/', include('blogs.voice_search_urls')),
     #path('api/link-building/', include('blogs.link_building_urls')),
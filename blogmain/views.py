@@ -4,6 +4,7 @@ from django.core.cache import cache
 from django.db import transaction
 from django.http import Http404
 from blogs.models import Blog, Category
+from blogs.trending import trending_posts as get_trending_posts
 import logging
 from django.conf import settings
 from django.template.loader import render_to_string
@@ -36,8 +37,8 @@ def home(request):
         # Track which posts are already displayed
         used_ids = [featured_post.id] if featured_post else []
 
-        # Trending posts (most viewed), excluding the featured post
-        trending_posts = published_posts.exclude(id__in=used_ids).order_by('-views')[:2]
+        # Trending posts (time-decayed views), excluding the featured post
+        trending_posts = get_trending_posts(settings.BLOG_SETTINGS['TRENDING_POSTS_COUNT'], exclude=used_ids)
         used_ids += [p.id for p in trending_posts]
 
         # Editor's picks: curated first, excluding anything already shown
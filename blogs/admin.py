@@ -3,7 +3,7 @@
 from django.contrib import admin
 from django.forms import ModelForm
 from django.utils.html import format_html
-from .models import Blog, Category
+from .models import Blog, Category, BackgroundJob
 
 # Custom form for better tags widget (UNCHANGED)
 class BlogAdminForm(ModelForm):
@@ -146,9 +146,23 @@ class CategoryAdmin(admin.ModelAdmin):
     prepopulated_fields = {'slug': ('category_name',)}
     search_fields = ['category_name']
 
+# Background job queue
+class BackgroundJobAdmin(admin.ModelAdmin):
+    list_display = ['kind', 'blog', 'status', 'attempts', 'run_after', 'locked_by', 'updated_at']
+    list_filter = ['status', 'kind']
+    search_fields = ['blog__title', 'last_error']
+    raw_id_fields = ['blog']
+    actions = ['retry_jobs']
+
+    def retry_jobs(self, request, queryset):
+        updated = queryset.filter(status='failed').update(status='pending', attempts=0, last_error='')
+        self.message_user(request, f'{updated} failed jobs re-queued.')
+    retry_jobs.short_description = "Re-queue failed jobs"
+
 # Register models
 admin.site.register(Blog, BlogAdmin)
 admin.site.register(Category, CategoryAdmin)
+admin.site.register(BackgroundJob, BackgroundJobAdmin)
 
 # Note: Tag model is automatically registered by django-taggit
 # Don't try to register it manually unless you really need custom functionality
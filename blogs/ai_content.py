@@ -1,16 +1,15 @@
 # blogs/ai_content.py
-import re
 import json
+import hashlib
 import nltk
 #import ssl
-from textstat import flesch_reading_ease, flesch_kincaid_grade
 from collections import Counter
-from django.utils.html import strip_tags
 from django.conf import settings
 #import openai
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.cluster import KMeans
 import numpy as np
+from .document import Document
 
 # Download required NLTK data
 try:
@@ -28,12 +27,16 @@ except LookupError:
 
 #nltk.download('punkt_tab', quiet=True)
 
+# Bump when the analysis output changes so every stored ContentAnalysis is recomputed
+ANALYZER_VERSION = 2
+
 class AIContentIntelligence:
     """AI-powered content analysis and optimization system"""
     
-    def __init__(self, blog_post):
+    def __init__(self, blog_post, document=None):
         self.post = blog_post
-        self.content = strip_tags(blog_post.blog_body)
+        self.document = document or Document.for_post(blog_post)
+        self.content = self.document.text
         self.title = blog_post.title
         self.meta_description = blog_post.get_meta_description()
         self.focus_keyword = blog_post.focus_keyword
@@ -55,28 +58,28 @@ class AIContentIntelligence:
     
     def _analyze_readability(self):
         """Analyze content readability"""
-        sentences = nltk.sent_tokenize(self.content)
-        words = nltk.word_tokenize(self.content)
+        sentences = self.document.sentences
+        words = self.document.tokens
         
         return {
-            'flesch_score': flesch_reading_ease(self.content),
-            'grade_level': flesch_kincaid_grade(self.content),
+            'flesch_score': self.document.flesch_reading_ease,
+            'grade_level': self.document.flesch_kincaid_grade,
             'avg_sentence_length': len(words) / len(sentences) if sentences else 0,
             'word_count': len(words),
             'sentence_count': len(sentences),
-            'readability_grade': self._get_readability_grade(flesch_reading_ease(self.content))
+            'readability_grade': self._get_readability_grade(self.document.flesch_reading_ease)
         }
     
     def _analyze_seo(self):
         """Advanced SEO analysis"""
-        content_lower = self.content.lower()
+        content_lower = self.document.lower_text
         title_lower = self.title.lower()
         
         # Keyword density analysis
         keyword_density = 0
         if self.focus_keyword:
             keyword_count = content_lower.count(self.focus_keyword.lower())
-            keyword_density = (keyword_count / len(self.content.split())) * 100
+            keyword_density = (keyword_count / len(self.document.words)) * 100
         
         # Title optimization
         title_length = len(self.title)
@@ -109,7 +112,7 @@ class AIContentIntelligence:
     
     def _analyze_engagement(self):
         """Analyze content for engagement factors"""
-        sentences = nltk.sent_tokenize(self.content)
+        sentences = self.document.sentences
         
         # Question count
         questions = len([s for s in sentences if s.strip().endswith('?')])
@@ -118,7 +121,7 @@ class AIContentIntelligence:
         emotional_words = self._count_emotional_words()
         
         # Paragraph analysis
-        paragraphs = [p.strip() for p in self.content.split('\n\n') if p.strip()]
+        paragraphs = self.document.paragraphs
         
         return {
             'question_count': questions,
@@ -138,8 +141,8 @@ class AIContentIntelligence:
         topics = self._identify_topics()
         
         # Semantic density
-        unique_words = len(set(self.content.lower().split()))
-        total_words = len(self.content.split())
+        unique_words = len(self.document.word_counts)
+        total_words = len(self.document.words)
         semantic_density = unique_words / total_words if total_words > 0 else 0
         
         return {
@@ -154,7 +157,7 @@ class AIContentIntelligence:
         suggestions = []
         
         # Readability suggestions
-        flesch_score = flesch_reading_ease(self.content)
+        flesch_score = self.document.flesch_reading_ease
         if flesch_score < 30:
             suggestions.append({
                 'type': 'readability',
@@ -172,7 +175,7 @@ class AIContentIntelligence:
         
         # SEO suggestions
         if self.focus_keyword:
-            keyword_density = (self.content.lower().count(self.focus_keyword.lower()) / len(self.content.split())) * 100
+            keyword_density = (self.document.lower_text.count(self.focus_keyword.lower()) / len(self.document.words)) * 100
             if keyword_density < 0.5:
                 suggestions.append({
                     'type': 'seo',
@@ -205,7 +208,7 @@ class AIContentIntelligence:
             })
         
         # Content length suggestions
-        word_count = len(self.content.split())
+        word_count = len(self.document.words)
         if word_count < 300:
             suggestions.append({
                 'type': 'content',
@@ -293,10 +296,11 @@ class AIContentIntelligence:
     
     def _extract_headers(self):
         """Extract header information from content"""
+        levels = Counter(header.level for header in self.document.headers)
         headers = {
-            'h1': len(re.findall(r'<h1[^>]*>(.*?)</h1>', self.post.blog_body, re.IGNORECASE)),
-            'h2': len(re.findall(r'<h2[^>]*>(.*?)</h2>', self.post.blog_body, re.IGNORECASE)),
-            'h3': len(re.findall(r'<h3[^>]*>(.*?)</h3>', self.post.blog_body, re.IGNORECASE)),
+            'h1': levels[1],
+            'h2': levels[2],
+            'h3': levels[3],
             'total': 0
         }
         headers['total'] = headers['h1'] + headers['h2'] + headers['h3']
@@ -305,18 +309,18 @@ class AIContentIntelligence:
     def _count_internal_links(self):
         """Count internal links in content"""
         # This is a simplified version - you'd want to make this more sophisticated
-        return len(re.findall(r'<a[^>]*href="(?!http)[^"]*"[^>]*>', self.post.blog_body))
+        return sum(1 for link in self.document.links if not link.url.startswith('http'))
     
     def _count_external_links(self):
         """Count external links in content"""
-        return len(re.findall(r'<a[^>]*href="https?://[^"]*"[^>]*>', self.post.blog_body))
+        return sum(1 for link in self.document.links if link.external)
     
     def _keyword_in_first_paragraph(self):
         """Check if focus keyword is in first paragraph"""
         if not self.focus_keyword:
             return False
         
-        paragraphs = self.content.split('\n\n')
+        paragraphs = self.document.paragraphs
         if paragraphs:
             return self.focus_keyword.lower() in paragraphs[0].lower()
         return False
@@ -329,8 +333,8 @@ class AIContentIntelligence:
             'shocking', 'surprising', 'unbelievable', 'devastating', 'heartbreaking',
             'inspiring', 'motivating', 'empowering', 'uplifting', 'encouraging'
         ]
-        content_words = self.content.lower().split()
-        return sum(1 for word in content_words if word in emotional_words)
+        counts = self.document.word_counts
+        return sum(counts[word] for word in emotional_words)
     
     def _detect_call_to_action(self):
         """Detect call-to-action phrases"""
@@ -339,20 +343,20 @@ class AIContentIntelligence:
             'subscribe', 'download', 'contact us', 'buy now', 'order now',
             'try now', 'start today', 'join now', 'register now'
         ]
-        content_lower = self.content.lower()
+        content_lower = self.document.lower_text
         return any(phrase in content_lower for phrase in cta_phrases)
     
     def _count_personal_pronouns(self):
         """Count personal pronouns for engagement"""
         pronouns = ['you', 'your', 'we', 'our', 'us', 'i', 'my', 'me']
-        content_words = self.content.lower().split()
-        return sum(1 for word in content_words if word in pronouns)
+        counts = self.document.word_counts
+        return sum(counts[word] for word in pronouns)
     
     def _extract_key_phrases(self):
         """Extract key phrases using TF-IDF"""
         try:
             # Simple key phrase extraction
-            words = nltk.word_tokenize(self.content.lower())
+            words = self.document.lower_tokens
             words = [word for word in words if word.isalpha() and len(word) > 3]
             
             # Get most common words
@@ -364,7 +368,7 @@ class AIContentIntelligence:
     def _identify_topics(self):
         """Simplified topic identification"""
         # This is a basic implementation - you might want to use more sophisticated NLP
-        sentences = nltk.sent_tokenize(self.content)
+        sentences = self.document.sentences
         if len(sentences) < 3:
             return []
         
@@ -393,9 +397,9 @@ class AIContentIntelligence:
     def _calculate_content_depth(self):
         """Calculate content depth score"""
         # Factors: word count, unique words, sentence variety, paragraph structure
-        words = self.content.split()
+        words = self.document.words
         unique_words = set(words)
-        sentences = nltk.sent_tokenize(self.content)
+        sentences = self.document.sentences
         
         # Sentence length variety
         sentence_lengths = [len(s.split()) for s in sentences]
@@ -412,4 +416,64 @@ class AIContentIntelligence:
         return round(depth_score, 1)
 
 
-# blogs/management/commands/analyze_content.py
+# ----------------
+# Stored analysis
+# ----------------
+def content_hash(post):
+    """Hash of everything analyze_content() reads, plus the analyzer version."""
+    parts = [
+        str(ANALYZER_VERSION), post.title or '', post.blog_body or '',
+        post.focus_keyword or '', post.get_meta_description() or '',
+    ]
+    return hashlib.sha256('\x1f'.join(parts).encode()).hexdigest()
+
+
+def refresh_content_analysis(post, force=False):
+    """Analyze `post` and store the result, unless the stored row already
+    matches its current content. Returns the analysis dict."""
+    from .models import ContentAnalysis
+
+    digest = content_hash(post)
+    record = ContentAnalysis.objects.filter(post_id=post.pk).first()
+    if record and not force and record.content_hash == digest:
+        return record.analysis_data
+
+    analysis = AIContentIntelligence(post).analyze_content()
+    ContentAnalysis.objects.update_or_create(
+        post_id=post.pk,
+        defaults={
+            'analysis_data': analysis,
+            'overall_score': int(analysis['score']),
+            'content_hash': digest,
+            'analyzer_version': ANALYZER_VERSION,
+        },
+    )
+    return analysis
+
+
+def get_content_analysis(post, refresh=True):
+    """Stored analysis for `post` in one indexed lookup, for the request path.
+
+    A missing or stale row is queued for recomputation and the stale data (or
+    None) is returned meanwhile. Without a worker (BACKGROUND_JOBS['ASYNC']
+    off) it is recomputed inline once and stored. With refresh=False (crawler
+    requests) whatever is stored is returned and nothing is recomputed.
+    """
+    from .models import ContentAnalysis
+    from .jobs import enqueue_job
+
+    record = (
+        ContentAnalysis.objects.filter(post_id=post.pk)
+        .only('analysis_data', 'content_hash')
+        .first()
+    )
+    if record and record.content_hash == content_hash(post):
+        return record.analysis_data
+    if not refresh:
+        return record.analysis_data if record else None
+
+    if not settings.BACKGROUND_JOBS['ASYNC']:
+        return refresh_content_analysis(post)
+
+    enqueue_job(post, 'content_analysis')
+    return record.analysis_data if record else None
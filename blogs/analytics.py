@@ -1,12 +1,17 @@
 # blogs/analytics.py
 import json
+from collections import Counter, defaultdict
 from datetime import datetime, timedelta
 from django.db import models
+from django.db.models.functions import Now
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 from django.utils import timezone
 from django.conf import settings
-import requests
+
+from .sketches import HyperLogLog, TDigest
+from .user_agents import classify as classify_user_agent
+from .visitor_id import visitor_ids
 
 class AnalyticsEvent(models.Model):
     """Custom analytics events"""
@@ -40,14 +45,24 @@ class AnalyticsEvent(models.Model):
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     referrer = models.URLField(blank=True)
     
-    # Timing
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Parsed from user_agent once at ingest (blogs/user_agents.py); '' = not yet classified
+    device_type = models.CharField(max_length=10, blank=True)
+    browser_family = models.CharField(max_length=10, blank=True)
+    is_bot = models.BooleanField(default=False)
+    
+    # Timing (set when the event happens, not when the buffer is flushed)
+    timestamp = models.DateTimeField(default=timezone.now)
+    # Set by the database on insert; the rollup watermark settles on this
+    inserted_at = models.DateTimeField(db_default=Now(), editable=False)
     
     class Meta:
         indexes = [
             models.Index(fields=['event_type', 'timestamp']),
             models.Index(fields=['content_type', 'object_id']),
             models.Index(fields=['session_id']),
+            models.Index(fields=['device_type', 'timestamp']),
+            models.Index(fields=['browser_family', 'timestamp']),
+            models.Index(fields=['timestamp'], condition=models.Q(is_bot=True), name='analyticsevent_bot_idx'),
         ]
 
 class CoreWebVitals(models.Model):
@@ -69,12 +84,98 @@ class CoreWebVitals(models.Model):
     connection_type = models.CharField(max_length=50, blank=True)
     
     timestamp = models.DateTimeField(auto_now_add=True)
+    inserted_at = models.DateTimeField(db_default=Now(), editable=False)
     
     class Meta:
         indexes = [
             models.Index(fields=['url', 'timestamp']),
         ]
 
+# Additive PostDailyStats columns; reports sum them over a date range
+ROLLUP_SUM_FIELDS = [
+    'total_events', 'views', 'unique_visitors', 'sessions', 'bounces',
+    'engaged_sessions', 'conversion_sessions', 'interaction_events',
+    'scroll_depth_sum', 'scroll_depth_count', 'time_on_page_sum', 'time_on_page_count',
+    'mobile', 'tablet', 'desktop',
+]
+
+class PostDailyStats(models.Model):
+    """Per-object, per-day rollup of AnalyticsEvent (see blogs/analytics_rollup.py)"""
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    date = models.DateField()
+
+    total_events = models.PositiveIntegerField(default=0)
+    views = models.PositiveIntegerField(default=0)
+    unique_visitors = models.PositiveIntegerField(default=0)
+    sessions = models.PositiveIntegerField(default=0)
+    bounces = models.PositiveIntegerField(default=0)  # Sessions whose only event was a page view
+    engaged_sessions = models.PositiveIntegerField(default=0)
+    conversion_sessions = models.PositiveIntegerField(default=0)
+    interaction_events = models.PositiveIntegerField(default=0)
+
+    scroll_depth_sum = models.FloatField(default=0)
+    scroll_depth_count = models.PositiveIntegerField(default=0)
+    time_on_page_sum = models.FloatField(default=0)
+    time_on_page_count = models.PositiveIntegerField(default=0)
+
+    # Device split (all events, by AnalyticsEvent.device_type; bots count as desktop)
+    mobile = models.PositiveIntegerField(default=0)
+    tablet = models.PositiveIntegerField(default=0)
+    desktop = models.PositiveIntegerField(default=0)
+
+    referrers = models.JSONField(default=dict)  # {referrer: count}, top entries only
+
+    # HyperLogLog sketches (blogs/sketches.py); merged for multi-day uniques
+    visitor_hll = models.BinaryField(null=True, blank=True, editable=False)
+    session_hll = models.BinaryField(null=True, blank=True, editable=False)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['content_type', 'object_id', 'date'], name='unique_post_daily_stats'),
+        ]
+        indexes = [
+            models.Index(fields=['content_type', 'date']),
+        ]
+
+# CoreWebVitals columns summarised per URL per day, with the "good" threshold
+WEB_VITALS_METRICS = {
+    'lcp': 2.5,
+    'fid': 100,
+    'cls': 0.1,
+    'fcp': None,
+    'ttfb': None,
+}
+
+class WebVitalsDailyStats(models.Model):
+    """Per-URL, per-day rollup of CoreWebVitals with a t-digest per metric"""
+    url = models.URLField()
+    date = models.DateField()
+    samples = models.PositiveIntegerField(default=0)
+    # {metric: {'count', 'sum', 'good', 'digest'}}; see blogs/analytics_rollup.py
+    metrics = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['url', 'date'], name='unique_web_vitals_daily_stats'),
+        ]
+        indexes = [
+            models.Index(fields=['date']),
+        ]
+
+class AnalyticsRollupState(models.Model):
+    """Named watermark: the highest AnalyticsEvent id already folded into the
+    rollups, or the last view-count snapshot applied ('view_counter')"""
+    name = models.CharField(max_length=50, unique=True)
+    last_event_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.last_event_id}"
+
 class UserBehaviorAnalytics:
     """Advanced user behavior analytics"""
     
@@ -84,55 +185,64 @@ class UserBehaviorAnalytics:
     
     def track_custom_event(self, event_type, user_id=None, session_id=None, 
                           content_object=None, event_data=None, request=None):
-        """Track custom analytics event"""
-        
-        # Create database record
+        """Track custom analytics event.
+
+        The event is buffered, not saved: blogs.analytics_buffer writes it with
+        bulk_create and forwards it to GA4 off the request path. The returned
+        instance is unsaved.
+        """
+        from .analytics_buffer import enqueue
+        
+        event = self.build_event(
+            event_type,
+            user_id=user_id,
+            session_id=session_id,
+            content_type=ContentType.objects.get_for_model(content_object) if content_object else None,
+            object_id=content_object.id if content_object else None,
+            event_data=event_data,
+            request=request,
+        )
+        enqueue(event)
+        return event
+    
+    def build_event(self, event_type, user_id=None, session_id=None, content_type=None,
+                    object_id=None, event_data=None, request=None, timestamp=None):
+        """Unsaved AnalyticsEvent with the request context filled in.
+        Without explicit ids, the request's cookieless visitor and session
+        ids (blogs.visitor_id) are used."""
+        if request and not (user_id and session_id):
+            ids = visitor_ids(request)
+            user_id = user_id or ids.visitor_id
+            session_id = session_id or ids.session_id
         event = AnalyticsEvent(
             event_type=event_type,
             user_id=user_id or '',
             session_id=session_id or '',
             event_data=event_data or {},
+            content_type=content_type,
+            object_id=object_id,
         )
-        
-        if content_object:
-            event.content_type = ContentType.objects.get_for_model(content_object)
-            event.object_id = content_object.id
+        if timestamp:
+            event.timestamp = timestamp
         
         if request:
             event.user_agent = request.META.get('HTTP_USER_AGENT', '')
             event.ip_address = self.get_client_ip(request)
-            event.referrer = request.META.get('HTTP_REFERER', '')
-        
-        event.save()
-        
-        # Send to GA4 if configured
-        if self.ga4_measurement_id and self.ga4_api_secret:
-            self.send_to_ga4(event_type, user_id, event_data)
+            event.referrer = request.META.get('HTTP_REFERER', '')[:200]
         
+        event.device_type, event.browser_family, event.is_bot = classify_user_agent(event.user_agent)
         return event
     
     def send_to_ga4(self, event_name, user_id=None, event_data=None):
-        """Send event to Google Analytics 4"""
-        if not self.ga4_measurement_id or not self.ga4_api_secret:
-            return
-        
-        url = f"https://www.google-analytics.com/mp/collect?measurement_id={self.ga4_measurement_id}&api_secret={self.ga4_api_secret}"
-        
-        payload = {
-            "client_id": user_id or "anonymous",
-            "events": [{
-                "name": event_name,
-                "params": event_data or {}
-            }]
-        }
+        """Send one event to Google Analytics 4 immediately (blocking)"""
+        from .analytics_buffer import send_to_ga4
         
-        try:
-            requests.post(url, json=payload, timeout=5)
-        except requests.exceptions.RequestException:
-            pass  # Fail silently for analytics
+        send_to_ga4([AnalyticsEvent(event_type=event_name, user_id=user_id or '', event_data=event_data or {})])
     
     def track_core_web_vitals(self, url, session_id, metrics, request=None):
         """Track Core Web Vitals metrics"""
+        if request and not session_id:
+            session_id = visitor_ids(request).session_id
         vitals = CoreWebVitals(
             url=url,
             session_id=session_id,
@@ -151,30 +261,44 @@ class UserBehaviorAnalytics:
         return vitals
     
     def get_reading_analytics(self, blog_post, days=30):
-        """Get detailed reading analytics for a blog post"""
-        end_date = timezone.now()
-        start_date = end_date - timedelta(days=days)
-        
+        """Get detailed reading analytics for a blog post (from the daily rollups)"""
+        start_date = (timezone.now() - timedelta(days=days)).date()
         content_type = ContentType.objects.get_for_model(blog_post)
         
-        # Get all events for this post
-        events = AnalyticsEvent.objects.filter(
+        rows = list(PostDailyStats.objects.filter(
             content_type=content_type,
             object_id=blog_post.id,
-            timestamp__gte=start_date
-        )
+            date__gte=start_date
+        ).order_by('date'))
+        totals = self._sum_rollups(rows)
+        
+        # Daily unique counts don't add up across days; merge the sketches
+        visitors = HyperLogLog.merged(row.visitor_hll for row in rows)
+        sessions = HyperLogLog.merged(row.session_hll for row in rows)
+        
+        referrers = Counter()
+        for row in rows:
+            referrers.update(row.referrers)
         
         analytics = {
-            'total_views': events.filter(event_type='page_view').count(),
-            'unique_visitors': events.filter(event_type='page_view').values('user_id').distinct().count(),
-            'avg_time_on_page': self._calculate_avg_time_on_page(events),
-            'scroll_depth': self._calculate_avg_scroll_depth(events),
-            'engagement_rate': self._calculate_engagement_rate(events),
-            'bounce_rate': self._calculate_bounce_rate(events),
-            'conversion_events': events.exclude(event_type__in=['page_view', 'scroll_depth', 'time_on_page']).count(),
-            'daily_views': self._get_daily_views(events),
-            'referrer_analysis': self._analyze_referrers(events),
-            'device_breakdown': self._analyze_devices(events),
+            'total_views': totals['views'],
+            'unique_visitors': visitors.count(),
+            'unique_sessions': sessions.count(),
+            'avg_time_on_page': self._ratio(totals['time_on_page_sum'], totals['time_on_page_count']),
+            'scroll_depth': self._ratio(totals['scroll_depth_sum'], totals['scroll_depth_count']),
+            'engagement_rate': self._ratio(totals['engaged_sessions'], totals['sessions']) * 100,
+            'bounce_rate': self._ratio(totals['bounces'], totals['sessions']) * 100,
+            'conversion_events': totals['interaction_events'],
+            'daily_views': [{'day': row.date, 'views': row.views} for row in rows if row.views],
+            'referrer_analysis': [
+                {'referrer': referrer, 'count': count}
+                for referrer, count in referrers.most_common(10)
+            ],
+            'device_breakdown': {
+                'mobile': totals['mobile'],
+                'desktop': totals['desktop'],
+                'tablet': totals['tablet'],
+            },
         }
         
         return analytics
@@ -184,173 +308,160 @@ class UserBehaviorAnalytics:
         end_date = timezone.now()
         start_date = end_date - timedelta(days=days)
         
-        # Core Web Vitals analysis
-        vitals = CoreWebVitals.objects.filter(timestamp__gte=start_date)
+        # Core Web Vitals: merge the per-URL daily rollups and their t-digests
+        summary = self._merge_vitals(
+            WebVitalsDailyStats.objects.filter(date__gte=start_date.date())
+        )
         
         performance_metrics = {
             'core_web_vitals': {
-                'lcp': {
-                    'avg': vitals.exclude(lcp__isnull=True).aggregate(avg=models.Avg('lcp'))['avg'] or 0,
-                    'p75': self._calculate_percentile(vitals.values_list('lcp', flat=True), 75),
-                    'good_ratio': vitals.filter(lcp__lt=2.5).count() / max(vitals.count(), 1)
-                },
-                'fid': {
-                    'avg': vitals.exclude(fid__isnull=True).aggregate(avg=models.Avg('fid'))['avg'] or 0,
-                    'p75': self._calculate_percentile(vitals.values_list('fid', flat=True), 75),
-                    'good_ratio': vitals.filter(fid__lt=100).count() / max(vitals.count(), 1)
-                },
-                'cls': {
-                    'avg': vitals.exclude(cls__isnull=True).aggregate(avg=models.Avg('cls'))['avg'] or 0,
-                    'p75': self._calculate_percentile(vitals.values_list('cls', flat=True), 75),
-                    'good_ratio': vitals.filter(cls__lt=0.1).count() / max(vitals.count(), 1)
+                metric: {
+                    'avg': summary[metric]['avg'],
+                    'p75': summary[metric]['p75'],
+                    'good_ratio': summary[metric]['good'] / max(summary['samples'], 1)
                 }
+                for metric in ('lcp', 'fid', 'cls')
             },
             'page_speed': {
-                'fcp_avg': vitals.exclude(fcp__isnull=True).aggregate(avg=models.Avg('fcp'))['avg'] or 0,
-                'ttfb_avg': vitals.exclude(ttfb__isnull=True).aggregate(avg=models.Avg('ttfb'))['avg'] or 0,
+                'fcp_avg': summary['fcp']['avg'],
+                'ttfb_avg': summary['ttfb']['avg'],
             },
-            'device_performance': self._analyze_device_performance(vitals),
-            'recommendations': self._generate_performance_recommendations(vitals)
+            'device_performance': self._analyze_device_performance(
+                CoreWebVitals.objects.filter(timestamp__gte=start_date)
+            ),
+            'recommendations': self._generate_performance_recommendations(summary)
         }
         
         return performance_metrics
     
     def get_content_performance_insights(self, days=30):
-        """Get insights on content performance"""
-        end_date = timezone.now()
-        start_date = end_date - timedelta(days=days)
-        
+        """Get insights on content performance (cached for INSIGHTS_CACHE_TTL)"""
+        cache_key = f'content_insights:{days}'
+        store = self._insights_cache()
+        insights = store.get(cache_key)
+        if insights is None:
+            insights = self.compute_content_performance_insights(days)
+            store.set(cache_key, insights, settings.ANALYTICS_ROLLUP['INSIGHTS_CACHE_TTL'])
+        return insights
+    
+    def compute_content_performance_insights(self, days=30):
+        """Score every published post from the daily rollups.
+
+        One grouped query returns the totals of every published post with
+        activity; scoring is vectorized with NumPy, and only the posts that
+        make the top/underperforming lists are loaded as Blog objects.
+        """
+        import numpy as np
         from blogs.models import Blog
         
-        # Get all published posts
-        posts = Blog.objects.filter(status='Published')
+        start_date = (timezone.now() - timedelta(days=days)).date()
         content_type = ContentType.objects.get_for_model(Blog)
         
-        insights = []
-        
-        for post in posts:
-            post_events = AnalyticsEvent.objects.filter(
-                content_type=content_type,
-                object_id=post.id,
-                timestamp__gte=start_date
-            )
-            
-            if post_events.exists():
-                post_analytics = {
-                    'post': post,
-                    'views': post_events.filter(event_type='page_view').count(),
-                    'unique_visitors': post_events.filter(event_type='page_view').values('user_id').distinct().count(),
-                    'avg_time': self._calculate_avg_time_on_page(post_events),
-                    'engagement_score': self._calculate_engagement_score(post_events),
-                    'conversion_rate': self._calculate_conversion_rate(post_events),
-                }
-                insights.append(post_analytics)
-        
-        # Sort by engagement score
-        insights.sort(key=lambda x: x['engagement_score'], reverse=True)
+        rows = list(PostDailyStats.objects.filter(
+            content_type=content_type,
+            date__gte=start_date,
+            object_id__in=Blog.objects.filter(status='Published').values('id')
+        ).values('object_id').annotate(
+            **{f'{field}__sum': models.Sum(field) for field in ROLLUP_SUM_FIELDS}
+        ).order_by('object_id').values_list(
+            'object_id', *(f'{field}__sum' for field in ROLLUP_SUM_FIELDS)
+        ))
+        
+        if not rows:
+            return {'top_performing': [], 'underperforming': [], 'content_recommendations': []}
+        
+        ids = np.array([row[0] for row in rows])
+        data = np.array([row[1:] for row in rows], dtype=float)
+        col = {field: data[:, i] for i, field in enumerate(ROLLUP_SUM_FIELDS)}
+        
+        def ratio(numerator, denominator):
+            return np.divide(numerator, denominator, out=np.zeros_like(numerator), where=denominator > 0)
+        
+        avg_time = ratio(col['time_on_page_sum'], col['time_on_page_count'])
+        avg_scroll = ratio(col['scroll_depth_sum'], col['scroll_depth_count'])
+        interaction_rate = ratio(col['interaction_events'], col['total_events'])
+        
+        # Engagement score: up to 40 for 5+ minutes, 30 for full scroll, 30 for interactions
+        scores = (
+            np.minimum(avg_time / 300 * 40, 40)
+            + np.minimum(avg_scroll / 100 * 30, 30)
+            + np.minimum(interaction_rate * 100, 30)
+        ).round(1)
+        conversion_rate = ratio(col['conversion_sessions'], col['sessions']) * 100
+        bounce_rate = ratio(col['bounces'], col['sessions']) * 100
+        
+        order = np.argsort(-scores, kind='stable')
+        top = order[:10]
+        under = order[scores[order] < 30][-10:]
+        
+        shown = np.union1d(top, under)
+        shown_ids = [int(ids[i]) for i in shown]
+        posts = Blog.objects.in_bulk(shown_ids)
+        visitors = defaultdict(HyperLogLog)
+        for object_id, blob in PostDailyStats.objects.filter(
+            content_type=content_type,
+            date__gte=start_date,
+            object_id__in=shown_ids,
+            visitor_hll__isnull=False
+        ).values_list('object_id', 'visitor_hll'):
+            visitors[object_id].merge(HyperLogLog.from_bytes(blob))
+        
+        def insight(i):
+            post_id = int(ids[i])
+            return {
+                'post': posts[post_id],
+                'views': int(col['views'][i]),
+                'unique_visitors': visitors[post_id].count(),
+                'avg_time': float(avg_time[i]),
+                'engagement_score': float(scores[i]),
+                'conversion_rate': float(conversion_rate[i]),
+                'bounce_rate': float(bounce_rate[i]),
+            }
         
         return {
-            'top_performing': insights[:10],
-            'underperforming': [p for p in insights if p['engagement_score'] < 30][-10:],
-            'content_recommendations': self._generate_content_recommendations(insights)
+            'top_performing': [insight(i) for i in top],
+            'underperforming': [insight(i) for i in under],
+            'content_recommendations': self._generate_content_recommendations(scores, bounce_rate)
         }
     
-    def _calculate_avg_time_on_page(self, events):
-        """Calculate average time spent on page"""
-        time_events = events.filter(event_type='time_on_page')
-        if not time_events.exists():
-            return 0
-        
-        total_time = sum(
-            event.event_data.get('duration', 0) 
-            for event in time_events 
-            if 'duration' in event.event_data
-        )
-        
-        return total_time / time_events.count() if time_events.count() > 0 else 0
-    
-    def _calculate_avg_scroll_depth(self, events):
-        """Calculate average scroll depth"""
-        scroll_events = events.filter(event_type='scroll_depth')
-        if not scroll_events.exists():
-            return 0
-        
-        total_depth = sum(
-            event.event_data.get('depth', 0) 
-            for event in scroll_events 
-            if 'depth' in event.event_data
-        )
-        
-        return total_depth / scroll_events.count() if scroll_events.count() > 0 else 0
-    
-    def _calculate_engagement_rate(self, events):
-        """Calculate engagement rate"""
-        total_sessions = events.values('session_id').distinct().count()
-        if total_sessions == 0:
-            return 0
-        
-        engaged_sessions = events.filter(
-            event_type__in=['comment_posted', 'newsletter_signup', 'link_clicked']
-        ).values('session_id').distinct().count()
-        
-        return (engaged_sessions / total_sessions) * 100
-    
-    def _calculate_bounce_rate(self, events):
-        """Calculate bounce rate"""
-        total_sessions = events.values('session_id').distinct().count()
-        if total_sessions == 0:
-            return 0
-        
-        # Sessions with only one page view and no other interactions
-        single_page_sessions = 0
-        for session_id in events.values_list('session_id', flat=True).distinct():
-            session_events = events.filter(session_id=session_id)
-            if session_events.count() == 1 and session_events.first().event_type == 'page_view':
-                single_page_sessions += 1
-        
-        return (single_page_sessions / total_sessions) * 100
-    
-    def _get_daily_views(self, events):
-        """Get daily view counts"""
-        daily_views = events.filter(event_type='page_view').extra(
-            select={'day': 'date(timestamp)'}
-        ).values('day').annotate(views=models.Count('id')).order_by('day')
-        
-        return list(daily_views)
-    
-    def _analyze_referrers(self, events):
-        """Analyze referrer sources"""
-        referrers = events.exclude(referrer='').values('referrer').annotate(
-            count=models.Count('id')
-        ).order_by('-count')[:10]
-        
-        return list(referrers)
-    
-    def _analyze_devices(self, events):
-        """Analyze device types"""
-        # This would require parsing user agents - simplified version
-        devices = {'mobile': 0, 'desktop': 0, 'tablet': 0}
-        
-        for event in events:
-            user_agent = event.user_agent.lower()
-            if 'mobile' in user_agent:
-                devices['mobile'] += 1
-            elif 'tablet' in user_agent:
-                devices['tablet'] += 1
-            else:
-                devices['desktop'] += 1
-        
-        return devices
-    
-    def _calculate_percentile(self, values, percentile):
-        """Calculate percentile for a list of values"""
-        clean_values = [v for v in values if v is not None]
-        if not clean_values:
-            return 0
-        
-        clean_values.sort()
-        index = int((percentile / 100) * len(clean_values))
-        return clean_values[min(index, len(clean_values) - 1)]
+    def _insights_cache(self):
+        from django.core.cache import cache, caches
+        
+        return caches['analytics'] if 'analytics' in settings.CACHES else cache
+    
+    def _sum_rollups(self, rows):
+        """Add up PostDailyStats rows already loaded in memory"""
+        totals = dict.fromkeys(ROLLUP_SUM_FIELDS, 0)
+        for row in rows:
+            for field in ROLLUP_SUM_FIELDS:
+                totals[field] += getattr(row, field)
+        return totals
+    
+    def _ratio(self, numerator, denominator):
+        return numerator / denominator if denominator else 0
+    
+    def _merge_vitals(self, rows):
+        """Sum WebVitalsDailyStats rows and merge their digests per metric"""
+        summary = {'samples': 0}
+        totals = {metric: {'count': 0, 'sum': 0.0, 'good': 0, 'digest': TDigest()} for metric in WEB_VITALS_METRICS}
+        
+        for samples, metrics in rows.values_list('samples', 'metrics').iterator(chunk_size=500):
+            summary['samples'] += samples
+            for metric, data in metrics.items():
+                if metric not in totals:
+                    continue
+                totals[metric]['count'] += data['count']
+                totals[metric]['sum'] += data['sum']
+                totals[metric]['good'] += data['good']
+                totals[metric]['digest'].merge(TDigest.from_dict(data['digest']))
+        
+        for metric, data in totals.items():
+            summary[metric] = {
+                'avg': self._ratio(data['sum'], data['count']),
+                'p75': data['digest'].quantile(0.75) or 0,
+                'good': data['good'],
+            }
+        return summary
     
     def _analyze_device_performance(self, vitals):
         """Analyze performance by device type"""
@@ -367,13 +478,13 @@ class UserBehaviorAnalytics:
         
         return devices
     
-    def _generate_performance_recommendations(self, vitals):
+    def _generate_performance_recommendations(self, summary):
         """Generate performance improvement recommendations"""
         recommendations = []
         
-        avg_lcp = vitals.exclude(lcp__isnull=True).aggregate(avg=models.Avg('lcp'))['avg'] or 0
-        avg_fid = vitals.exclude(fid__isnull=True).aggregate(avg=models.Avg('fid'))['avg'] or 0
-        avg_cls = vitals.exclude(cls__isnull=True).aggregate(avg=models.Avg('cls'))['avg'] or 0
+        avg_lcp = summary['lcp']['avg']
+        avg_fid = summary['fid']['avg']
+        avg_cls = summary['cls']['avg']
         
         if avg_lcp > 2.5:
             recommendations.append({
@@ -413,46 +524,12 @@ class UserBehaviorAnalytics:
         
         return recommendations
     
-    def _calculate_engagement_score(self, events):
-        """Calculate overall engagement score"""
-        if not events.exists():
-            return 0
-        
-        score = 0
-        
-        # Time on page (0-40 points)
-        avg_time = self._calculate_avg_time_on_page(events)
-        score += min(avg_time / 300 * 40, 40)  # Max 40 points for 5+ minutes
-        
-        # Scroll depth (0-30 points)
-        avg_scroll = self._calculate_avg_scroll_depth(events)
-        score += min(avg_scroll / 100 * 30, 30)  # Max 30 points for 100% scroll
-        
-        # Interactions (0-30 points)
-        interaction_events = events.exclude(event_type__in=['page_view', 'scroll_depth', 'time_on_page'])
-        interaction_rate = interaction_events.count() / events.count() if events.count() > 0 else 0
-        score += min(interaction_rate * 100, 30)
-        
-        return round(score, 1)
-    
-    def _calculate_conversion_rate(self, events):
-        """Calculate conversion rate"""
-        total_sessions = events.values('session_id').distinct().count()
-        if total_sessions == 0:
-            return 0
-        
-        conversion_events = events.filter(
-            event_type__in=['newsletter_signup', 'comment_posted', 'download']
-        ).values('session_id').distinct().count()
-        
-        return (conversion_events / total_sessions) * 100
-    
-    def _generate_content_recommendations(self, insights):
-        """Generate content optimization recommendations"""
+    def _generate_content_recommendations(self, engagement_scores, bounce_rates):
+        """Generate content optimization recommendations from per-post arrays"""
         recommendations = []
         
-        if insights:
-            avg_engagement = sum(p['engagement_score'] for p in insights) / len(insights)
+        if len(engagement_scores):
+            avg_engagement = float(engagement_scores.mean())
             
             if avg_engagement < 50:
                 recommendations.append({
@@ -466,11 +543,11 @@ class UserBehaviorAnalytics:
                     ]
                 })
             
-            high_bounce_posts = [p for p in insights if self._calculate_bounce_rate_for_post(p) > 70]
+            high_bounce_posts = int((bounce_rates > 70).sum())
             if high_bounce_posts:
                 recommendations.append({
                     'type': 'bounce_rate',
-                    'message': f'{len(high_bounce_posts)} posts have high bounce rates (>70%)',
+                    'message': f'{high_bounce_posts} posts have high bounce rates (>70%)',
                     'actions': [
                         'Improve page loading speed',
                         'Make content more engaging in the first paragraph',
@@ -481,11 +558,6 @@ class UserBehaviorAnalytics:
         
         return recommendations
     
-    def _calculate_bounce_rate_for_post(self, post_analytics):
-        """Calculate bounce rate for a specific post"""
-        # This would need the actual events - simplified calculation
-        return 60  # Placeholder
-    
     def get_client_ip(self, request):
         """Get client IP address"""
         x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
@@ -497,19 +569,24 @@ class UserBehaviorAnalytics:
     
     def get_device_type(self, request):
         """Determine device type from user agent"""
-        user_agent = request.META.get('HTTP_USER_AGENT', '').lower()
-        
-        if 'mobile' in user_agent:
-            return 'mobile'
-        elif 'tablet' in user_agent:
-            return 'tablet'
-        else:
-            return 'desktop'
+        return classify_device(request.META.get('HTTP_USER_AGENT', ''))
     
     def get_connection_type(self, request):
-        """Get connection type if available"""
-        # This would require additional headers or JavaScript detection
-        return request.META.get('HTTP_NETWORK_TYPE', 'unknown')
+        """Get connection type if available (Network Information client hint)"""
+        return classify_connection(request.META.get('HTTP_ECT') or request.META.get('HTTP_NETWORK_TYPE'))
+
+
+# Buckets stored on CoreWebVitals.connection_type
+CONNECTION_TYPES = ('slow-2g', '2g', '3g', '4g')
+
+def classify_device(user_agent):
+    """'mobile', 'tablet', 'desktop' or 'bot' from a user agent string (memoised)"""
+    return classify_user_agent(user_agent).device_type
+
+def classify_connection(value):
+    """Normalise an effectiveType / ECT value into CONNECTION_TYPES or 'unknown'"""
+    value = str(value or '').strip().lower()
+    return value if value in CONNECTION_TYPES else 'unknown'
 
 
 # JavaScript for client-side analytics
@@ -0,0 +1,353 @@
+# blogs/analytics_buffer.py
+"""Buffered analytics event ingestion.
+
+`UserBehaviorAnalytics.track_custom_event` no longer writes a row (and makes
+a GA4 call) inside the request. It serialises the event and appends it to a
+bounded buffer; `flush()` drains the buffer with `bulk_create` and forwards
+the same events to GA4 in Measurement Protocol batches of up to 25.
+
+Two buffers share that flush path:
+
+* 'redis' - an RPUSH onto a Redis list shared by every web process, drained
+  by `manage.py flush_analytics` or the run_worker loop.
+* 'memory' - a per-process deque drained by a daemon thread, used in DEBUG
+  and as the fallback when Redis is unreachable. It is flushed once more at
+  interpreter exit.
+
+Both are capped at ANALYTICS_BUFFER['MAX_EVENTS']. When full, the oldest
+events are dropped and counted; `stats()` reports the counters.
+
+A batch whose `bulk_create` fails is put back at the head of its buffer and
+the flush stops, so a transient database error loses nothing. After
+MAX_WRITE_ATTEMPTS failures in a row the batch is set aside instead (Redis:
+the 'analytics:dead-letter' list, replayed with `flush_analytics
+--replay-dead-letter`; memory: dropped and counted), so one bad batch
+cannot block the buffer.
+"""
+import atexit
+import json
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .redis_client import get_redis, redis_errors
+from .user_agents import classify as classify_user_agent
+
+BUFFER_KEY = 'analytics:events'
+DROPPED_KEY = 'analytics:dropped'
+FLUSH_LOCK_KEY = 'analytics:flush-lock'
+DEAD_LETTER_KEY = 'analytics:dead-letter'
+ATTEMPTS_KEY = 'analytics:write-attempts'
+MAX_WRITE_ATTEMPTS = 3  # Consecutive failed writes before a batch is set aside
+
+GA4_ENDPOINT = 'https://www.google-analytics.com/mp/collect'
+GA4_MAX_EVENTS = 25  # Measurement Protocol limit per request
+
+_memory = deque()
+_memory_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_start_lock = threading.Lock()
+_flusher = None
+_memory_attempts = 0
+_counters = {'dropped': 0, 'flushed': 0, 'failed': 0, 'ga4_requests': 0, 'ga4_errors': 0}
+_session = None
+
+
+def conf():
+    return settings.ANALYTICS_BUFFER
+
+
+def _use_redis():
+    return conf()['BACKEND'] == 'redis'
+
+
+def serialize_event(event):
+    """Turn an unsaved AnalyticsEvent into a JSON string for the buffer."""
+    return json.dumps({
+        'event_type': event.event_type,
+        'user_id': event.user_id,
+        'session_id': event.session_id,
+        'content_type_id': event.content_type_id,
+        'object_id': event.object_id,
+        'event_data': event.event_data,
+        'user_agent': event.user_agent,
+        'ip_address': event.ip_address,
+        'referrer': event.referrer,
+        'device_type': event.device_type,
+        'browser_family': event.browser_family,
+        'is_bot': event.is_bot,
+        'timestamp': event.timestamp or timezone.now(),
+    }, cls=DjangoJSONEncoder)
+
+
+def deserialize_event(raw):
+    from .analytics import AnalyticsEvent
+
+    data = json.loads(raw)
+    data['timestamp'] = parse_datetime(data['timestamp'])
+    if 'device_type' not in data:
+        # Buffered before user-agent classification existed
+        data['device_type'], data['browser_family'], data['is_bot'] = classify_user_agent(data['user_agent'])
+    return AnalyticsEvent(**data)
+
+
+def enqueue(event):
+    """Buffer one unsaved AnalyticsEvent. Never touches the database."""
+    enqueue_many([event])
+
+
+def enqueue_many(events):
+    """Buffer several unsaved AnalyticsEvents with a single push."""
+    raws = [serialize_event(event) for event in events]
+    if not raws:
+        return
+    if _use_redis():
+        try:
+            _redis_push(raws)
+            return
+        except redis_errors() as e:
+            print(f"[Analytics] Redis unavailable, buffering in memory: {e}")
+    _memory_push(raws)
+
+
+def _redis_push(raws):
+    max_events = conf()['MAX_EVENTS']
+    pipe = get_redis().pipeline(transaction=False)
+    pipe.rpush(BUFFER_KEY, *raws)
+    pipe.ltrim(BUFFER_KEY, -max_events, -1)
+    length, _ = pipe.execute()
+    if length > max_events:
+        get_redis().incrby(DROPPED_KEY, min(length - max_events, len(raws)))
+
+
+def _memory_push(raws):
+    with _memory_lock:
+        overflow = len(_memory) + len(raws) - conf()['MAX_EVENTS']
+        for _ in range(max(0, min(overflow, len(_memory)))):
+            _memory.popleft()
+        _counters['dropped'] += max(0, overflow)
+        _memory.extend(raws[-conf()['MAX_EVENTS']:])
+    _ensure_flusher()
+
+
+def _ensure_flusher():
+    """Start this process's background flusher on first use."""
+    global _flusher
+    if _flusher is not None and _flusher.is_alive():
+        return
+    with _start_lock:
+        if _flusher is not None and _flusher.is_alive():
+            return
+        _flusher = threading.Thread(target=_flush_forever, name='analytics-flusher', daemon=True)
+        _flusher.start()
+
+
+def _flush_forever():
+    while True:
+        time.sleep(conf()['FLUSH_INTERVAL'])
+        try:
+            _flush_memory()
+        except Exception as e:
+            print(f"[Analytics] Background flush failed: {e}")
+        finally:
+            close_old_connections()
+
+
+def _take_memory(limit):
+    with _memory_lock:
+        return [_memory.popleft() for _ in range(min(limit, len(_memory)))]
+
+
+def _take_redis(client, limit):
+    pipe = client.pipeline(transaction=True)
+    pipe.lrange(BUFFER_KEY, 0, limit - 1)
+    pipe.ltrim(BUFFER_KEY, limit, -1)
+    raws, _ = pipe.execute()
+    return raws
+
+
+class BatchWriteError(Exception):
+    pass
+
+
+def _flush_memory():
+    global _memory_attempts
+    flushed = 0
+    with _flush_lock:
+        while True:
+            raws = _take_memory(conf()['BATCH_SIZE'])
+            if not raws:
+                break
+            try:
+                flushed += _write_batch(raws)
+            except BatchWriteError:
+                _memory_attempts += 1
+                if _memory_attempts >= MAX_WRITE_ATTEMPTS:
+                    _memory_attempts = 0
+                    _counters['dropped'] += len(raws)
+                    print(f"[Analytics] Dropping {len(raws)} events after {MAX_WRITE_ATTEMPTS} failed writes")
+                else:
+                    with _memory_lock:
+                        _memory.extendleft(reversed(raws))
+                break
+            _memory_attempts = 0
+    return flushed
+
+
+def _flush_redis():
+    client = get_redis()
+    # One drainer at a time keeps batches in arrival order
+    if not client.set(FLUSH_LOCK_KEY, '1', nx=True, ex=300):
+        return 0
+    flushed = 0
+    retrying = True
+    try:
+        while True:
+            raws = _take_redis(client, conf()['BATCH_SIZE'])
+            if not raws:
+                break
+            try:
+                flushed += _write_batch(raws)
+            except BatchWriteError:
+                _requeue_redis(client, raws)
+                break
+            if retrying:
+                # The batch at the head went through: reset its failure count
+                client.delete(ATTEMPTS_KEY)
+                retrying = False
+    finally:
+        client.delete(FLUSH_LOCK_KEY)
+    return flushed
+
+
+def _requeue_redis(client, raws):
+    """Put a failed batch back at the head of the buffer, or into the
+    dead-letter list once it has failed MAX_WRITE_ATTEMPTS times."""
+    try:
+        attempts = client.incr(ATTEMPTS_KEY)
+        pipe = client.pipeline(transaction=True)
+        if attempts >= MAX_WRITE_ATTEMPTS:
+            print(f"[Analytics] Moving {len(raws)} events to {DEAD_LETTER_KEY} after {attempts} failed writes")
+            pipe.rpush(DEAD_LETTER_KEY, *raws)
+            pipe.ltrim(DEAD_LETTER_KEY, -conf()['MAX_EVENTS'], -1)
+            pipe.delete(ATTEMPTS_KEY)
+        else:
+            pipe.lpush(BUFFER_KEY, *reversed(raws))
+        pipe.execute()
+    except redis_errors() as e:
+        print(f"[Analytics] Redis unavailable, keeping failed batch in memory: {e}")
+        _memory_push(raws)
+
+
+def replay_dead_letter():
+    """Move dead-lettered events back to the end of the buffer. Returns the count."""
+    client = get_redis()
+    pipe = client.pipeline(transaction=True)
+    pipe.lrange(DEAD_LETTER_KEY, 0, -1)
+    pipe.delete(DEAD_LETTER_KEY)
+    raws, _ = pipe.execute()
+    if raws:
+        _redis_push(raws)
+    return len(raws)
+
+
+def flush():
+    """Drain every buffer this process can see. Returns events written."""
+    flushed = _flush_memory()
+    if _use_redis():
+        try:
+            flushed += _flush_redis()
+        except redis_errors() as e:
+            print(f"[Analytics] Redis flush skipped: {e}")
+    return flushed
+
+
+def _write_batch(raws):
+    from .analytics import AnalyticsEvent
+
+    events = []
+    for raw in raws:
+        try:
+            events.append(deserialize_event(raw))
+        except (ValueError, TypeError) as e:
+            _counters['failed'] += 1
+            print(f"[Analytics] Discarding malformed buffered event: {e}")
+
+    try:
+        AnalyticsEvent.objects.bulk_create(events, batch_size=conf()['BATCH_SIZE'])
+    except Exception as e:
+        # The caller puts the raw batch back
+        _counters['failed'] += len(events)
+        print(f"[Analytics] Failed to write {len(events)} events: {e}")
+        raise BatchWriteError(str(e)) from e
+
+    _counters['flushed'] += len(events)
+    send_to_ga4(events)
+    return len(events)
+
+
+def _ga4_configured():
+    return bool(getattr(settings, 'GA4_MEASUREMENT_ID', None) and getattr(settings, 'GA4_API_SECRET', None))
+
+
+def send_to_ga4(events):
+    """Forward events to GA4, one request per client_id per 25 events."""
+    if not _ga4_configured():
+        return
+    import requests
+
+    global _session
+    if _session is None:
+        _session = requests.Session()
+
+    by_client = {}
+    for event in events:
+        by_client.setdefault(event.user_id or 'anonymous', []).append({
+            'name': event.event_type,
+            'params': event.event_data or {},
+        })
+
+    params = {'measurement_id': settings.GA4_MEASUREMENT_ID, 'api_secret': settings.GA4_API_SECRET}
+    for client_id, ga_events in by_client.items():
+        for start in range(0, len(ga_events), GA4_MAX_EVENTS):
+            payload = {'client_id': client_id, 'events': ga_events[start:start + GA4_MAX_EVENTS]}
+            _counters['ga4_requests'] += 1
+            try:
+                _session.post(GA4_ENDPOINT, params=params, json=payload, timeout=conf()['GA4_TIMEOUT'])
+            except requests.exceptions.RequestException:
+                _counters['ga4_errors'] += 1  # Fail silently for analytics
+
+
+def stats():
+    """Buffer depth and counters for this process (plus Redis when used)."""
+    with _memory_lock:
+        result = dict(_counters, memory_buffered=len(_memory))
+    if _use_redis():
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            pipe.llen(BUFFER_KEY)
+            pipe.get(DROPPED_KEY)
+            pipe.llen(DEAD_LETTER_KEY)
+            buffered, dropped, dead = pipe.execute()
+            result['redis_buffered'] = buffered
+            result['redis_dropped'] = int(dropped or 0)
+            result['redis_dead_letter'] = dead
+        except redis_errors():
+            pass
+    return result
+
+
+@atexit.register
+def _flush_at_exit():
+    if not _memory:
+        return
+    try:
+        _flush_memory()
+    except Exception as e:
+        print(f"[Analytics] Flush at exit failed, {len(_memory)} events lost: {e}")
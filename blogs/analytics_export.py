@@ -0,0 +1,276 @@
+# blogs/analytics_export.py
+"""Streaming exports of raw analytics rows to CSV or Parquet.
+
+Rows are read with a server-side cursor (QuerySet.iterator(chunk_size=...))
+in id order and written one batch at a time, so memory use does not grow
+with the size of the export. Parquet output gets one row group per batch.
+
+Exports are resumable: rows are ordered by id, and `after_id` restarts the
+export after the last id that was written. export_to_path() keeps a
+checkpoint file next to the output and picks up from it automatically.
+
+    for chunk in stream(dataset, 'csv', start, end):   # bytes, for HTTP
+    export_to_path(dataset, 'parquet', start, end, path)
+"""
+import csv
+import io
+import json
+import os
+from datetime import date, datetime, timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.utils import timezone
+
+from ads.models import AdClick, AdImpression
+
+from .analytics import AnalyticsEvent
+
+DATASETS = {
+    'events': AnalyticsEvent,
+    'ad_impressions': AdImpression,
+    'ad_clicks': AdClick,
+}
+FORMATS = ('csv', 'parquet')
+
+
+def conf():
+    return settings.ANALYTICS_EXPORT
+
+
+def columns(model):
+    """Concrete columns in table order (foreign keys as their *_id)."""
+    return [field for field in model._meta.concrete_fields]
+
+
+def rows(dataset, start, end, after_id=0):
+    """Value tuples of `dataset` with start <= timestamp < end and
+    id > after_id, in id order, read through a server-side cursor."""
+    model = DATASETS[dataset]
+    queryset = model._base_manager.filter(
+        timestamp__gte=start,
+        timestamp__lt=end,
+        pk__gt=after_id,
+    ).order_by('pk').values_list(*[field.attname for field in columns(model)])
+    return queryset.iterator(chunk_size=conf()['CHUNK_SIZE'])
+
+
+def day_range(first, last=None):
+    """Aware [start, end) datetimes covering the days first..last."""
+    start = timezone.make_aware(datetime.combine(first, datetime.min.time()))
+    end = timezone.make_aware(datetime.combine((last or first) + timedelta(days=1), datetime.min.time()))
+    return start, end
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _csv_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(',', ':'))
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def arrow_schema(model):
+    import pyarrow as pa
+
+    types = {
+        'AutoField': pa.int64(),
+        'BigAutoField': pa.int64(),
+        'IntegerField': pa.int64(),
+        'BigIntegerField': pa.int64(),
+        'PositiveIntegerField': pa.int64(),
+        'ForeignKey': pa.int64(),
+        'FloatField': pa.float64(),
+        'BooleanField': pa.bool_(),
+        'DateTimeField': pa.timestamp('us', tz='UTC'),
+        'DateField': pa.date32(),
+    }
+    return pa.schema([
+        pa.field(field.attname, types.get(field.get_internal_type(), pa.string()))
+        for field in columns(model)
+    ])
+
+
+def _arrow_table(schema, batch):
+    import pyarrow as pa
+
+    arrays = []
+    for field, values in zip(schema, zip(*batch)):
+        if pa.types.is_string(field.type):
+            values = [json.dumps(v, separators=(',', ':')) if isinstance(v, (dict, list)) else v for v in values]
+        arrays.append(pa.array(values, type=field.type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+class _Sink(io.RawIOBase):
+    """Write-only file that hands its bytes to the caller after each batch."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.buffer += data
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+def stream(dataset, fmt, start, end, after_id=0, batch_size=None, progress=None,
+           max_rows=None, header=True):
+    """Yield the export as byte chunks, one per batch of rows (CSV starts
+    with a header chunk unless header=False), stopping after `max_rows`
+    rows if given. `progress(rows, last_id)` is called before each batch
+    is yielded."""
+    model = DATASETS[dataset]
+    batch_size = batch_size or conf()['BATCH_SIZE']
+    sink = _Sink()
+    total = 0
+
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+
+        schema = arrow_schema(model)
+        writer = pq.ParquetWriter(sink, schema, compression=conf()['PARQUET_COMPRESSION'])
+        write = lambda batch: writer.write_table(_arrow_table(schema, batch), row_group_size=len(batch))
+    else:
+        text = io.TextIOWrapper(sink, encoding='utf-8', newline='', write_through=True)
+        writer = csv.writer(text)
+        if header:
+            writer.writerow([field.attname for field in columns(model)])
+            yield sink.drain()
+        write = lambda batch: writer.writerows([[_csv_value(v) for v in row] for row in batch])
+
+    source = rows(dataset, start, end, after_id)
+    if max_rows:
+        source = islice(source, max_rows)
+    for batch in batches(source, batch_size):
+        write(batch)
+        total += len(batch)
+        if progress:
+            progress(total, batch[-1][0])
+        yield sink.drain()
+
+    if fmt == 'parquet':
+        writer.close()
+    yield sink.drain()
+
+
+def _load_checkpoint(path):
+    try:
+        with open(path) as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_checkpoint(path, state):
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w') as handle:
+        json.dump(state, handle)
+    os.replace(tmp, path)
+
+
+def export_to_path(dataset, fmt, start, end, path, resume=True, batch_size=None, progress=None):
+    """Export to `path` and return the number of rows written by this run.
+
+    CSV goes to one file. A checkpoint (`path`.checkpoint) records the last
+    id and byte offset after every batch, so an interrupted export is
+    truncated back to the last complete batch and continued.
+
+    Parquet goes to a directory of part files, each closed after
+    PARQUET_PART_ROWS rows. The checkpoint lists the finished parts; an
+    interrupted part is deleted and re-exported from the last finished one.
+    """
+    checkpoint_path = f'{path}.checkpoint'
+    key = {'dataset': dataset, 'format': fmt, 'start': start.isoformat(), 'end': end.isoformat()}
+    state = _load_checkpoint(checkpoint_path) if resume else None
+    if not state or state.get('key') != key or (fmt == 'csv' and not os.path.exists(path)):
+        state = {'key': key, 'last_id': 0, 'rows': 0, 'bytes': 0, 'parts': []}
+
+    if fmt == 'parquet':
+        written = _export_parquet_parts(dataset, start, end, path, state, checkpoint_path, batch_size, progress)
+    else:
+        written = _export_csv(dataset, start, end, path, state, checkpoint_path, batch_size, progress)
+
+    state['complete'] = True
+    _save_checkpoint(checkpoint_path, state)
+    return written
+
+
+def _export_csv(dataset, start, end, path, state, checkpoint_path, batch_size, progress):
+    written = 0
+    resuming = bool(state['bytes'])
+
+    def track(rows_so_far, last_id):
+        nonlocal written
+        state['rows'] += rows_so_far - written
+        state['last_id'] = last_id
+        written = rows_so_far
+        if progress:
+            progress(state['rows'], last_id)
+
+    with open(path, 'r+b' if resuming else 'wb') as handle:
+        # Drop anything after the last checkpointed batch
+        handle.seek(state['bytes'])
+        handle.truncate()
+        for chunk in stream(dataset, 'csv', start, end, state['last_id'], batch_size,
+                            progress=track, header=not resuming):
+            handle.write(chunk)
+            handle.flush()
+            state['bytes'] = handle.tell()
+            _save_checkpoint(checkpoint_path, state)
+    return written
+
+
+def _export_parquet_parts(dataset, start, end, path, state, checkpoint_path, batch_size, progress):
+    os.makedirs(path, exist_ok=True)
+    finished = set(state['parts'])
+    for name in os.listdir(path):
+        if name.endswith('.parquet') and name not in finished:
+            os.remove(os.path.join(path, name))  # Left over from an interrupted run
+
+    written = 0
+    while True:
+        part = {'rows': 0, 'last_id': state['last_id']}
+
+        def track(rows_so_far, last_id):
+            part['rows'], part['last_id'] = rows_so_far, last_id
+            if progress:
+                progress(state['rows'] + rows_so_far, last_id)
+
+        name = f'part-{len(state["parts"]):05d}.parquet'
+        part_path = os.path.join(path, name)
+        with open(part_path, 'wb') as handle:
+            for chunk in stream(dataset, 'parquet', start, end, state['last_id'], batch_size,
+                                progress=track, max_rows=conf()['PARQUET_PART_ROWS']):
+                handle.write(chunk)
+
+        if not part['rows']:
+            os.remove(part_path)
+            return written
+
+        state['parts'].append(name)
+        state['rows'] += part['rows']
+        state['last_id'] = part['last_id']
+        written += part['rows']
+        _save_checkpoint(checkpoint_path, state)
@@ -0,0 +1,164 @@
+# blogs/analytics_ingest.py
+"""Batched ingest for the analytics beacon and the events API.
+
+The browser sends one beacon per page lifetime (navigator.sendBeacon on
+visibilitychange). The body is a JSON array of page records:
+
+    [{"url": page_url,
+      "o": "blogs.blog:12",              # optional content reference
+      "c": "4g",                         # navigator.connection.effectiveType
+      "e": [[event_type, epoch_ms, {event_data}], ...],
+      "w": {"lcp": 1.9, "fid": 12, "cls": 0.02, "fcp": 0.8, "ttfb": 0.2}}]
+
+Visitor and session ids come from the request (blogs.visitor_id), never
+from the client. Content references are checked with one query per content
+type for the whole batch. Device and connection buckets are classified once per
+request. Events go to the analytics buffer in one push, and Web Vitals are
+written with a single bulk_create.
+"""
+import json
+import math
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.utils import timezone
+
+from .analytics import (
+    WEB_VITALS_METRICS,
+    AnalyticsEvent,
+    CoreWebVitals,
+    UserBehaviorAnalytics,
+    classify_connection,
+    classify_device,
+)
+from .analytics_buffer import enqueue_many
+from .visitor_id import visitor_ids
+
+EVENT_TYPES = {value for value, _ in AnalyticsEvent.EVENT_TYPES}
+CLOCK_SKEW = timedelta(days=1)  # Client timestamps outside [now - 1 day, now] are clamped
+
+
+def conf():
+    return settings.ANALYTICS_BEACON
+
+
+def parse_beacon(body):
+    """Decode a beacon body into a list of page records, or raise ValueError."""
+    try:
+        payload = json.loads(body)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise ValueError('Beacon body is not JSON')
+    if isinstance(payload, dict):
+        payload = [payload]
+    if not isinstance(payload, list):
+        raise ValueError('Beacon body must be a list of page records')
+    return [page for page in payload[:conf()['MAX_PAGES']] if isinstance(page, dict)]
+
+
+def _content_type(label):
+    """ContentType for an allowed 'app_label.model' label (cached by Django)."""
+    if label not in conf()['CONTENT_MODELS']:
+        return None
+    try:
+        return ContentType.objects.get_by_natural_key(*label.split('.', 1))
+    except ContentType.DoesNotExist:
+        return None
+
+
+def existing_objects(pairs):
+    """Filter (ContentType, object_id) pairs down to objects that exist,
+    with one query per content type."""
+    ids_by_type = defaultdict(set)
+    for content_type, object_id in pairs:
+        ids_by_type[content_type].add(object_id)
+
+    valid = set()
+    for content_type, ids in ids_by_type.items():
+        model = content_type.model_class()
+        if model is None:
+            continue
+        for pk in model._base_manager.filter(pk__in=ids).values_list('pk', flat=True):
+            valid.add((content_type, pk))
+    return valid
+
+
+def _parse_ref(ref):
+    if not isinstance(ref, str):
+        return None
+    label, _, object_id = ref.partition(':')
+    content_type = _content_type(label)
+    if content_type is None or not object_id.isdigit():
+        return None
+    return content_type, int(object_id)
+
+
+def _timestamp(value, now):
+    try:
+        moment = datetime.fromtimestamp(float(value) / 1000, tz=dt_timezone.utc)
+    except (TypeError, ValueError, OverflowError, OSError):
+        return now
+    return min(max(moment, now - CLOCK_SKEW), now)
+
+
+def _metric(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if math.isfinite(value) and value >= 0 else None
+
+
+def ingest_pages(pages, request):
+    """Store the events and Web Vitals of parsed beacon pages.
+    Returns (events_buffered, vitals_written)."""
+    analytics = UserBehaviorAnalytics()
+    now = timezone.now()
+    device_type = classify_device(request.META.get('HTTP_USER_AGENT', ''))
+    user_id, session_id = visitor_ids(request)
+    max_events = conf()['MAX_EVENTS']
+
+    refs = {ref: _parse_ref(ref) for ref in {page.get('o') for page in pages if isinstance(page.get('o'), str)}}
+    valid = existing_objects(ref for ref in refs.values() if ref)
+
+    events = []
+    vitals = []
+    for page in pages:
+        ref = refs.get(page.get('o')) if isinstance(page.get('o'), str) else None
+        content_type, object_id = ref if ref in valid else (None, None)
+
+        for item in page.get('e') or []:
+            if len(events) >= max_events:
+                break
+            if not isinstance(item, list) or not item or not isinstance(item[0], str) or item[0] not in EVENT_TYPES:
+                continue
+            data = item[2] if len(item) > 2 and isinstance(item[2], dict) else {}
+            events.append(analytics.build_event(
+                item[0],
+                user_id=user_id,
+                session_id=session_id,
+                content_type=content_type,
+                object_id=object_id,
+                event_data=data,
+                request=request,
+                timestamp=_timestamp(item[1] if len(item) > 1 else None, now),
+            ))
+
+        metrics = page.get('w')
+        if isinstance(metrics, dict):
+            values = {metric: _metric(metrics.get(metric)) for metric in WEB_VITALS_METRICS}
+            url = str(page.get('url') or '')[:200]
+            if url and any(value is not None for value in values.values()):
+                vitals.append(CoreWebVitals(
+                    url=url,
+                    session_id=session_id,
+                    device_type=device_type,
+                    connection_type=classify_connection(page.get('c') or request.META.get('HTTP_ECT')),
+                    **values,
+                ))
+
+    enqueue_many(events)
+    if vitals:
+        CoreWebVitals.objects.bulk_create(vitals)
+    return len(events), len(vitals)
@@ -0,0 +1,274 @@
+# blogs/analytics_rollup.py
+"""Incremental per-post, per-day rollups of AnalyticsEvent.
+
+`run()` reads events past the watermark (AnalyticsRollupState.last_event_id),
+finds the (object, day) pairs they touch, and recomputes those PostDailyStats
+rows from the raw events of that day with a few grouped queries. Only
+touched days are recomputed. Sessions, uniques and bounces are not additive
+across batches, so rows are recomputed instead of incremented, and running
+the job twice gives the same rows. CoreWebVitals get the same treatment per
+URL per day in WebVitalsDailyStats, under their own watermark.
+
+Each row also carries mergeable sketches (blogs/sketches.py): HyperLogLogs
+of the day's visitors and sessions, and a t-digest per Web Vitals metric.
+Reports merge them across the date range for unique counts and
+percentiles, in constant memory.
+
+The report methods on UserBehaviorAnalytics read these tables, so a
+30-day report costs the same few indexed queries however many events there
+are. Reports lag the raw events by one rollup interval plus
+ANALYTICS_ROLLUP['LAG'], which keeps the watermark behind rows inserted
+too recently to be sure they have committed.
+"""
+from collections import Counter, defaultdict
+from datetime import datetime, time, timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .analytics import (
+    ROLLUP_SUM_FIELDS,
+    WEB_VITALS_METRICS,
+    AnalyticsEvent,
+    AnalyticsRollupState,
+    CoreWebVitals,
+    PostDailyStats,
+    WebVitalsDailyStats,
+)
+from .sketches import HyperLogLog, TDigest
+
+WATERMARK = 'post_daily_stats'
+VITALS_WATERMARK = 'web_vitals_daily_stats'
+
+ENGAGEMENT_EVENTS = ['comment_posted', 'newsletter_signup', 'link_clicked']
+CONVERSION_EVENTS = ['newsletter_signup', 'comment_posted', 'download']
+PASSIVE_EVENTS = ['page_view', 'scroll_depth', 'time_on_page']
+
+MAX_REFERRERS = 50  # Per row; reports show the top 10
+
+
+def _day_bounds(day):
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(day, time.min), tz)
+    end = timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min), tz)
+    return start, end
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def recompute_day(content_type_id, object_ids, day):
+    """Rebuild the PostDailyStats rows of `object_ids` for `day`."""
+    start, end = _day_bounds(day)
+    events = AnalyticsEvent.objects.filter(
+        content_type_id=content_type_id,
+        object_id__in=object_ids,
+        timestamp__gte=start,
+        timestamp__lt=end,
+    )
+
+    stats = {}
+    for row in events.values('object_id').annotate(
+        total_events=Count('id'),
+        views=Count('id', filter=Q(event_type='page_view')),
+        unique_visitors=Count('user_id', filter=Q(event_type='page_view'), distinct=True),
+        sessions=Count('session_id', distinct=True),
+        engaged_sessions=Count('session_id', filter=Q(event_type__in=ENGAGEMENT_EVENTS), distinct=True),
+        conversion_sessions=Count('session_id', filter=Q(event_type__in=CONVERSION_EVENTS), distinct=True),
+        interaction_events=Count('id', filter=~Q(event_type__in=PASSIVE_EVENTS)),
+        scroll_depth_count=Count('id', filter=Q(event_type='scroll_depth')),
+        time_on_page_count=Count('id', filter=Q(event_type='time_on_page')),
+        mobile=Count('id', filter=Q(device_type='mobile')),
+        tablet=Count('id', filter=Q(device_type='tablet')),
+    ):
+        object_id = row.pop('object_id')
+        row['desktop'] = row['total_events'] - row['mobile'] - row['tablet']
+        row.update(bounces=0, scroll_depth_sum=0.0, time_on_page_sum=0.0, referrers={})
+        stats[object_id] = row
+
+    # A bounce is a session whose only event is a page view
+    bounced = events.values('object_id', 'session_id').annotate(
+        n=Count('id'),
+        page_views=Count('id', filter=Q(event_type='page_view')),
+    ).filter(n=1, page_views=1).values_list('object_id', flat=True)
+    for object_id, count in Counter(bounced).items():
+        stats[object_id]['bounces'] = count
+
+    # Durations and depths live in event_data, which the client controls,
+    # so they are summed here rather than cast in SQL.
+    for object_id, event_type, data in events.filter(
+        event_type__in=['scroll_depth', 'time_on_page']
+    ).values_list('object_id', 'event_type', 'event_data').iterator(chunk_size=2000):
+        if not isinstance(data, dict):
+            continue
+        if event_type == 'scroll_depth':
+            stats[object_id]['scroll_depth_sum'] += _number(data.get('depth', 0))
+        else:
+            stats[object_id]['time_on_page_sum'] += _number(data.get('duration', 0))
+
+    visitors = defaultdict(HyperLogLog)
+    for object_id, user_id in events.filter(event_type='page_view').values_list(
+        'object_id', 'user_id'
+    ).distinct().iterator(chunk_size=5000):
+        visitors[object_id].add(user_id)
+    sessions = defaultdict(HyperLogLog)
+    for object_id, session_id in events.values_list(
+        'object_id', 'session_id'
+    ).distinct().iterator(chunk_size=5000):
+        sessions[object_id].add(session_id)
+    for object_id, row in stats.items():
+        row['visitor_hll'] = visitors[object_id].to_bytes() if object_id in visitors else None
+        row['session_hll'] = sessions[object_id].to_bytes()
+
+    referrers = events.exclude(referrer='').values('object_id', 'referrer').annotate(
+        count=Count('id')
+    ).order_by('object_id', '-count')
+    for row in referrers:
+        top = stats[row['object_id']]['referrers']
+        if len(top) < MAX_REFERRERS:
+            top[row['referrer']] = row['count']
+
+    rows = [
+        PostDailyStats(content_type_id=content_type_id, object_id=object_id, date=day, **values)
+        for object_id, values in stats.items()
+    ]
+    PostDailyStats.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['content_type', 'object_id', 'date'],
+        update_fields=ROLLUP_SUM_FIELDS + ['referrers', 'visitor_hll', 'session_hll', 'updated_at'],
+    )
+    return len(rows)
+
+
+def recompute_vitals_day(urls, day):
+    """Rebuild the WebVitalsDailyStats rows of `urls` for `day`."""
+    start, end = _day_bounds(day)
+    metrics = list(WEB_VITALS_METRICS)
+    rows = {}
+    for url, *values in CoreWebVitals.objects.filter(
+        url__in=urls, timestamp__gte=start, timestamp__lt=end,
+    ).values_list('url', *metrics).iterator(chunk_size=5000):
+        row = rows.get(url)
+        if row is None:
+            row = rows[url] = {
+                'samples': 0,
+                'metrics': {m: {'count': 0, 'sum': 0.0, 'good': 0, 'digest': TDigest()} for m in metrics},
+            }
+        row['samples'] += 1
+        for metric, value in zip(metrics, values):
+            if value is None:
+                continue
+            summary = row['metrics'][metric]
+            summary['count'] += 1
+            summary['sum'] += value
+            threshold = WEB_VITALS_METRICS[metric]
+            if threshold is not None and value < threshold:
+                summary['good'] += 1
+            summary['digest'].add(value)
+
+    for row in rows.values():
+        for summary in row['metrics'].values():
+            summary['digest'] = summary['digest'].to_dict()
+
+    WebVitalsDailyStats.objects.bulk_create(
+        [WebVitalsDailyStats(url=url, date=day, **row) for url, row in rows.items()],
+        update_conflicts=True,
+        unique_fields=['url', 'date'],
+        update_fields=['samples', 'metrics', 'updated_at'],
+    )
+    return len(rows)
+
+
+def _touched_posts(queryset):
+    """Recompute tasks for the (object, day) rows touched by the events in `queryset`."""
+    touched = defaultdict(set)
+    pairs = queryset.filter(
+        content_type__isnull=False, object_id__isnull=False,
+    ).annotate(day=TruncDate('timestamp')).values_list('content_type_id', 'object_id', 'day').distinct()
+    for content_type_id, object_id, day in pairs.iterator(chunk_size=5000):
+        touched[(content_type_id, day)].add(object_id)
+    return [
+        partial(recompute_day, content_type_id, sorted(ids), day)
+        for (content_type_id, day), ids in sorted(touched.items())
+    ]
+
+
+def _touched_urls(queryset):
+    """Recompute tasks for the (day, urls) touched by the vitals in `queryset`."""
+    touched = defaultdict(set)
+    pairs = queryset.annotate(day=TruncDate('timestamp')).values_list('day', 'url').distinct()
+    for day, url in pairs.iterator(chunk_size=5000):
+        touched[day].add(url)
+    return [
+        partial(recompute_vitals_day, sorted(urls), day)
+        for day, urls in sorted(touched.items())
+    ]
+
+
+def _advance(name, model, touched, chunk_size):
+    """Move watermark `name` over `model` ids, running the recompute tasks
+    `touched(queryset)` returns for each chunk. Returns (ids_covered, rows)."""
+    # Stop short of recently inserted rows: a flush still committing can hold
+    # ids below ones already visible, and those would be skipped for good.
+    # inserted_at is set by the database, unlike the event's own timestamp.
+    settled = timezone.now() - timedelta(seconds=settings.ANALYTICS_ROLLUP['LAG'])
+    watermark = AnalyticsRollupState.objects.filter(name=name).values_list('last_event_id', flat=True).first() or 0
+    max_id = model.objects.filter(
+        id__gt=watermark, inserted_at__lt=settled,
+    ).aggregate(m=Max('id'))['m'] or 0
+    covered = written = 0
+
+    while True:
+        with transaction.atomic():
+            # Row lock: a second rollup waits here instead of doing the same work
+            state, _ = AnalyticsRollupState.objects.get_or_create(name=name)
+            state = AnalyticsRollupState.objects.select_for_update().get(pk=state.pk)
+            lower = state.last_event_id
+            if lower >= max_id:
+                break
+            upper = min(lower + chunk_size, max_id)
+
+            for task in touched(model.objects.filter(id__gt=lower, id__lte=upper)):
+                written += task()
+
+            state.last_event_id = upper
+            state.save(update_fields=['last_event_id', 'updated_at'])
+            covered += upper - lower
+
+    return covered, written
+
+
+def run(chunk_size=None):
+    """Fold events and Web Vitals past their watermarks into the rollups.
+
+    Returns (ids_covered, rows_written).
+    """
+    chunk_size = chunk_size or settings.ANALYTICS_ROLLUP['CHUNK_SIZE']
+    events = _advance(WATERMARK, AnalyticsEvent, _touched_posts, chunk_size)
+    vitals = _advance(VITALS_WATERMARK, CoreWebVitals, _touched_urls, chunk_size)
+    return events[0] + vitals[0], events[1] + vitals[1]
+
+
+def rebuild(days, models=(AnalyticsEvent, CoreWebVitals)):
+    """Recompute every rollup row of the last `days` days from the raw rows
+    of `models` (default: both)."""
+    since = timezone.now() - timedelta(days=days)
+    tasks = []
+    if AnalyticsEvent in models:
+        tasks += _touched_posts(AnalyticsEvent.objects.filter(timestamp__gte=since))
+    if CoreWebVitals in models:
+        tasks += _touched_urls(CoreWebVitals.objects.filter(timestamp__gte=since))
+    written = 0
+    for task in tasks:
+        with transaction.atomic():
+            written += task()
+    return written
@@ -4,7 +4,9 @@ from . import analytics_views
 
 urlpatterns = [
     path('events/', analytics_views.track_events, name='track_events'),
+    path('beacon/', analytics_views.beacon, name='analytics_beacon'),
     path('core-web-vitals/', analytics_views.track_core_web_vitals, name='track_core_web_vitals'),
     path('performance/', analytics_views.get_performance_metrics, name='get_performance_metrics'),
     path('content-insights/', analytics_views.get_content_insights, name='get_content_insights'),
+    path('export/', analytics_views.export_analytics, name='export_analytics'),
 ]
\ No newline at end of file
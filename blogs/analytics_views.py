@@ -1,8 +1,16 @@
 # API Views - blogs/analytics_views.py
-from django.http import JsonResponse
+import time
+from datetime import date
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
+from . import analytics_export
 from .analytics import UserBehaviorAnalytics
+from .analytics_buffer import enqueue_many
+from .analytics_ingest import EVENT_TYPES, existing_objects, ingest_pages, parse_beacon
+from .bot_detection import is_bot
 from .models import Blog
 from django.contrib.contenttypes.models import ContentType
 import json
@@ -11,47 +19,77 @@ import json
 @require_http_methods(["POST"])
 def track_events(request):
     """Track multiple analytics events"""
+    if is_bot(request):
+        return JsonResponse({'status': 'success', 'tracked': 0})
     try:
         data = json.loads(request.body)
-        events = data.get('events', [])
+        # Unknown event types are dropped, as the beacon endpoint does
+        events = [
+            event_data for event_data in data.get('events', [])
+            if isinstance(event_data, dict) and event_data.get('event_type') in EVENT_TYPES
+        ]
         
         analytics = UserBehaviorAnalytics()
         
+        # Resolve content references for the whole batch at once
+        refs = {}
         for event_data in events:
-            # Get content object if specified
-            content_object = None
             if 'content_type' in event_data and 'object_id' in event_data:
                 try:
-                    content_type = ContentType.objects.get(id=event_data['content_type'])
-                    content_object = content_type.get_object_for_this_type(id=event_data['object_id'])
-                except:
-                    pass
-            
-            analytics.track_custom_event(
-                event_type=event_data.get('event_type'),
-                user_id=event_data.get('user_id'),
-                session_id=event_data.get('session_id'),
-                content_object=content_object,
+                    ref = (ContentType.objects.get_for_id(event_data['content_type']), int(event_data['object_id']))
+                except (ContentType.DoesNotExist, TypeError, ValueError):
+                    continue
+                refs[id(event_data)] = ref
+        valid = existing_objects(refs.values())
+        
+        batch = []
+        for event_data in events:
+            content_type, object_id = refs.get(id(event_data), (None, None))
+            if (content_type, object_id) not in valid:
+                content_type = object_id = None
+            batch.append(analytics.build_event(
+                event_type=event_data['event_type'],
+                content_type=content_type,
+                object_id=object_id,
                 event_data=event_data.get('event_data', {}),
                 request=request
-            )
+            ))
+        enqueue_many(batch)
         
         return JsonResponse({'status': 'success', 'tracked': len(events)})
     
     except Exception as e:
         return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
 
+@csrf_exempt
+@require_http_methods(["POST"])
+def beacon(request):
+    """navigator.sendBeacon endpoint: one batched payload per page lifetime"""
+    if is_bot(request):
+        return HttpResponse(status=204)
+    if int(request.META.get('CONTENT_LENGTH') or 0) > settings.ANALYTICS_BEACON['MAX_BYTES']:
+        return HttpResponse(status=413)
+    try:
+        pages = parse_beacon(request.body)
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    
+    ingest_pages(pages, request)
+    return HttpResponse(status=204)
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def track_core_web_vitals(request):
     """Track Core Web Vitals metrics"""
+    if is_bot(request):
+        return JsonResponse({'status': 'success', 'id': None})
     try:
         data = json.loads(request.body)
         
         analytics = UserBehaviorAnalytics()
         vitals = analytics.track_core_web_vitals(
             url=data.get('url'),
-            session_id=data.get('session_id'),
+            session_id=None,
             metrics={
                 'lcp': data.get('lcp'),
                 'fid': data.get('fid'),
@@ -67,6 +105,7 @@ def track_core_web_vitals(request):
     except Exception as e:
         return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
 
+@staff_member_required
 @require_http_methods(["GET"])
 def get_performance_metrics(request):
     """Get site performance metrics"""
@@ -80,6 +119,7 @@ def get_performance_metrics(request):
     except Exception as e:
         return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
 
+@staff_member_required
 @require_http_methods(["GET"])
 def get_content_insights(request):
     """Get content performance insights"""
@@ -105,4 +145,46 @@ def get_content_insights(request):
         return JsonResponse(serialized_insights)
     
     except Exception as e:
-        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
\ No newline at end of file
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+
+@staff_member_required
+@require_http_methods(["GET"])
+def export_analytics(request):
+    """Stream raw analytics rows for a date range as CSV or Parquet.
+    Resume a broken download with ?after_id=<last id received>."""
+    dataset = request.GET.get('dataset', 'events')
+    fmt = request.GET.get('format', 'csv')
+    if dataset not in analytics_export.DATASETS or fmt not in analytics_export.FORMATS:
+        return JsonResponse({'status': 'error', 'message': 'Unknown dataset or format'}, status=400)
+    try:
+        first = date.fromisoformat(request.GET['start'])
+        last = date.fromisoformat(request.GET.get('end') or request.GET['start'])
+        after_id = int(request.GET.get('after_id', 0))
+    except (KeyError, ValueError):
+        return JsonResponse({'status': 'error', 'message': 'start (YYYY-MM-DD) is required'}, status=400)
+    if fmt == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            return JsonResponse({'status': 'error', 'message': 'Parquet export needs pyarrow'}, status=501)
+    
+    start, end = analytics_export.day_range(first, last)
+    started = time.perf_counter()
+    totals = {'rows': 0}
+    
+    def track(rows, last_id):
+        totals['rows'] = rows
+    
+    def body():
+        yield from analytics_export.stream(dataset, fmt, start, end, after_id=after_id, progress=track)
+        elapsed = time.perf_counter() - started
+        print(f"[Analytics export] {dataset} {first}..{last}: {totals['rows']} rows in {elapsed:.1f}s "
+              f"({totals['rows'] / elapsed if elapsed else 0:.0f} rows/s)")
+    
+    filename = f'{dataset}-{first.isoformat()}_{last.isoformat()}.{fmt}'
+    response = StreamingHttpResponse(
+        body(),
+        content_type='text/csv' if fmt == 'csv' else 'application/vnd.apache.parquet',
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,221 @@
+# blogs/bot_detection.py
+"""Crawler and bot detection for the request path.
+
+`is_bot(request)` runs before every write that only makes sense for a
+human visitor: the page-view event, the view counter, analysis refreshes,
+analytics beacons and ad impressions/clicks. Checks run cheapest first and
+stop at the first hit:
+
+* user agent: the precompiled pattern set in user_agents (memoised per UA)
+* crawler IP ranges: published Googlebot/Bingbot/... CIDRs, merged into
+  sorted integer intervals and searched with bisect, O(log n) per lookup
+* headers: real browsers always send Accept and Accept-Language
+* rate: more than RATE_LIMIT article views per RATE_WINDOW from one IP and
+  User-Agent (Redis). Only article views count toward the limit; beacons,
+  ad pixels and other gated requests read it without adding to it, so the
+  readers behind one NAT or proxy are not flagged as one busy client.
+
+The verdict is cached on the request, so gating several write paths costs
+one detection. Every verdict bumps the traffic counters (a Redis hash with
+BACKEND 'redis', per-process counts with 'memory' or while Redis is down),
+read by `manage.py traffic_stats`.
+"""
+import hashlib
+import ipaddress
+import json
+import threading
+from bisect import bisect_right
+from collections import Counter
+
+from django.conf import settings
+
+from .redis_client import get_redis, redis_errors
+from .user_agents import classify
+
+COUNTERS_KEY = 'traffic:counts'
+RATE_KEY = 'traffic:rate:{}'
+
+_ranges = None
+_ranges_lock = threading.Lock()
+_local_counts = Counter()
+
+
+def conf():
+    return settings.BOT_DETECTION
+
+
+def _use_redis():
+    return conf()['BACKEND'] == 'redis'
+
+
+class IPRangeSet:
+    """Membership test for many CIDR blocks.
+
+    Blocks are converted to [first, last] integer intervals per IP version,
+    overlapping and adjacent ones are merged, and lookups bisect the sorted
+    interval starts.
+    """
+
+    def __init__(self, networks=()):
+        intervals = {4: [], 6: []}
+        for network in networks:
+            try:
+                network = ipaddress.ip_network(network.strip(), strict=False)
+            except ValueError:
+                print(f"[Bot detection] Ignoring invalid network: {network!r}")
+                continue
+            intervals[network.version].append(
+                (int(network.network_address), int(network.broadcast_address))
+            )
+
+        self._starts = {}
+        self._ends = {}
+        for version, spans in intervals.items():
+            merged = []
+            for first, last in sorted(spans):
+                if merged and first <= merged[-1][1] + 1:
+                    merged[-1][1] = max(merged[-1][1], last)
+                else:
+                    merged.append([first, last])
+            self._starts[version] = [first for first, _ in merged]
+            self._ends[version] = [last for _, last in merged]
+
+    def __len__(self):
+        return sum(len(starts) for starts in self._starts.values())
+
+    def __contains__(self, ip):
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return False
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        value = int(address)
+        index = bisect_right(self._starts[address.version], value) - 1
+        return index >= 0 and value <= self._ends[address.version][index]
+
+
+def _read_ranges_file(path):
+    """CIDRs from a file: one per line, or the JSON published by Google and
+    Bing ({"prefixes": [{"ipv4Prefix": ...} | {"ipv6Prefix": ...}]})."""
+    with open(path) as handle:
+        text = handle.read()
+    if text.lstrip().startswith('{'):
+        prefixes = json.loads(text).get('prefixes', [])
+        return [
+            prefix.get('ipv4Prefix') or prefix.get('ipv6Prefix')
+            for prefix in prefixes
+            if prefix.get('ipv4Prefix') or prefix.get('ipv6Prefix')
+        ]
+    return [line for line in text.splitlines() if line.strip() and not line.startswith('#')]
+
+
+def crawler_ranges():
+    """The process-wide IPRangeSet, built on first use."""
+    global _ranges
+    if _ranges is None:
+        with _ranges_lock:
+            if _ranges is None:
+                networks = list(conf()['CRAWLER_NETWORKS'])
+                for path in conf()['CRAWLER_NETWORK_FILES']:
+                    try:
+                        networks.extend(_read_ranges_file(path))
+                    except (OSError, ValueError) as e:
+                        print(f"[Bot detection] Could not load crawler ranges from {path}: {e}")
+                _ranges = IPRangeSet(networks)
+    return _ranges
+
+
+def get_client_ip(request):
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if x_forwarded_for:
+        return x_forwarded_for.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR') or ''
+
+
+def _over_rate_limit(ip, user_agent, page_view):
+    limit = conf()['RATE_LIMIT']
+    if not limit or not ip or not _use_redis():
+        return False
+    key = RATE_KEY.format(hashlib.sha1(f'{ip}|{user_agent}'.encode()).hexdigest()[:20])
+    try:
+        if not page_view:
+            return int(get_redis().get(key) or 0) > limit
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.set(key, 0, nx=True, ex=conf()['RATE_WINDOW'])
+        pipe.incr(key)
+        _, count = pipe.execute()
+    except redis_errors():
+        return False
+    return count > limit
+
+
+def detect(request, page_view=False):
+    """Why `request` looks automated ('user_agent', 'crawler_ip', 'headers',
+    'rate'), or None for a human visitor. Only a `page_view` adds to the
+    rate window."""
+    if not conf()['ENABLED']:
+        return None
+
+    user_agent = request.META.get('HTTP_USER_AGENT', '')
+    if classify(user_agent).is_bot:
+        return 'user_agent'
+
+    ip = get_client_ip(request)
+    if ip and ip in crawler_ranges():
+        return 'crawler_ip'
+
+    if conf()['REQUIRE_BROWSER_HEADERS'] and not (
+        request.META.get('HTTP_ACCEPT') and request.META.get('HTTP_ACCEPT_LANGUAGE')
+    ):
+        return 'headers'
+
+    if _over_rate_limit(ip, user_agent, page_view):
+        return 'rate'
+    return None
+
+
+def _count(reason):
+    fields = ['human'] if reason is None else ['bot', f'bot:{reason}']
+    if not _use_redis():
+        _local_counts.update(fields)
+        return
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for field in fields:
+            pipe.hincrby(COUNTERS_KEY, field, 1)
+        pipe.execute()
+    except redis_errors():
+        _local_counts.update(fields)
+
+
+def is_bot(request, page_view=False):
+    """True if the write paths should skip `request`. Detected (and
+    counted) once per request; pass `page_view` from the article view."""
+    if not hasattr(request, '_bot_reason'):
+        request._bot_reason = detect(request, page_view)
+        if conf()['ENABLED']:
+            _count(request._bot_reason)
+    return request._bot_reason is not None
+
+
+def traffic_counts():
+    """{'human': n, 'bot': n, 'bot:<reason>': n} since the last reset."""
+    counts = Counter(_local_counts)
+    if not _use_redis():
+        return dict(counts)
+    try:
+        counts.update({field: int(n) for field, n in get_redis().hgetall(COUNTERS_KEY).items()})
+    except redis_errors():
+        pass
+    return dict(counts)
+
+
+def reset_counts():
+    _local_counts.clear()
+    if not _use_redis():
+        return
+    try:
+        get_redis().delete(COUNTERS_KEY)
+    except redis_errors():
+        pass
@@ -0,0 +1,182 @@
+# blogs/document.py
+"""One tokenized representation of a post, shared by the analyzers.
+
+AIContentIntelligence, VoiceSearchOptimizer and AILinkBuilder all read the
+same body. A Document splits it once and memoizes every view of it as a
+lazily computed property, so one analysis tokenizes the text exactly once,
+whichever analyzers run:
+
+    text            plain text (the stored Blog.plain_text for posts)
+    sentences       nltk.sent_tokenize(text)
+    tokens          nltk.word_tokenize(text)
+    lower_tokens    the tokens, lowercased
+    words           text.split(), what the word counts and ratios use
+    lower_words     the words, lowercased
+    paragraphs      non-empty blocks between blank lines, stripped
+    headers         [Header(level, text)] from the HTML
+    links           [Link(url, text)] from the HTML
+    syllables       {lowercase word: syllable count}
+
+Document.for_post(post) returns the same Document for the same revision of
+a post (title and body hash) from a small per-process LRU, so the content,
+voice and link analyses of one post share it.
+"""
+import hashlib
+import re
+import threading
+from collections import Counter, OrderedDict
+from functools import cached_property, lru_cache
+from typing import NamedTuple
+
+from django.utils.html import strip_tags
+
+HEADER_RE = re.compile(r'<h([1-6])\b[^>]*>(.*?)</h\1\s*>', re.IGNORECASE | re.DOTALL)
+LINK_RE = re.compile(r'<a\b[^>]*?\bhref=["\']([^"\']*)["\'][^>]*>(.*?)</a\s*>', re.IGNORECASE | re.DOTALL)
+RECENT_DOCUMENTS = 64  # Per-process LRU of Document.for_post results
+
+_recent = OrderedDict()
+_recent_lock = threading.Lock()
+_punkt_checked = False
+
+
+class Header(NamedTuple):
+    level: int
+    text: str
+
+
+class Link(NamedTuple):
+    url: str
+    text: str
+
+    @property
+    def external(self):
+        return self.url.startswith(('http://', 'https://'))
+
+
+@lru_cache(maxsize=50000)
+def count_syllables(word):
+    """Simple syllable counting, cached per word (words repeat across a post
+    and across posts)."""
+    word = word.lower()
+    vowels = 'aeiouy'
+    syllable_count = 0
+    prev_was_vowel = False
+
+    for char in word:
+        if char in vowels:
+            if not prev_was_vowel:
+                syllable_count += 1
+            prev_was_vowel = True
+        else:
+            prev_was_vowel = False
+
+    # Handle silent 'e'
+    if word.endswith('e') and syllable_count > 1:
+        syllable_count -= 1
+
+    return max(syllable_count, 1)
+
+
+def _nltk():
+    """nltk, with the punkt_tab tokenizer data downloaded if missing."""
+    global _punkt_checked
+    import nltk
+
+    if not _punkt_checked:
+        try:
+            nltk.data.find('tokenizers/punkt_tab')
+        except LookupError:
+            nltk.download('punkt_tab', quiet=True)
+        _punkt_checked = True
+    return nltk
+
+
+class Document:
+    def __init__(self, html='', text=None, title='', post=None):
+        self.html = html or ''
+        self.title = title or ''
+        self._post = post  # Supplies the stored plain text, only if `text` is used
+        if text is not None:
+            self.__dict__['text'] = text
+
+    @classmethod
+    def for_post(cls, post):
+        """The Document of the current revision of `post`, built at most once
+        while it stays among the RECENT_DOCUMENTS most recently used."""
+        body, title = post.blog_body or '', post.title or ''
+        key = (post.pk, hashlib.sha1(f'{title}\x1f{body}'.encode()).hexdigest())
+        if not post.pk:
+            return cls(body, title=title, post=post)
+        with _recent_lock:
+            document = _recent.get(key)
+            if document is None:
+                document = _recent[key] = cls(body, title=title, post=post)
+                while len(_recent) > RECENT_DOCUMENTS:
+                    _recent.popitem(last=False)
+            else:
+                _recent.move_to_end(key)
+        return document
+
+    @cached_property
+    def text(self):
+        if self._post is not None:
+            return self._post.get_plain_text()
+        from .models import html_to_text
+
+        return html_to_text(self.html)
+
+    @cached_property
+    def lower_text(self):
+        return self.text.lower()
+
+    @cached_property
+    def sentences(self):
+        return _nltk().sent_tokenize(self.text)
+
+    @cached_property
+    def tokens(self):
+        return _nltk().word_tokenize(self.text)
+
+    @cached_property
+    def lower_tokens(self):
+        return [token.lower() for token in self.tokens]
+
+    @cached_property
+    def words(self):
+        return self.text.split()
+
+    @cached_property
+    def lower_words(self):
+        return self.lower_text.split()
+
+    @cached_property
+    def word_counts(self):
+        return Counter(self.lower_words)
+
+    @cached_property
+    def paragraphs(self):
+        return [p.strip() for p in self.text.split('\n\n') if p.strip()]
+
+    @cached_property
+    def headers(self):
+        return [Header(int(level), strip_tags(inner).strip()) for level, inner in HEADER_RE.findall(self.html)]
+
+    @cached_property
+    def links(self):
+        return [Link(url.strip(), strip_tags(inner).strip()) for url, inner in LINK_RE.findall(self.html)]
+
+    @cached_property
+    def syllables(self):
+        return {word: count_syllables(word) for word in self.word_counts}
+
+    @cached_property
+    def flesch_reading_ease(self):
+        from textstat import flesch_reading_ease
+
+        return flesch_reading_ease(self.text)
+
+    @cached_property
+    def flesch_kincaid_grade(self):
+        from textstat import flesch_kincaid_grade
+
+        return flesch_kincaid_grade(self.text)
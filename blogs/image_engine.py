@@ -0,0 +1,113 @@
+# blogs/image_engine.py
+"""Single-decode, multi-size image encoder.
+
+The source is decoded once (with JPEG draft mode when only small outputs are
+needed), each width is resampled from the next larger one instead of from
+full resolution (1024 -> 768 -> 480 -> 320 -> 150), and every (width, format)
+encode runs in a thread pool. Pillow releases the GIL while resampling and
+encoding, so the encodes overlap. Outputs are written straight to disk.
+
+This module has no Django imports so it can run in worker and benchmark
+subprocesses.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageOps
+
+WEBP_QUALITY = 80
+JPEG_QUALITY = 80
+SIZES = [150, 320, 480, 768, 1024]  # includes sidebar sizes
+
+
+def decode(path, target_width=None):
+    """Open, orient and convert an image to RGB.
+
+    If `target_width` is given and the source is a JPEG, libjpeg is asked to
+    decode at the smallest 1/2, 1/4 or 1/8 scale that is still at least that
+    wide (draft mode). That is much cheaper than decoding at full size and
+    then throwing most of the pixels away.
+    """
+    img = Image.open(path)
+    if target_width and img.format == 'JPEG':
+        # Square bound: still large enough if EXIF rotation swaps the axes
+        img.draft('RGB', (target_width, target_width))
+    img = ImageOps.exif_transpose(img)
+    return img.convert('RGB')
+
+
+def downscale_cascade(img, widths):
+    """Yield (width, image) from largest to smallest. Each level is resampled
+    from the previous one. Widths at or above the source width reuse the
+    source, so images are never upscaled (same as Image.thumbnail)."""
+    current = img
+    for width in sorted(set(widths), reverse=True):
+        if width < current.width:
+            height = max(1, round(current.height * width / current.width))
+            # reducing_gap lets Pillow box-reduce first on big jumps, then LANCZOS
+            current = current.resize((width, height), Image.LANCZOS, reducing_gap=3.0)
+        yield width, current
+
+
+def encode_to_file(img, path, fmt, quality=None):
+    """Encode `img` straight to `path`. Writes to a temp file first so readers
+    never see a half-written derivative."""
+    # Image.save() stores per-call encoder settings on the Image object, so
+    # concurrent saves of one derivative each work on their own copy
+    img = img.copy()
+    save_kwargs = {'optimize': True}
+    if fmt != 'PNG' and quality is not None:
+        save_kwargs['quality'] = quality
+    # Unique per writer: two requests may render the same derivative at once
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        img.save(tmp_path, format=fmt, **save_kwargs)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+def default_workers():
+    return min(8, (os.cpu_count() or 2) + 2)
+
+
+def encode_derivatives(img, original_dir, resized_dir, base_name, ext, sizes,
+                       jpeg_quality, webp_quality, max_workers=None):
+    """Write the optimized original, the main WebP and every resized
+    JPEG/PNG + WebP for `sizes`.
+
+    Returns (written_paths, errors) where errors maps path -> exception.
+    Failure of the optimized original is re-raised, as it is the file the post
+    points at. Other failures are reported and skipped.
+    """
+    fmt = 'PNG' if ext == '.png' else 'JPEG'
+    optimized_path = os.path.join(original_dir, f"{base_name}{ext}")
+    if sizes:
+        os.makedirs(resized_dir, exist_ok=True)
+
+    written, errors = [], {}
+    with ThreadPoolExecutor(max_workers=max_workers or default_workers()) as pool:
+        futures = {
+            pool.submit(encode_to_file, img, optimized_path, fmt, jpeg_quality): optimized_path,
+        }
+        webp_path = os.path.join(original_dir, f"{base_name}.webp")
+        futures[pool.submit(encode_to_file, img, webp_path, 'WEBP', webp_quality)] = webp_path
+
+        # Resampling happens here on the calling thread while earlier levels encode
+        for width, level in downscale_cascade(img, sizes):
+            for out_ext, out_fmt, quality in ((ext, fmt, jpeg_quality), ('.webp', 'WEBP', webp_quality)):
+                path = os.path.join(resized_dir, f"{base_name}-{width}{out_ext}")
+                futures[pool.submit(encode_to_file, level, path, out_fmt, quality)] = path
+
+        for future, path in futures.items():
+            try:
+                written.append(future.result())
+            except Exception as e:
+                errors[path] = e
+
+    if optimized_path in errors:
+        raise errors[optimized_path]
+    return written, errors
@@ -0,0 +1,221 @@
+# blogs/jobs.py
+"""DB-backed background job queue.
+
+Signal receivers call enqueue_job(); `manage.py run_worker` claims due jobs
+and runs them in a process pool. Handlers are idempotent (the image handler
+checks the derivative manifest first), so a retried or duplicated job costs
+nothing once its output is current. A running job refreshes locked_at every
+HEARTBEAT_INTERVAL seconds, so only jobs whose worker died go stale and are
+re-queued by release_stale_jobs(), however long the job itself takes.
+
+Models are imported lazily so this module can be loaded by spawned worker
+processes before django.setup() has run.
+"""
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+
+# ----------------
+# Handlers
+# ----------------
+def _run_featured_image(blog):
+    from .media import process_featured_image
+    process_featured_image(blog)
+
+def _run_video_metadata(blog):
+    from .media import extract_video_metadata
+    extract_video_metadata(blog)
+
+def _run_content_analysis(blog):
+    from .ai_content import refresh_content_analysis
+    refresh_content_analysis(blog)
+
+def _run_voice_analysis(blog):
+    from .voice_search import refresh_voice_analysis
+    refresh_voice_analysis(blog)
+
+def _run_related_posts(blog):
+    from .related_posts import update_post
+    update_post(blog)
+
+JOB_HANDLERS = {
+    'featured_image': _run_featured_image,
+    'video_metadata': _run_video_metadata,
+    'content_analysis': _run_content_analysis,
+    'voice_analysis': _run_voice_analysis,
+    'related_posts': _run_related_posts,
+}
+
+# ----------------
+# Queue API
+# ----------------
+def enqueue_job(blog, kind, delay=0):
+    """Queue `kind` for `blog`. Returns the pending job, or None if another
+    process queued it at the same moment. Queuing twice is a no-op."""
+    from .models import BackgroundJob
+
+    try:
+        with transaction.atomic():
+            job, created = BackgroundJob.objects.get_or_create(
+                blog_id=blog.pk,
+                kind=kind,
+                status='pending',
+                defaults={
+                    'max_attempts': settings.BACKGROUND_JOBS['MAX_ATTEMPTS'],
+                    'run_after': timezone.now() + timedelta(seconds=delay),
+                },
+            )
+    except IntegrityError:
+        return None
+
+    if created:
+        set_media_status(blog.pk, kind, 'pending')
+    return job
+
+def set_media_status(blog_id, kind, status, error=''):
+    """Record a job's state on the Blog row without firing save signals."""
+    from .models import Blog
+
+    with transaction.atomic():
+        blog = Blog.objects.select_for_update().only('id', 'media_status').filter(pk=blog_id).first()
+        if blog is None:
+            return
+        statuses = dict(blog.media_status or {})
+        statuses[kind] = {
+            'status': status,
+            'error': error[:500],
+            'updated_at': timezone.now().isoformat(),
+        }
+        Blog.objects.filter(pk=blog_id).update(media_status=statuses)
+
+def claim_jobs(limit, worker_id, kinds=None):
+    """Atomically move up to `limit` due jobs to running and return their ids.
+    SKIP LOCKED lets any number of workers poll the same table."""
+    from .models import BackgroundJob
+
+    now = timezone.now()
+    with transaction.atomic():
+        qs = BackgroundJob.objects.select_for_update(skip_locked=True).filter(
+            status='pending', run_after__lte=now
+        )
+        if kinds:
+            qs = qs.filter(kind__in=kinds)
+        ids = list(qs.order_by('run_after', 'id').values_list('id', flat=True)[:limit])
+        if ids:
+            BackgroundJob.objects.filter(id__in=ids).update(
+                status='running',
+                locked_at=now,
+                locked_by=worker_id[:100],
+                attempts=F('attempts') + 1,
+            )
+    return ids
+
+def release_stale_jobs(timeout=None):
+    """Put jobs whose worker died mid-run (no heartbeat for LOCK_TIMEOUT
+    seconds) back in the queue."""
+    from .models import BackgroundJob
+
+    timeout = timeout or settings.BACKGROUND_JOBS['LOCK_TIMEOUT']
+    cutoff = timezone.now() - timedelta(seconds=timeout)
+    released = 0
+    for job in BackgroundJob.objects.filter(status='running', locked_at__lt=cutoff):
+        released += _reschedule(job, 'Worker lock expired')
+    return released
+
+def execute_job(job_id):
+    """Run one claimed job. Executed inside a worker process."""
+    from .models import BackgroundJob
+
+    job = BackgroundJob.objects.select_related('blog').filter(pk=job_id).first()
+    if job is None:
+        return 'missing'
+
+    set_media_status(job.blog_id, job.kind, 'running')
+    try:
+        handler = JOB_HANDLERS.get(job.kind)
+        if handler is None:
+            raise LookupError(f"No handler registered for job kind {job.kind!r}")
+        with heartbeat(job.pk):
+            handler(job.blog)
+    except Exception as e:
+        return fail_job(job, f"{type(e).__name__}: {e}")
+
+    BackgroundJob.objects.filter(pk=job.pk).update(status='done', locked_at=None, last_error='')
+    set_media_status(job.blog_id, job.kind, 'done')
+    return 'done'
+
+@contextmanager
+def heartbeat(job_id):
+    """Keep bumping the job's locked_at from a background thread while the
+    body runs, so release_stale_jobs() leaves it alone."""
+    from django.db import connection
+    from .models import BackgroundJob
+
+    stop = threading.Event()
+
+    def beat():
+        try:
+            while not stop.wait(settings.BACKGROUND_JOBS['HEARTBEAT_INTERVAL']):
+                try:
+                    BackgroundJob.objects.filter(pk=job_id, status='running').update(locked_at=timezone.now())
+                except Exception as e:
+                    print(f"[Jobs] Heartbeat for job {job_id} failed: {e}")
+        finally:
+            connection.close()  # This thread's own connection
+
+    thread = threading.Thread(target=beat, name=f'job-{job_id}-heartbeat', daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+def fail_job(job, error):
+    """Retry with exponential backoff, or give up after max_attempts."""
+    from .models import BackgroundJob
+
+    if isinstance(job, int):
+        job = BackgroundJob.objects.filter(pk=job).first()
+        if job is None:
+            return 'missing'
+
+    if job.attempts >= job.max_attempts:
+        BackgroundJob.objects.filter(pk=job.pk).update(status='failed', locked_at=None, last_error=error)
+        set_media_status(job.blog_id, job.kind, 'failed', error)
+        return 'failed'
+
+    _reschedule(job, error)
+    return 'retry'
+
+def _reschedule(job, error):
+    from .models import BackgroundJob
+
+    backoff = settings.BACKGROUND_JOBS['RETRY_BACKOFF'] * (2 ** max(job.attempts - 1, 0))
+    try:
+        with transaction.atomic():
+            BackgroundJob.objects.filter(pk=job.pk).update(
+                status='pending',
+                locked_at=None,
+                locked_by='',
+                last_error=error,
+                run_after=timezone.now() + timedelta(seconds=backoff),
+            )
+    except IntegrityError:
+        # A newer job for the same post/kind is already queued and will do the work
+        BackgroundJob.objects.filter(pk=job.pk).update(
+            status='failed', locked_at=None, last_error=f"Superseded by a newer queued job. {error}"
+        )
+        return 0
+    set_media_status(job.blog_id, job.kind, 'pending', error)
+    return 1
+
+def init_worker():
+    """ProcessPoolExecutor initializer for spawned workers."""
+    import django
+    django.setup()
@@ -0,0 +1,228 @@
+# blogs/keyword_index.py
+"""Site-wide keyword automaton for auto-linking.
+
+The SEO keywords, title and tag names of every published post are compiled
+into one Aho-Corasick automaton. Finding every anchor candidate in a body is
+then a single pass over the text, however many keywords there are, instead
+of one regex per keyword per text segment.
+
+Matching is case-insensitive. A match only counts on word boundaries: the
+characters either side of it, if any, are not letters, digits or
+underscores (what the regex `\\b` checks).
+
+Each process keeps the compiled automaton in memory. Signals bump a version
+number in the cache when a published post or a tag changes. Processes check
+that version at most every KEYWORD_INDEX['CHECK_SECONDS']. On a new version
+they reload the keyword rows, and only rebuild if the keyword set itself
+is different.
+
+    site_keywords().automaton.find_all(text)    -> [(start, end, key), ...]
+"""
+import hashlib
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+
+VERSION_KEY = 'keyword_index:version'
+
+_loaded = None
+_load_lock = threading.Lock()
+
+
+def conf():
+    return settings.KEYWORD_INDEX
+
+
+def fold(text):
+    """Lowercase `text` without changing its length, so offsets into the
+    folded string are offsets into the original."""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    # A few characters (e.g. 'İ') lowercase to two; leave those as they are
+    return ''.join(ch.lower() if len(ch.lower()) == 1 else ch for ch in text)
+
+
+def split_keywords(value):
+    """'a, b ,,c' -> ['a', 'b', 'c']"""
+    return [keyword.strip() for keyword in (value or '').split(',') if keyword.strip()]
+
+
+def _is_word_char(ch):
+    return ch.isalnum() or ch == '_'
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton over a set of phrases.
+
+    Phrases are folded to lowercase and stripped; matches report the folded
+    phrase as their key. Building is linear in the total phrase length and
+    scanning is linear in the text length plus the number of matches.
+    """
+
+    def __init__(self, phrases=()):
+        self.keys = {fold(phrase).strip() for phrase in phrases} - {''}
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+
+        for key in self.keys:
+            state = 0
+            for ch in key:
+                following = self._goto[state].get(ch)
+                if following is None:
+                    following = len(self._goto)
+                    self._goto[state][ch] = following
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                state = following
+            self._out[state] = (key,)
+
+        # Breadth-first, so a state's failure target is finished before it
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for ch, following in self._goto[state].items():
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[following] = target if target != following else 0
+                # Longest key first, then the keys that are suffixes of it
+                self._out[following] = self._out[following] + self._out[self._fail[following]]
+                queue.append(following)
+
+    def __contains__(self, phrase):
+        return fold(phrase).strip() in self.keys
+
+    def __len__(self):
+        return len(self.keys)
+
+    def iter_matches(self, text):
+        """Yield (start, end, key) for every whole-word match in `text`,
+        overlapping ones included, in order of their end offset."""
+        if not self.keys or not text:
+            return
+        folded = fold(text)
+        goto, fail, out = self._goto, self._fail, self._out
+        length = len(folded)
+        state = 0
+        for position, ch in enumerate(folded):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if not out[state]:
+                continue
+            end = position + 1
+            if end < length and _is_word_char(folded[end]):
+                continue
+            for key in out[state]:
+                start = end - len(key)
+                if start == 0 or not _is_word_char(folded[start - 1]):
+                    yield start, end, key
+
+    def find_all(self, text):
+        """Every match in `text`, sorted by start offset (longest first)."""
+        return sorted(self.iter_matches(text), key=lambda match: (match[0], -match[1]))
+
+    def positions(self, text):
+        """{key: [start, ...]} for the keys that occur in `text`."""
+        found = defaultdict(list)
+        for start, _, key in self.find_all(text):
+            found[key].append(start)
+        return dict(found)
+
+
+class Mentions:
+    """Where the keys of one or more automata occur in one text, found with
+    one pass per automaton and then looked up by phrase."""
+
+    def __init__(self, text, automata):
+        self.text = text
+        self.automata = [automaton for automaton in automata if len(automaton)]
+        self._positions = {}
+        for automaton in self.automata:
+            for key, starts in automaton.positions(text).items():
+                self._positions.setdefault(key, starts)
+
+    def covers(self, phrase):
+        """Whether `starts(phrase)` is authoritative (the phrase was searched for)."""
+        return any(phrase in automaton for automaton in self.automata)
+
+    def starts(self, phrase):
+        return self._positions.get(fold(phrase).strip(), [])
+
+
+# ----------------
+# Site-wide index
+# ----------------
+def keyword_phrases():
+    """Folded keywords, titles and tag names of the published posts."""
+    from .models import Blog
+
+    published = Blog.objects.filter(status='Published')
+    phrases = set()
+    for title, seo_keywords in published.values_list('title', 'seo_keywords'):
+        phrases.add(title)
+        phrases.update(split_keywords(seo_keywords))
+    phrases.update(published.filter(tags__isnull=False).values_list('tags__name', flat=True))
+    return {fold(phrase).strip() for phrase in phrases} - {''}
+
+
+def _signature(phrases):
+    digest = hashlib.sha1()
+    for phrase in sorted(phrases):
+        digest.update(phrase.encode('utf-8', 'surrogatepass'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class SiteKeywords:
+    def __init__(self, phrases, signature, version):
+        self.automaton = KeywordAutomaton(phrases)
+        self.signature = signature
+        self.version = version
+        self.checked = time.monotonic()
+
+
+def current_version():
+    return cache.get(VERSION_KEY, 0)
+
+
+def bump_version():
+    """Tell every process the keyword set may have changed."""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, None)
+
+
+def site_keywords():
+    """The automaton over every published post's keywords, titles and tags.
+    Rebuilt only when the version was bumped and the keywords did change."""
+    global _loaded
+    now = time.monotonic()
+    if _loaded is not None and now - _loaded.checked < conf()['CHECK_SECONDS']:
+        return _loaded
+
+    with _load_lock:
+        version = current_version()
+        if _loaded is None or _loaded.version != version:
+            phrases = keyword_phrases()
+            signature = _signature(phrases)
+            if _loaded is None or _loaded.signature != signature:
+                _loaded = SiteKeywords(phrases, signature, version)
+            _loaded.version = version
+        _loaded.checked = now
+    return _loaded
+
+
+def automaton_for(phrases):
+    """The site automaton if it knows every phrase, else one built for them."""
+    site = site_keywords().automaton
+    if all(phrase in site for phrase in phrases):
+        return site
+    return KeywordAutomaton(phrases)
@@ -1,71 +1,95 @@
 # blogs/link_building.py
 import re
-import requests
 from urllib.parse import urlparse, urljoin
 from django.db import models
-from django.utils.html import strip_tags
 from django.urls import reverse
 from collections import Counter, defaultdict
+from typing import NamedTuple
 from bs4 import BeautifulSoup
 import nltk
-from django.contrib.contenttypes.models import ContentType
-from .models import LinkOpportunity, BrokenLink, LinkPerformance  # Import from models
+from .models import LinkOpportunity, LinkPerformance  # Import from models
+from .keyword_index import KeywordAutomaton, Mentions, site_keywords, split_keywords
+from .document import Document
 
 
 class AILinkBuilder:
     """AI-powered internal linking system"""
     
+    RELEVANCE_THRESHOLD = 0.3  # Minimum similarity when comparing against every post
+    
     def __init__(self):
         self.stop_words = set(['the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by'])
         
-    def analyze_content_for_links(self, blog_post, all_posts=None):
-        """Analyze blog post content for internal linking opportunities"""
-        if all_posts is None:
-            from blogs.models import Blog
-            all_posts = Blog.objects.filter(status='Published').exclude(id=blog_post.id)
+    def analyze_content_for_links(self, blog_post, all_posts=None, engine=None):
+        """Analyze blog post content for internal linking opportunities.
+        Pass a LinkOpportunityEngine when analysing many posts in a row."""
+        if engine is not None:
+            return engine.opportunities_for(blog_post)
         
         opportunities = []
-        content = strip_tags(blog_post.blog_body)
+        document = Document.for_post(blog_post)
+        content = document.text
         
         # Extract key phrases and entities
-        key_phrases = self._extract_key_phrases(content)
+        key_phrases = self._extract_key_phrases(document)
         entities = self._extract_entities(content)
-        
-        for target_post in all_posts:
-            # Calculate semantic similarity
-            similarity_score = self._calculate_semantic_similarity(blog_post, target_post)
+        mentions = None
+        
+        for target_post, similarity_score in self._candidate_posts(blog_post, all_posts):
+            if mentions is None:
+                mentions = self._find_mentions(content, key_phrases)
+            # Find potential anchor texts
+            anchor_opportunities = self._find_anchor_opportunities(
+                content, target_post, key_phrases, entities, mentions=mentions
+            )
             
-            if similarity_score > 0.3:  # Minimum relevance threshold
-                # Find potential anchor texts
-                anchor_opportunities = self._find_anchor_opportunities(
-                    content, target_post, key_phrases, entities
-                )
-                
-                for anchor_text, context, score in anchor_opportunities:
-                    opportunities.append({
-                        'target_post': target_post,
-                        'anchor_text': anchor_text,
-                        'context': context,
-                        'relevance_score': similarity_score * score,
-                        'target_url': target_post.get_absolute_url()
-                    })
+            for anchor_text, context, score in anchor_opportunities:
+                opportunities.append({
+                    'target_post': target_post,
+                    'anchor_text': anchor_text,
+                    'context': context,
+                    'relevance_score': similarity_score * score,
+                    'target_url': target_post.get_absolute_url()
+                })
         
         # Sort by relevance score
         opportunities.sort(key=lambda x: x['relevance_score'], reverse=True)
         return opportunities[:10]  # Return top 10 opportunities
     
+    def _candidate_posts(self, blog_post, all_posts=None):
+        """Relevant (target_post, similarity) pairs. Uses the precomputed
+        neighbours of the related-posts index when the post is indexed (their
+        blended scores, already cut at RELATED_POSTS['MIN_SCORE']), otherwise
+        compares every post and keeps those above RELEVANCE_THRESHOLD."""
+        from blogs.models import Blog
+        from .related_posts import neighbours
+        
+        if all_posts is None:
+            pairs = neighbours(blog_post.pk)
+            if pairs:
+                posts = Blog.objects.filter(status='Published').in_bulk([pk for pk, _ in pairs])
+                return [(posts[pk], score) for pk, score in pairs if pk in posts]
+            all_posts = Blog.objects.filter(status='Published').exclude(id=blog_post.id)
+        
+        candidates = [
+            (target_post, self._calculate_semantic_similarity(blog_post, target_post))
+            for target_post in all_posts
+        ]
+        return [(target_post, score) for target_post, score in candidates if score > self.RELEVANCE_THRESHOLD]
+    
     def _extract_key_phrases(self, content):
-        """Extract key phrases via frequency-scored sentence ranking (English-appropriate)."""
+        """Extract key phrases via frequency-scored sentence ranking (English-appropriate).
+        `content` is a Document, or plain text."""
+        document = content if isinstance(content, Document) else Document(text=content)
+        content = document.text
         try:
-            text = strip_tags(content)
-
-            # Split into sentences
-            sentences = [s.strip() for s in re.split(r'(?<=[.!?])\s+', text) if len(s.split()) >= 4]
+            # Sentences and words from the shared tokenization
+            sentences = [s.strip() for s in document.sentences if len(s.split()) >= 4]
             if not sentences:
                 return self._simple_phrase_extraction(content)
 
             # Score words by frequency (ignoring stop words / short words)
-            words = re.findall(r'[a-zA-Z]{4,}', text.lower())
+            words = [w for w in document.lower_tokens if len(w) >= 4 and w.isalpha()]
             word_freq = Counter(w for w in words if w not in self.stop_words)
             if not word_freq:
                 return self._simple_phrase_extraction(content)
@@ -129,13 +153,9 @@ class AILinkBuilder:
     
     def _calculate_semantic_similarity(self, post1, post2):
         """Calculate semantic similarity between two posts"""
-        # Extract content
-        content1 = strip_tags(post1.blog_body).lower()
-        content2 = strip_tags(post2.blog_body).lower()
-        
         # Simple similarity based on common words and phrases
-        words1 = set(content1.split())
-        words2 = set(content2.split())
+        words1 = set(Document.for_post(post1).word_counts)
+        words2 = set(Document.for_post(post2).word_counts)
         
         # Remove stop words
         words1 = {word for word in words1 if word not in self.stop_words and len(word) > 3}
@@ -161,8 +181,20 @@ class AILinkBuilder:
         total_similarity = jaccard_similarity + category_boost + (tag_similarity * 0.3)
         return min(total_similarity, 1.0)
     
-    def _find_anchor_opportunities(self, content, target_post, key_phrases, entities):
-        """Find potential anchor text opportunities"""
+    def _find_mentions(self, content, key_phrases):
+        """Every site keyword, title, tag name and key phrase in `content`,
+        found in one pass of the shared automaton (plus one for the key
+        phrases it does not know)."""
+        site = site_keywords().automaton
+        extra = KeywordAutomaton(phrase for phrase in key_phrases if phrase not in site)
+        return Mentions(content, [site, extra])
+    
+    def _find_anchor_opportunities(self, content, target_post, key_phrases, entities,
+                                   target_tags=None, target_content=None, mentions=None):
+        """Find potential anchor text opportunities. `target_tags` and
+        `target_content` (lowercase plain text) skip the per-target queries
+        and HTML stripping when the caller has them loaded already, and
+        `mentions` (from _find_mentions) skips rescanning per keyword."""
         opportunities = []
         
         # Check if target post title appears in content
@@ -172,23 +204,27 @@ class AILinkBuilder:
         
         # Check if target post's keywords appear in content
         if target_post.seo_keywords:
-            keywords = [kw.strip() for kw in target_post.seo_keywords.split(',')]
+            keywords = split_keywords(target_post.seo_keywords)
             for keyword in keywords:
-                keyword_matches = self._find_keyword_mentions(content, keyword)
+                keyword_matches = self._find_keyword_mentions(content, keyword, mentions)
                 for match, context in keyword_matches:
                     opportunities.append((match, context, 0.8))
         
         # Check if target post's tags appear in content
-        for tag in target_post.tags.all():
-            tag_matches = self._find_keyword_mentions(content, tag.name)
+        if target_tags is None:
+            target_tags = [tag.name for tag in target_post.tags.all()]
+        for tag_name in target_tags:
+            tag_matches = self._find_keyword_mentions(content, tag_name, mentions)
             for match, context in tag_matches:
                 opportunities.append((match, context, 0.6))
         
         # Check for semantic matches with extracted phrases
-        target_content = strip_tags(target_post.blog_body).lower()
+        if target_content is None:
+            target_content = Document.for_post(target_post).lower_text
+        content_lower = content.lower()
         for phrase in key_phrases:
-            if phrase.lower() in target_content and phrase.lower() in content.lower():
-                phrase_matches = self._find_keyword_mentions(content, phrase)
+            if phrase.lower() in target_content and phrase.lower() in content_lower:
+                phrase_matches = self._find_keyword_mentions(content, phrase, mentions)
                 for match, context in phrase_matches:
                     opportunities.append((match, context, 0.5))
         
@@ -218,8 +254,15 @@ class AILinkBuilder:
         
         return mentions
     
-    def _find_keyword_mentions(self, content, keyword):
-        """Find mentions of a keyword in content"""
+    def _find_keyword_mentions(self, content, keyword, found=None):
+        """Find mentions of a keyword in content (looked up in `found`, a
+        Mentions of this content, when it covers the keyword)"""
+        if found is not None and found.covers(keyword):
+            return [
+                (keyword, self._extract_context(content, idx, len(keyword)))
+                for idx in found.starts(keyword)
+            ]
+        
         mentions = []
         keyword_lower = keyword.lower()
         content_lower = content.lower()
@@ -261,67 +304,33 @@ class AILinkBuilder:
         
         return context.strip()
     
-    def generate_link_suggestions(self, blog_post):
-        """Generate comprehensive link suggestions"""
+    def generate_link_suggestions(self, blog_post, engine=None, broken_links=None, internal_links=None):
+        """Generate comprehensive link suggestions. Pass `broken_links` when
+        they were already checked for many posts at once (check_posts), and
+        `internal_links` when they came from LinkOpportunityEngine.iter_all()."""
+        if broken_links is None:
+            broken_links = self.check_broken_links(blog_post)
+        if internal_links is None:
+            internal_links = self.analyze_content_for_links(blog_post, engine=engine)
         suggestions = {
-            'internal_links': self.analyze_content_for_links(blog_post),
-            'broken_links': self.check_broken_links(blog_post),
+            'internal_links': internal_links,
+            'broken_links': broken_links,
             'anchor_optimization': self.analyze_anchor_texts(blog_post),
             'competitor_gaps': self.find_competitor_link_gaps(blog_post)
         }
         
         return suggestions
     
-    def check_broken_links(self, blog_post):
-        """Check for broken links in the post"""
-        broken_links = []
-        
-        # Extract all links from the post content
-        link_pattern = r'<a[^>]+href=["\']([^"\']+)["\'][^>]*>([^<]+)</a>'
-        links = re.findall(link_pattern, blog_post.blog_body, re.IGNORECASE)
+    def check_broken_links(self, blog_post, checker=None):
+        """Check for broken links in the post. URLs checked recently (by any
+        post) come from the shared status cache; see blogs/link_checker.py."""
+        from .link_checker import check_posts
         
-        for url, anchor_text in links:
-            try:
-                # Skip relative URLs and anchors
-                if url.startswith('#') or not url.startswith(('http://', 'https://')):
-                    continue
-                
-                response = requests.head(url, timeout=10, allow_redirects=True)
-                if response.status_code >= 400:
-                    broken_links.append({
-                        'url': url,
-                        'anchor_text': anchor_text,
-                        'status_code': response.status_code,
-                        'error_message': f"HTTP {response.status_code}"
-                    })
-                    
-                    # Save to database
-                    content_type = ContentType.objects.get_for_model(blog_post)
-                    BrokenLink.objects.get_or_create(
-                        content_type=content_type,
-                        object_id=blog_post.id,
-                        url=url,
-                        defaults={
-                            'anchor_text': anchor_text,
-                            'status_code': response.status_code,
-                            'error_message': f"HTTP {response.status_code}"
-                        }
-                    )
-                    
-            except requests.exceptions.RequestException as e:
-                broken_links.append({
-                    'url': url,
-                    'anchor_text': anchor_text,
-                    'status_code': 0,
-                    'error_message': str(e)
-                })
-        
-        return broken_links
+        return check_posts([blog_post], checker=checker)[blog_post.pk]
     
     def analyze_anchor_texts(self, blog_post):
         """Analyze and optimize anchor texts"""
-        link_pattern = r'<a[^>]+href=["\']([^"\']+)["\'][^>]*>([^<]+)</a>'
-        links = re.findall(link_pattern, blog_post.blog_body, re.IGNORECASE)
+        links = [(link.url, link.text) for link in Document.for_post(blog_post).links if link.url and link.text]
         
         anchor_analysis = {
             'total_links': len(links),
@@ -391,16 +400,185 @@ class AILinkBuilder:
     
     def _extract_themes(self, blog_post):
         """Extract main themes from blog post"""
-        content = strip_tags(blog_post.blog_body)
-        
         # Simple theme extraction using most common meaningful words
-        words = [word.lower() for word in content.split() 
-                if len(word) > 4 and word.lower() not in self.stop_words]
+        words = [word for word in Document.for_post(blog_post).lower_words
+                if len(word) > 4 and word not in self.stop_words]
         
         word_counts = Counter(words)
         themes = [word for word, count in word_counts.most_common(10) if count > 2]
         
         return themes
 
+
+class LinkDocument(NamedTuple):
+    """What the engine needs to know about one post"""
+    pk: int
+    title: str
+    seo_keywords: str
+    text: str  # Plain text
+    tags: tuple
+    category_id: int
+    url: str
+    post: object = None  # The Blog instance, when loaded from the database
+
+
+class LinkOpportunityEngine:
+    """Internal-link opportunities for many posts at once.
+
+    All published posts are loaded once (tags prefetched, stored plain
+    text). Word sets become a binary sparse document-term matrix and tags a
+    binary document-tag matrix, so the similarity of a block of posts against
+    all posts is one sparse product per matrix:
+
+        jaccard(words) + 0.2 * same category + 0.3 * jaccard(tags)
+
+    which is AILinkBuilder._calculate_semantic_similarity, vectorised.
+    Anchor matching only runs for pairs above THRESHOLD.
+    """
+    THRESHOLD = 0.3
+    BLOCK_SIZE = 512  # Source posts per product; bounds the dense block to BLOCK_SIZE x N
+
+    def __init__(self, documents, builder=None):
+        from scipy import sparse
+        from sklearn.feature_extraction.text import CountVectorizer
+        import numpy as np
+
+        self.builder = builder or AILinkBuilder()
+        self.documents = list(documents)
+        self.rows = {doc.pk: i for i, doc in enumerate(self.documents)}
+        self._lower_texts = [doc.text.lower() for doc in self.documents]
+
+        # Same word rule as _calculate_semantic_similarity: words over 3 letters, no stop words
+        self.vectorizer = CountVectorizer(
+            binary=True,
+            token_pattern=r'(?u)\b\w{4,}\b',
+            stop_words=sorted(self.builder.stop_words),
+            dtype=np.float32,
+        )
+        if self.documents:
+            self.terms = self.vectorizer.fit_transform(self._lower_texts).tocsr()
+        else:
+            self.terms = sparse.csr_matrix((0, 1), dtype=np.float32)
+        self.term_counts = np.asarray(self.terms.sum(axis=1)).ravel()
+
+        self.tag_columns = tag_columns = {}
+        coords = [
+            (row, tag_columns.setdefault(tag, len(tag_columns)))
+            for row, doc in enumerate(self.documents)
+            for tag in set(doc.tags)
+        ]
+        self.tags = sparse.csr_matrix(
+            (np.ones(len(coords), dtype=np.float32), ([r for r, _ in coords], [c for _, c in coords])),
+            shape=(len(self.documents), max(len(tag_columns), 1)),
+        )
+        self.tag_counts = np.asarray(self.tags.sum(axis=1)).ravel()
+        self.categories = np.array([doc.category_id or -1 for doc in self.documents], dtype=np.int64)
+
+    @classmethod
+    def from_published(cls, builder=None):
+        """Engine over every published post, loaded with two queries."""
+        from blogs.models import Blog
+        
+        posts = Blog.objects.filter(status='Published').select_related('category').prefetch_related('tags')
+        return cls([cls.document_for(post) for post in posts], builder=builder)
+
+    @staticmethod
+    def document_for(post):
+        return LinkDocument(
+            pk=post.pk,
+            title=post.title,
+            seo_keywords=post.seo_keywords or '',
+            text=Document.for_post(post).text,
+            tags=tuple(tag.name for tag in post.tags.all()),
+            category_id=post.category_id,
+            url=post.get_absolute_url(),
+            post=post,
+        )
+
+    @staticmethod
+    def _jaccard(shared, own_counts, all_counts):
+        import numpy as np
+        
+        union = own_counts[:, None] + all_counts[None, :] - shared
+        return np.divide(shared, union, out=np.zeros_like(shared), where=union > 0)
+
+    def similarity_block(self, rows=None, extra=None):
+        """Dense (len(rows), N) similarities of indexed rows, or of one
+        unindexed LinkDocument `extra`, against every indexed post."""
+        import numpy as np
+        from scipy import sparse
+
+        if extra is not None:
+            terms = self.vectorizer.transform([extra.text.lower()]) if self.documents else sparse.csr_matrix((1, 1))
+            known = [self.tag_columns[tag] for tag in set(extra.tags) if tag in self.tag_columns]
+            tags = sparse.csr_matrix(
+                (np.ones(len(known), dtype=np.float32), ([0] * len(known), known)),
+                shape=(1, self.tags.shape[1]),
+            )
+            categories = np.array([extra.category_id or -1])
+            term_counts = np.array([terms.sum()], dtype=np.float32)
+            tag_counts = np.array([len(set(extra.tags))], dtype=np.float32)
+        else:
+            terms, tags = self.terms[rows], self.tags[rows]
+            categories = self.categories[rows]
+            term_counts, tag_counts = self.term_counts[rows], self.tag_counts[rows]
+
+        words = self._jaccard((terms @ self.terms.T).toarray(), term_counts, self.term_counts)
+        shared_tags = self._jaccard((tags @ self.tags.T).toarray(), tag_counts, self.tag_counts)
+        same_category = (categories[:, None] == self.categories[None, :]) & (categories[:, None] >= 0)
+
+        scores = np.minimum(words + 0.2 * same_category + 0.3 * shared_tags, 1.0)
+        words_missing = (term_counts == 0)[:, None] | (self.term_counts == 0)[None, :]
+        scores[words_missing] = 0.0  # Like the pairwise version: no words, no similarity
+        return scores
+
+    def _opportunities(self, source, scores, limit=10):
+        """Anchor matching for `source` against the targets above THRESHOLD."""
+        import numpy as np
+
+        document = Document.for_post(source.post) if source.post is not None else Document(text=source.text)
+        content = document.text
+        key_phrases = self.builder._extract_key_phrases(document)
+        entities = self.builder._extract_entities(content)
+
+        opportunities = []
+        columns = [
+            column for column in np.nonzero(scores > self.THRESHOLD)[0]
+            if self.documents[column].pk != source.pk
+        ]
+        mentions = self.builder._find_mentions(content, key_phrases) if columns else None
+        for column in columns:
+            target = self.documents[column]
+            similarity_score = float(scores[column])
+            for anchor_text, context, score in self.builder._find_anchor_opportunities(
+                content, target, key_phrases, entities,
+                target_tags=target.tags, target_content=self._lower_texts[column], mentions=mentions,
+            ):
+                opportunities.append({
+                    'target_post': target.post or target,
+                    'anchor_text': anchor_text,
+                    'context': context,
+                    'relevance_score': similarity_score * score,
+                    'target_url': target.url,
+                })
+        opportunities.sort(key=lambda x: x['relevance_score'], reverse=True)
+        return opportunities[:limit]
+
+    def opportunities_for(self, post, limit=10):
+        """Opportunities for one post (indexed or not, e.g. a draft)."""
+        row = self.rows.get(post.pk)
+        if row is None:
+            source = post if isinstance(post, LinkDocument) else self.document_for(post)
+            return self._opportunities(source, self.similarity_block(extra=source)[0], limit)
+        return self._opportunities(self.documents[row], self.similarity_block([row])[0], limit)
+
+    def iter_all(self, limit=10):
+        """(document, opportunities) for every indexed post, one block at a time."""
+        for start in range(0, len(self.documents), self.BLOCK_SIZE):
+            rows = list(range(start, min(start + self.BLOCK_SIZE, len(self.documents))))
+            block = self.similarity_block(rows)
+            for offset, row in enumerate(rows):
+                yield self.documents[row], self._opportunities(self.documents[row], block[offset], limit)
+
 # Management command for link building analysis
 # blogs/management/commands/analyze_links.py
@@ -0,0 +1,271 @@
+# blogs/link_checker.py
+"""Concurrent broken-link checking with a shared URL status cache.
+
+LinkChecker checks URLs on a thread pool that shares one requests.Session,
+so connections to a host are reused across posts. Each host gets at most
+LINK_CHECKER['PER_HOST'] requests in flight and at least HOST_DELAY seconds
+between request starts. URLs are submitted round-robin by host, so one slow
+site does not hold up the others.
+
+Every result is stored in the cache under link_status:<sha1(url)> and shared
+by all posts and processes. Each entry records when the URL is next due:
+
+    healthy (2xx/3xx/304)    OK_TTL
+    broken (4xx/5xx)         BROKEN_TTL, doubling with each consecutive failure up to MAX_BROKEN_TTL
+    error / 429              ERROR_TTL (timeouts and rate limits say nothing about the link)
+
+Until then the cached status is returned without a request. Re-checks of
+healthy links send If-None-Match / If-Modified-Since when the last response
+had an ETag or Last-Modified, and a 304 counts as healthy.
+
+check_posts() extracts the external links of many posts, checks each
+distinct URL once, and upserts the broken ones into BrokenLink in bulk.
+Links that work again are marked fixed.
+"""
+import hashlib
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, zip_longest
+from typing import NamedTuple
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .document import Document
+
+RATE_LIMITED = 429
+NOT_MODIFIED = 304
+HEAD_UNSUPPORTED = (403, 405, 501)  # Retried with GET; some servers refuse HEAD
+
+
+def conf():
+    return settings.LINK_CHECKER
+
+
+class LinkStatus(NamedTuple):
+    url: str
+    status_code: int  # 0 when the request failed
+    error_message: str
+    checked_at: float
+    cached: bool = False
+
+    @property
+    def broken(self):
+        if self.status_code == RATE_LIMITED:
+            return False
+        return self.status_code == 0 or self.status_code >= 400
+
+    def as_dict(self, anchor_text=''):
+        """The shape check_broken_links() has always returned."""
+        return {
+            'url': self.url,
+            'anchor_text': anchor_text,
+            'status_code': self.status_code,
+            'error_message': self.error_message,
+        }
+
+
+def extract_links(post):
+    """[(url, anchor_text)] for the absolute http(s) links in the post body."""
+    return [(link.url, link.text) for link in Document.for_post(post).links if link.external]
+
+
+def cache_key(url):
+    return f'link_status:{hashlib.sha1(url.encode()).hexdigest()}'
+
+
+def _next_check(status_code, failures):
+    if status_code == 0 or status_code == RATE_LIMITED:
+        return conf()['ERROR_TTL']
+    if status_code >= 400:
+        return min(conf()['BROKEN_TTL'] * 2 ** max(failures - 1, 0), conf()['MAX_BROKEN_TTL'])
+    return conf()['OK_TTL']
+
+
+class _HostGate:
+    """Concurrency limit and minimum spacing for one host."""
+
+    def __init__(self, limit, delay):
+        self.slots = threading.BoundedSemaphore(limit)
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.next_start = 0.0
+
+    def __enter__(self):
+        self.slots.acquire()
+        with self.lock:
+            start = max(time.monotonic(), self.next_start)
+            self.next_start = start + self.delay
+        time.sleep(max(start - time.monotonic(), 0))
+        return self
+
+    def __exit__(self, *exc):
+        self.slots.release()
+
+
+class LinkChecker:
+    def __init__(self, workers=None, per_host=None, host_delay=None, timeout=None, session=None):
+        self.workers = workers or conf()['WORKERS']
+        self.per_host = per_host or conf()['PER_HOST']
+        self.host_delay = conf()['HOST_DELAY'] if host_delay is None else host_delay
+        self.timeout = timeout or conf()['TIMEOUT']
+        self.session = session or self._session()
+        self._gates = {}
+        self._gates_lock = threading.Lock()
+
+    def _session(self):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=conf()['POOL_HOSTS'], pool_maxsize=self.workers)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers['User-Agent'] = conf()['USER_AGENT']
+        return session
+
+    def _gate(self, host):
+        with self._gates_lock:
+            gate = self._gates.get(host)
+            if gate is None:
+                gate = self._gates[host] = _HostGate(self.per_host, self.host_delay)
+            return gate
+
+    def check(self, urls, force=False):
+        """{url: LinkStatus} for the distinct `urls`. Cached results that are
+        not yet due are reused unless `force`."""
+        urls = list(dict.fromkeys(urls))
+        entries = cache.get_many([cache_key(url) for url in urls])
+        now = time.time()
+
+        results, due = {}, []
+        for url in urls:
+            entry = entries.get(cache_key(url))
+            if entry and not force and now < entry['next_check']:
+                results[url] = LinkStatus(url, entry['status_code'], entry['error_message'], entry['checked_at'], True)
+            else:
+                due.append((url, entry))
+
+        if due:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                fetched = list(pool.map(lambda item: self._fetch(*item), self._interleave_hosts(due)))
+            cache.set_many({cache_key(status.url): entry for status, entry in fetched}, conf()['RETAIN'])
+            results.update((status.url, status) for status, _ in fetched)
+        return results
+
+    @staticmethod
+    def _interleave_hosts(items):
+        """One URL per host in turn, so the pool spreads over hosts."""
+        by_host = defaultdict(list)
+        for item in items:
+            by_host[urlsplit(item[0]).hostname].append(item)
+        return [item for item in chain.from_iterable(zip_longest(*by_host.values())) if item is not None]
+
+    def _fetch(self, url, previous=None):
+        import requests
+
+        headers = {}
+        if previous and not LinkStatus(url, previous['status_code'], '', 0).broken:
+            if previous.get('etag'):
+                headers['If-None-Match'] = previous['etag']
+            if previous.get('last_modified'):
+                headers['If-Modified-Since'] = previous['last_modified']
+
+        etag = last_modified = None
+        with self._gate(urlsplit(url).hostname):
+            try:
+                response = self.session.head(url, headers=headers, timeout=self.timeout, allow_redirects=True)
+                if response.status_code in HEAD_UNSUPPORTED:
+                    response = self.session.get(url, timeout=self.timeout, allow_redirects=True, stream=True)
+                    response.close()
+                status_code, error_message = response.status_code, ''
+                if status_code == NOT_MODIFIED and previous:
+                    etag, last_modified = previous.get('etag'), previous.get('last_modified')
+                etag = response.headers.get('ETag', etag)
+                last_modified = response.headers.get('Last-Modified', last_modified)
+                if status_code >= 400:
+                    error_message = f"HTTP {status_code}"
+            except requests.exceptions.RequestException as e:
+                status_code, error_message = 0, str(e)
+
+        status = LinkStatus(url, status_code, error_message, time.time())
+        failures = (previous or {}).get('failures', 0)
+        if status_code and status_code != RATE_LIMITED:
+            failures = failures + 1 if status.broken else 0
+        entry = {
+            'status_code': status_code,
+            'error_message': error_message,
+            'checked_at': status.checked_at,
+            'next_check': status.checked_at + _next_check(status_code, failures),
+            'failures': failures,
+            'etag': etag,
+            'last_modified': last_modified,
+        }
+        return status, entry
+
+
+def check_posts(posts, checker=None, force=False, record=True):
+    """{post.pk: [broken link dicts]} for `posts`, checking every distinct
+    external URL once. With `record`, broken links are upserted into
+    BrokenLink in bulk and links that work again are marked fixed."""
+    links = {post.pk: extract_links(post) for post in posts}
+    statuses = (checker or LinkChecker()).check(
+        [url for post_links in links.values() for url, _ in post_links], force=force,
+    )
+
+    broken = {
+        pk: [statuses[url].as_dict(anchor_text) for url, anchor_text in post_links if statuses[url].broken]
+        for pk, post_links in links.items()
+    }
+    if record:
+        _record(posts, links, statuses)
+    return broken
+
+
+def _record(posts, links, statuses):
+    from django.contrib.contenttypes.models import ContentType
+
+    from .models import BrokenLink
+
+    content_types = {}
+    rows, healthy = {}, set()
+    for post in posts:
+        content_type = content_types.get(type(post))
+        if content_type is None:
+            content_type = content_types[type(post)] = ContentType.objects.get_for_model(post)
+        for url, anchor_text in links[post.pk]:
+            status = statuses[url]
+            # Failed requests and rate limits are not recorded: they say nothing about the link
+            if status.broken and status.status_code:
+                rows[(content_type.pk, post.pk, url)] = BrokenLink(
+                    content_type=content_type,
+                    object_id=post.pk,
+                    url=url,
+                    anchor_text=anchor_text[:255],
+                    status_code=status.status_code,
+                    error_message=status.error_message,
+                    fixed=False,
+                )
+            elif not status.broken and status.status_code != RATE_LIMITED:
+                healthy.add((content_type.pk, post.pk, url))
+
+    if rows:
+        BrokenLink.objects.bulk_create(
+            rows.values(),
+            update_conflicts=True,
+            unique_fields=['content_type', 'object_id', 'url'],
+            update_fields=['anchor_text', 'status_code', 'error_message', 'last_checked', 'fixed'],
+            batch_size=500,
+        )
+    if healthy:
+        open_rows = BrokenLink.objects.filter(
+            content_type__in=list(content_types.values()),
+            object_id__in=[post.pk for post in posts],
+            fixed=False,
+        ).values_list('pk', 'content_type_id', 'object_id', 'url')
+        fixed = [pk for pk, *link in open_rows if tuple(link) in healthy]
+        if fixed:
+            BrokenLink.objects.filter(pk__in=fixed).update(fixed=True)
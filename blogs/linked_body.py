@@ -0,0 +1,104 @@
+# blogs/linked_body.py
+"""Cached auto-linked article bodies.
+
+auto_link_bundle() output (linked HTML, linked_ids, related_links) only
+changes when the post or the posts it links to change. So it is stored
+under
+
+    linked_body:<post id>:<link-graph version>:<hash of body + related ids>
+
+in the 'linked_bodies' cache (the default cache when that alias is not
+configured). The link-graph version is bumped by signals whenever a
+published post is published, edited, unpublished or deleted, because any of
+those can change the titles, URLs or keywords that other bodies link with.
+Old entries are never read again and simply expire.
+
+Related posts are part of the hash, so a new related-posts index gives new
+keys without a version bump. Cached related_links carry 'post_id'; the
+post objects are re-attached from the related posts passed in.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.utils.safestring import mark_safe
+
+VERSION_KEY = 'link_graph:version'
+RELATED_COUNT = 4  # Related posts shown with an article
+
+
+def conf():
+    return settings.LINKED_BODIES
+
+
+def _cache():
+    from django.core.cache import cache, caches
+
+    return caches['linked_bodies'] if 'linked_bodies' in settings.CACHES else cache
+
+
+def graph_version():
+    store = _cache()
+    version = store.get(VERSION_KEY)
+    if version is None:
+        # Start from the clock so a lost counter never reuses an old version
+        store.add(VERSION_KEY, time.time_ns() // 1000, None)
+        version = store.get(VERSION_KEY)
+    return version
+
+
+def bump_graph_version():
+    """Invalidate every cached linked body."""
+    store = _cache()
+    try:
+        store.incr(VERSION_KEY)
+    except ValueError:
+        store.set(VERSION_KEY, time.time_ns() // 1000, None)
+
+
+def cache_key(post, related_posts, version):
+    digest = hashlib.sha256()
+    digest.update((post.blog_body or '').encode())
+    digest.update(b'\x1f')
+    digest.update(','.join(str(p.pk) for p in related_posts).encode())
+    return f'linked_body:{post.pk}:{version}:{digest.hexdigest()[:32]}'
+
+
+def linked_body(post, related_posts):
+    """auto_link_bundle(post.blog_body, related_posts), from the cache when
+    neither the post nor the link graph has changed since it was stored."""
+    from .templatetags.auto_link import auto_link_bundle
+
+    related_posts = list(related_posts)
+    by_id = {p.pk: p for p in related_posts}
+    key = None
+    try:
+        key = cache_key(post, related_posts, graph_version())
+        cached = _cache().get(key)
+    except Exception as e:
+        print(f"[Linked body] Cache unavailable, linking inline: {e}")
+        cached = None
+
+    if cached is None:
+        bundle = auto_link_bundle(post.blog_body, related_posts)
+        cached = {
+            'content': str(bundle['content']),
+            'linked_ids': bundle['linked_ids'],
+            'related_links': [
+                {name: value for name, value in link.items() if name != 'post'} | {'post_id': link['post'].pk}
+                for link in bundle['related_links']
+            ],
+        }
+        if key is not None:
+            try:
+                _cache().set(key, cached, conf()['TIMEOUT'])
+            except Exception as e:
+                print(f"[Linked body] Could not store {key}: {e}")
+
+    return {
+        'content': mark_safe(cached['content']),
+        'linked_ids': cached['linked_ids'],
+        'related_links': [
+            {**link, 'post': by_id.get(link['post_id'])} for link in cached['related_links']
+        ],
+    }
@@ -1,36 +1,55 @@
 from django.core.management.base import BaseCommand
-from blogs.models import Blog
-from blogs.ai_content import AIContentIntelligence
+from blogs.models import Blog, ContentAnalysis
+from blogs.ai_content import content_hash, refresh_content_analysis
 
 class Command(BaseCommand):
-    help = 'Analyze blog content using AI intelligence'
-    
+    help = 'Analyze blog content using AI intelligence and store the results'
+
     def add_arguments(self, parser):
         parser.add_argument('--blog-id', type=int, help='Analyze specific blog post')
-        parser.add_argument('--all', action='store_true', help='Analyze all published posts')
-    
+        parser.add_argument('--all', action='store_true', help='Refresh stored analyses for all published posts')
+        parser.add_argument('--force', action='store_true', help='Recompute even if the stored analysis is current')
+
     def handle(self, *args, **options):
         if options['blog_id']:
             try:
                 blog = Blog.objects.get(id=options['blog_id'])
-                self.analyze_single_blog(blog)
+                self.analyze_single_blog(blog, options['force'])
             except Blog.DoesNotExist:
                 self.stdout.write(self.style.ERROR(f'Blog with ID {options["blog_id"]} not found'))
-        
+
         elif options['all']:
-            blogs = Blog.objects.filter(status='Published')
-            self.stdout.write(f'Analyzing {blogs.count()} blog posts...')
-            
-            for blog in blogs:
-                self.analyze_single_blog(blog)
-                
+            self.refresh_all(options['force'])
+
         else:
             self.stdout.write(self.style.WARNING('Please specify --blog-id or --all'))
-    
-    def analyze_single_blog(self, blog):
-        ai_analyzer = AIContentIntelligence(blog)
-        analysis = ai_analyzer.analyze_content()
-        
+
+    def refresh_all(self, force):
+        blogs = Blog.objects.filter(status='Published').order_by('id')
+        # One query for every stored hash instead of one per post
+        stored = dict(ContentAnalysis.objects.values_list('post_id', 'content_hash'))
+        self.stdout.write(f'Checking {blogs.count()} blog posts...')
+
+        refreshed = skipped = failed = 0
+        for blog in blogs.iterator(chunk_size=100):
+            if not force and stored.get(blog.pk) == content_hash(blog):
+                skipped += 1
+                continue
+            try:
+                analysis = refresh_content_analysis(blog, force=True)
+                refreshed += 1
+                self.stdout.write(f'  ✓ {blog.title} ({analysis["score"]}/100)')
+            except Exception as e:
+                failed += 1
+                self.stdout.write(self.style.ERROR(f'  ✗ {blog.title}: {e}'))
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Refreshed: {refreshed}, up to date: {skipped}, failed: {failed}')
+        )
+
+    def analyze_single_blog(self, blog, force=False):
+        analysis = refresh_content_analysis(blog, force=force)
+
         self.stdout.write(f'\n--- Analysis for: {blog.title} ---')
         self.stdout.write(f'Overall Score: {analysis["score"]}/100')
         self.stdout.write(f'Readability Grade: {analysis["readability"]["readability_grade"]}')
@@ -39,10 +58,10 @@ class Command(BaseCommand):
         self.stdout.write(f'  - Keyword Density: {analysis["seo"]["keyword_density"]}%')
         self.stdout.write(f'  - Title Length: {analysis["seo"]["title_optimization"]["length"]} chars')
         self.stdout.write(f'  - Meta Description: {analysis["seo"]["meta_description"]["length"]} chars')
-        
+
         if analysis['suggestions']:
             self.stdout.write(f'\nSuggestions:')
             for suggestion in analysis['suggestions']:
                 priority_color = self.style.ERROR if suggestion['priority'] == 'high' else self.style.WARNING
                 self.stdout.write(priority_color(f'  [{suggestion["priority"].upper()}] {suggestion["message"]}'))
-                self.stdout.write(f'    Action: {suggestion["action"]}')
\ No newline at end of file
+                self.stdout.write(f'    Action: {suggestion["action"]}')
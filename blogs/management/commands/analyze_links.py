@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
 from blogs.models import Blog
-from blogs.link_building import AILinkBuilder
+from blogs.link_building import AILinkBuilder, LinkOpportunityEngine
+from blogs.link_checker import check_posts
 
 class Command(BaseCommand):
     help = 'Analyze blog posts for link building opportunities'
@@ -21,18 +22,30 @@ class Command(BaseCommand):
                 self.stdout.write(self.style.ERROR(f'Post {options["post_id"]} not found'))
         
         elif options['all']:
-            posts = Blog.objects.filter(status='Published')
-            for post in posts:
-                self.analyze_post(post, link_builder, options['check_broken'])
+            # Load every post once and score them against each other with sparse products
+            engine = LinkOpportunityEngine.from_published(link_builder)
+            posts = [document.post for document in engine.documents]
+            # Every distinct external URL checked once, concurrently, before the per-post reports
+            broken = check_posts(posts) if options['check_broken'] else {}
+            # Opportunities are scored a block of posts at a time
+            for document, opportunities in engine.iter_all():
+                self.analyze_post(
+                    document.post, link_builder, options['check_broken'], engine,
+                    broken.get(document.post.pk, []), opportunities,
+                )
         
         else:
             self.stdout.write(self.style.WARNING('Specify --post-id or --all'))
     
-    def analyze_post(self, post, link_builder, check_broken=False):
+    def analyze_post(self, post, link_builder, check_broken=False, engine=None, broken_links=None, internal_links=None):
         self.stdout.write(f'\n--- Analyzing: {post.title} ---')
         
-        # Get link suggestions
-        suggestions = link_builder.generate_link_suggestions(post)
+        # Get link suggestions (links are only checked with --check-broken)
+        if not check_broken:
+            broken_links = []
+        suggestions = link_builder.generate_link_suggestions(
+            post, engine=engine, broken_links=broken_links, internal_links=internal_links,
+        )
         
         # Internal links
         internal_links = suggestions['internal_links']
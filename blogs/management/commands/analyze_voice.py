@@ -0,0 +1,66 @@
+# blogs/management/commands/analyze_voice.py
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from blogs.jobs import init_worker
+from blogs.models import Blog, VoiceAnalysis
+from blogs.voice_search import refresh_voice_analysis, refresh_voice_batch, voice_content_hash
+
+
+class Command(BaseCommand):
+    help = 'Recompute stored voice-search readiness reports for published posts in a process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--blog-id', type=int, help='Analyze a single post inline')
+        parser.add_argument('--force', action='store_true', help='Recompute even if the stored report is current')
+        parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(), help='Worker processes (default: CPU count)')
+        parser.add_argument('--batch-size', type=int, default=25, help='Posts per task (default: 25)')
+
+    def handle(self, *args, **options):
+        if options['blog_id']:
+            post = Blog.objects.select_related('author').filter(pk=options['blog_id']).first()
+            if post is None:
+                self.stdout.write(self.style.ERROR(f'Blog with ID {options["blog_id"]} not found'))
+                return
+            analysis = refresh_voice_analysis(post, force=options['force'])
+            self.stdout.write(self.style.SUCCESS(f'{post.title}: voice score {analysis["overall_voice_score"]}'))
+            return
+
+        stale_ids = self.stale_post_ids(options['force'])
+        if not stale_ids:
+            self.stdout.write(self.style.SUCCESS('All voice reports are up to date'))
+            return
+
+        batch_size = max(1, options['batch_size'])
+        batches = [stale_ids[i:i + batch_size] for i in range(0, len(stale_ids), batch_size)]
+        workers = max(1, min(options['workers'], len(batches)))
+        self.stdout.write(f'Recomputing {len(stale_ids)} reports in {len(batches)} batches on {workers} processes...')
+
+        # Children open their own DB connections after django.setup()
+        connections.close_all()
+        refreshed = failed = 0
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=init_worker) as pool:
+            futures = [pool.submit(refresh_voice_batch, batch, True) for batch in batches]
+            for future in as_completed(futures):
+                done, errors = future.result()
+                refreshed += done
+                failed += errors
+                self.stdout.write(f'  {refreshed + failed}/{len(stale_ids)}')
+
+        self.stdout.write(self.style.SUCCESS(f'Refreshed: {refreshed}, failed: {failed}'))
+
+    def stale_post_ids(self, force):
+        posts = Blog.objects.filter(status='Published').order_by('id')
+        if force:
+            return list(posts.values_list('id', flat=True))
+
+        stored = dict(VoiceAnalysis.objects.values_list('post_id', 'content_hash'))
+        return [
+            post.pk for post in posts.iterator(chunk_size=200)
+            if stored.get(post.pk) != voice_content_hash(post)
+        ]
@@ -0,0 +1,45 @@
+# blogs/management/commands/backfill_derived_text.py
+
+from django.core.management.base import BaseCommand
+from blogs.models import Blog, DERIVED_TEXT_FIELDS
+
+
+class Command(BaseCommand):
+    help = 'Fill plain text, word count, reading time, excerpt and meta description for existing posts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Posts written per UPDATE batch (default: 200)',
+        )
+        parser.add_argument(
+            '--only-missing',
+            action='store_true',
+            help='Skip posts that already have plain text',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        posts = Blog.objects.only('id', 'blog_body', 'short_description', 'meta_description').order_by('id')
+        if options['only_missing']:
+            posts = posts.filter(plain_text='')
+
+        updated = 0
+        batch = []
+        for post in posts.iterator(chunk_size=batch_size):
+            post.update_derived_text()
+            batch.append(post)
+            if len(batch) >= batch_size:
+                # bulk_update skips save() and its signals
+                Blog.objects.bulk_update(batch, DERIVED_TEXT_FIELDS)
+                updated += len(batch)
+                batch = []
+                self.stdout.write(f'  {updated} posts updated...')
+
+        if batch:
+            Blog.objects.bulk_update(batch, DERIVED_TEXT_FIELDS)
+            updated += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'Backfilled derived text for {updated} posts'))
@@ -0,0 +1,52 @@
+# blogs/management/commands/backfill_user_agents.py
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Min
+
+from blogs.analytics import AnalyticsEvent
+from blogs.user_agents import classify
+
+
+class Command(BaseCommand):
+    help = 'Classify the user agent of existing analytics events into device, browser and bot columns'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=50000,
+            help='Event ids per chunk (default: 50000)',
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Reclassify every row, not only unclassified ones',
+        )
+
+    def handle(self, *args, **options):
+        events = AnalyticsEvent.objects.all()
+        if not options['all']:
+            events = events.filter(device_type='')
+
+        bounds = events.aggregate(low=Min('id'), high=Max('id'))
+        if bounds['low'] is None:
+            self.stdout.write(self.style.SUCCESS('All events are classified'))
+            return
+
+        chunk_size = options['chunk_size']
+        updated = 0
+        for start in range(bounds['low'], bounds['high'] + 1, chunk_size):
+            chunk = events.filter(id__gte=start, id__lt=start + chunk_size)
+            # One UPDATE per distinct user agent in the chunk rather than per row
+            with transaction.atomic():
+                for user_agent in chunk.values_list('user_agent', flat=True).distinct():
+                    info = classify(user_agent)
+                    updated += chunk.filter(user_agent=user_agent).update(
+                        device_type=info.device_type,
+                        browser_family=info.browser_family,
+                        is_bot=info.is_bot,
+                    )
+            self.stdout.write(f'  ids < {start + chunk_size}: {updated} events classified')
+
+        self.stdout.write(self.style.SUCCESS(f'Classified {updated} events'))
@@ -0,0 +1,120 @@
+# blogs/management/commands/benchmark_content_insights.py
+
+import time
+from contextlib import contextmanager
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count, Q
+
+from blogs import analytics_rollup
+from blogs.analytics import AnalyticsEvent, UserBehaviorAnalytics
+from blogs.models import Blog
+
+EVENT_MIX = [
+    'page_view', 'page_view', 'page_view', 'scroll_depth',
+    'time_on_page', 'link_clicked', 'comment_posted', 'newsletter_signup',
+]
+
+INSERT_SQL = """
+    INSERT INTO {table} (event_type, user_id, session_id, content_type_id, object_id,
+                         event_data, user_agent, device_type, browser_family, is_bot,
+                         ip_address, referrer, timestamp)
+    SELECT (%(mix)s::text[])[1 + (g %% %(mix_len)s)],
+           'v' || (g %% %(visitors)s),
+           's' || (g / 4),
+           %(content_type)s,
+           (%(post_ids)s::int[])[1 + (g %% %(post_count)s)],
+           jsonb_build_object('depth', g %% 101, 'duration', g %% 600),
+           CASE WHEN g %% 3 = 0 THEN 'Mozilla/5.0 (iPhone) Mobile' ELSE 'Mozilla/5.0 (X11; Linux x86_64)' END,
+           CASE WHEN g %% 3 = 0 THEN 'mobile' ELSE 'desktop' END,
+           'other',
+           false,
+           NULL,
+           '',
+           now() - (g %% (%(days)s * 86400)) * interval '1 second'
+    FROM generate_series(%(start)s, %(end)s) AS g
+"""
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Time content performance insights against a synthetic AnalyticsEvent table. '
+        'Everything runs in one transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=10_000_000, help='Synthetic events (default: 10M)')
+        parser.add_argument('--days', type=int, default=30, help='Window the events are spread over')
+        parser.add_argument('--visitors', type=int, default=200_000, help='Distinct synthetic visitor ids')
+        parser.add_argument('--batch-size', type=int, default=1_000_000, help='Rows per INSERT ... SELECT')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('This benchmark needs PostgreSQL (generate_series)')
+
+        post_ids = list(Blog.objects.filter(status='Published').values_list('id', flat=True))
+        if not post_ids:
+            raise CommandError('Needs at least one published post to attach events to')
+
+        try:
+            with transaction.atomic():
+                self.run(post_ids, options)
+                raise _Rollback
+        except _Rollback:
+            self.stdout.write('Rolled back synthetic data')
+
+    def run(self, post_ids, options):
+        days = options['days']
+        content_type = ContentType.objects.get_for_model(Blog)
+        sql = INSERT_SQL.format(table=connection.ops.quote_name(AnalyticsEvent._meta.db_table))
+
+        with self.timer(f'Insert {options["events"]:,} events over {len(post_ids)} posts'):
+            with connection.cursor() as cursor:
+                for start in range(0, options['events'], options['batch_size']):
+                    cursor.execute(sql, {
+                        'mix': EVENT_MIX,
+                        'mix_len': len(EVENT_MIX),
+                        'visitors': options['visitors'],
+                        'content_type': content_type.id,
+                        'post_ids': post_ids,
+                        'post_count': len(post_ids),
+                        'days': days,
+                        'start': start,
+                        'end': min(start + options['batch_size'], options['events']) - 1,
+                    })
+                cursor.execute(f'ANALYZE {connection.ops.quote_name(AnalyticsEvent._meta.db_table)}')
+
+        with self.timer('Grouped aggregate over raw events (for comparison)'):
+            list(AnalyticsEvent.objects.filter(content_type=content_type).values('object_id').annotate(
+                views=Count('id', filter=Q(event_type='page_view')),
+                sessions=Count('session_id', distinct=True),
+                interactions=Count('id', filter=~Q(event_type__in=analytics_rollup.PASSIVE_EVENTS)),
+            ))
+
+        with self.timer(f'Rebuild {days} days of rollups (one-off, then incremental)'):
+            rows = analytics_rollup.rebuild(days)
+        self.stdout.write(f'  {rows} daily rows')
+
+        analytics = UserBehaviorAnalytics()
+        with self.timer('Insights from rollups (uncached)'):
+            insights = analytics.compute_content_performance_insights(days)
+        self.stdout.write(f'  top post score: {insights["top_performing"][0]["engagement_score"] if insights["top_performing"] else "-"}')
+
+        cache_key = f'content_insights:{days}'
+        analytics._insights_cache().delete(cache_key)
+        analytics.get_content_performance_insights(days)
+        with self.timer('Insights (cache hit)'):
+            analytics.get_content_performance_insights(days)
+        analytics._insights_cache().delete(cache_key)
+
+    @contextmanager
+    def timer(self, label):
+        start = time.perf_counter()
+        yield
+        self.stdout.write(f'{label}: {(time.perf_counter() - start) * 1000:,.0f} ms')
@@ -0,0 +1,109 @@
+# blogs/management/commands/benchmark_image_encoder.py
+
+import multiprocessing
+import os
+import resource
+import statistics
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image, ImageOps
+
+# Only image_engine: spawned _measure workers re-import this module without django.setup()
+from blogs.image_engine import JPEG_QUALITY, SIZES, WEBP_QUALITY, decode, encode_derivatives
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+def _legacy_encode(path, out_dir):
+    """The previous pipeline: every size is resized from full resolution and
+    encoded serially into memory before being written out."""
+    ext = os.path.splitext(path)[1].lower()
+    fmt = 'PNG' if ext == '.png' else 'JPEG'
+    img = ImageOps.exif_transpose(Image.open(path)).convert('RGB')
+
+    def save(image, name, image_fmt, quality):
+        buf = BytesIO()
+        kwargs = {'optimize': True}
+        if image_fmt != 'PNG':
+            kwargs['quality'] = quality
+        image.save(buf, format=image_fmt, **kwargs)
+        with open(os.path.join(out_dir, name), 'wb') as f:
+            f.write(buf.getvalue())
+
+    save(img, f'bench{ext}', fmt, JPEG_QUALITY)
+    save(img, 'bench.webp', 'WEBP', WEBP_QUALITY)
+    for size in SIZES:
+        for out_ext, out_fmt, quality in ((ext, fmt, JPEG_QUALITY), ('.webp', 'WEBP', WEBP_QUALITY)):
+            copy = img.copy()
+            copy.thumbnail((size, size * copy.height // copy.width), Image.LANCZOS)
+            save(copy, f'bench-{size}{out_ext}', out_fmt, quality)
+
+
+def _engine_encode(path, out_dir):
+    ext = os.path.splitext(path)[1].lower()
+    img = decode(path)
+    encode_derivatives(
+        img, out_dir, os.path.join(out_dir, 'resized'), 'bench', ext, SIZES,
+        jpeg_quality=JPEG_QUALITY, webp_quality=WEBP_QUALITY,
+    )
+
+
+def _measure(mode, path):
+    """Runs in a fresh process so ru_maxrss is the peak of this run alone."""
+    with tempfile.TemporaryDirectory() as out_dir:
+        start = time.perf_counter()
+        (_legacy_encode if mode == 'legacy' else _engine_encode)(path, out_dir)
+        elapsed = (time.perf_counter() - start) * 1000
+    # ru_maxrss is in KiB on Linux
+    return elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Command(BaseCommand):
+    help = 'Compare the legacy and parallel image encoders on a folder of photos (wall time and peak RSS)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('folder', help='Folder of .jpg/.jpeg/.png images')
+        parser.add_argument('--repeat', type=int, default=1, help='Runs per image per encoder (default: 1)')
+
+    def handle(self, *args, **options):
+        folder = options['folder']
+        if not os.path.isdir(folder):
+            raise CommandError(f'{folder} is not a directory')
+
+        images = sorted(
+            os.path.join(folder, name) for name in os.listdir(folder)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        if not images:
+            raise CommandError(f'No images found in {folder}')
+
+        results = {'legacy': [], 'engine': []}
+        context = multiprocessing.get_context('spawn')
+        for path in images:
+            with Image.open(path) as probe:
+                dimensions = f'{probe.width}x{probe.height}'
+            self.stdout.write(f'{os.path.basename(path)} ({dimensions})')
+            for mode in ('legacy', 'engine'):
+                for _ in range(max(1, options['repeat'])):
+                    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                        elapsed, rss = pool.submit(_measure, mode, path).result()
+                    results[mode].append((elapsed, rss))
+                    self.stdout.write(f'  {mode:<6} {elapsed:8.1f} ms | peak RSS {rss:7.1f} MiB')
+
+        self.stdout.write('')
+        for mode, label in (('legacy', 'before (serial, resize from full size)'), ('engine', 'after  (single decode, cascade, parallel)')):
+            times = [t for t, _ in results[mode]]
+            peaks = [r for _, r in results[mode]]
+            self.stdout.write(
+                f'{label}: median {statistics.median(times):.1f} ms | '
+                f'total {sum(times) / 1000:.2f} s | max peak RSS {max(peaks):.1f} MiB'
+            )
+
+        legacy_median = statistics.median(t for t, _ in results['legacy'])
+        engine_median = statistics.median(t for t, _ in results['engine'])
+        if engine_median > 0:
+            self.stdout.write(self.style.SUCCESS(f'Median speed-up: {legacy_median / engine_median:.1f}x'))
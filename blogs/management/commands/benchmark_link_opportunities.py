@@ -0,0 +1,102 @@
+# blogs/management/commands/benchmark_link_opportunities.py
+
+import time
+from contextlib import contextmanager
+
+from django.core.management.base import BaseCommand
+
+from blogs.link_building import AILinkBuilder, LinkDocument, LinkOpportunityEngine
+
+
+def synthetic_documents(count, seed=0, words_per_post=600, vocabulary=30000, tag_pool=400, categories=12):
+    """Posts with Zipf-distributed words, 2-5 tags and one category each"""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+
+    def word(index):
+        text = ''
+        index += 26 ** 3  # At least four letters
+        while index:
+            index, digit = divmod(index, 26)
+            text += letters[digit]
+        return text
+
+    vocab = [word(i) for i in range(vocabulary)]
+    weights = 1.0 / np.arange(1, vocabulary + 1)
+    weights /= weights.sum()
+    tags = [f'topic {word(i)}' for i in range(tag_pool)]
+
+    documents = []
+    for pk in range(1, count + 1):
+        words = [vocab[i] for i in rng.choice(vocabulary, size=words_per_post, p=weights)]
+        documents.append(LinkDocument(
+            pk=pk,
+            title=' '.join(words[:6]).title(),
+            seo_keywords=', '.join(words[6:9]),
+            text='. '.join(' '.join(words[i:i + 12]).capitalize() for i in range(0, len(words), 12)) + '.',
+            tags=tuple(tags[i] for i in rng.choice(tag_pool, size=rng.integers(2, 6), replace=False)),
+            category_id=int(rng.integers(1, categories + 1)),
+            url=f'/post-{pk}/',
+        ))
+    return documents
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the sparse-matrix link opportunity engine against the pairwise approach on '
+        'synthetic posts (no database writes)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='100,1000,5000,20000', help='Comma-separated post counts')
+        parser.add_argument('--pairwise-max', type=int, default=1000, help='Largest size to also time pairwise')
+        parser.add_argument('--anchor-sample', type=int, default=20, help='Source posts to run anchor matching for')
+
+    def handle(self, *args, **options):
+        builder = AILinkBuilder()
+        for size in [int(value) for value in options['sizes'].split(',')]:
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{size:,} posts'))
+            documents = synthetic_documents(size)
+
+            with self.timer('  build term/tag matrices'):
+                engine = LinkOpportunityEngine(documents, builder=builder)
+
+            pairs = 0
+            with self.timer('  all-pairs similarity (block sparse products)'):
+                for start in range(0, size, engine.BLOCK_SIZE):
+                    block = engine.similarity_block(list(range(start, min(start + engine.BLOCK_SIZE, size))))
+                    pairs += int((block > engine.THRESHOLD).sum())
+            self.stdout.write(f'    {pairs:,} source/target pairs above {engine.THRESHOLD}')
+
+            sample = documents[:options['anchor_sample']]
+            start = time.perf_counter()
+            for document in sample:
+                engine.opportunities_for(document)
+            per_post = (time.perf_counter() - start) / max(len(sample), 1)
+            self.stdout.write(f'  opportunities per post (similarity row + anchor matching): {per_post * 1000:,.1f} ms')
+
+            if size <= options['pairwise_max']:
+                with self.timer('  all-pairs similarity, pairwise Python sets (old approach, without its queries)'):
+                    self.pairwise(documents, builder.stop_words)
+
+    def pairwise(self, documents, stop_words):
+        for source in documents:
+            for target in documents:
+                if source.pk == target.pk:
+                    continue
+                words1 = {w for w in source.text.lower().split() if w not in stop_words and len(w) > 3}
+                words2 = {w for w in target.text.lower().split() if w not in stop_words and len(w) > 3}
+                union = len(words1 | words2)
+                tags1, tags2 = set(source.tags), set(target.tags)
+                similarity = (len(words1 & words2) / union if union else 0) \
+                    + (0.2 if source.category_id == target.category_id else 0) \
+                    + 0.3 * len(tags1 & tags2) / max(len(tags1 | tags2), 1)
+                min(similarity, 1.0)
+
+    @contextmanager
+    def timer(self, label):
+        start = time.perf_counter()
+        yield
+        self.stdout.write(f'{label}: {(time.perf_counter() - start) * 1000:,.0f} ms')
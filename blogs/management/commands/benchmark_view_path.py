@@ -0,0 +1,78 @@
+# blogs/management/commands/benchmark_view_path.py
+
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+
+from blogs.models import Blog
+from blogs.media import process_featured_image
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the per-view save path with and without the image derivative manifest'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--post-id', type=int, help='Post to benchmark (default: latest published post with an image)')
+        parser.add_argument('--iterations', type=int, default=20, help='Saves per mode (default: 20)')
+
+    def handle(self, *args, **options):
+        post = self.get_post(options['post_id'])
+        if post is None:
+            self.stdout.write(self.style.ERROR('No published post with a featured image found'))
+            return
+
+        iterations = options['iterations']
+        self.stdout.write(f'Benchmarking "{post.title}" ({iterations} saves per mode)')
+
+        # Work on a throwaway copy of the media so re-encoding never touches real files,
+        # and roll back every DB write at the end.
+        with tempfile.TemporaryDirectory() as media_root:
+            src = post.featured_image.path
+            dst = os.path.join(media_root, post.featured_image.name)
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            shutil.copy2(src, dst)
+
+            with override_settings(MEDIA_ROOT=media_root), transaction.atomic():
+                legacy = self.run_mode(post, iterations, force=True)
+                # Prime the manifest once, then measure the steady state
+                process_featured_image(post, force=True)
+                manifest = self.run_mode(post, iterations, force=False)
+                transaction.set_rollback(True)
+
+        self.report('before (re-encode on every save)', legacy)
+        self.report('after  (manifest check)', manifest)
+        if statistics.median(manifest) > 0:
+            speedup = statistics.median(legacy) / statistics.median(manifest)
+            self.stdout.write(self.style.SUCCESS(f'Median speed-up: {speedup:.1f}x'))
+
+    def get_post(self, post_id):
+        qs = Blog.objects.exclude(featured_image='')
+        if post_id:
+            return qs.filter(pk=post_id).first()
+        return qs.filter(status='Published').order_by('-created_at').first()
+
+    def run_mode(self, post, iterations, force):
+        timings = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            post.views += 1
+            post.save(update_fields=['views'])
+            if force:
+                # What the old post_save receiver did on every view
+                process_featured_image(post, force=True)
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings
+
+    def report(self, label, timings):
+        timings = sorted(timings)
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(
+            f'{label}: median {statistics.median(timings):.2f} ms | '
+            f'p95 {p95:.2f} ms | max {timings[-1]:.2f} ms'
+        )
@@ -0,0 +1,39 @@
+# blogs/management/commands/build_related_index.py
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from blogs import related_posts
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the related-posts index (TF-IDF + tags + category) over all published posts. '
+        'Run nightly; publishes in between are added incrementally by the worker.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--post-id', type=int, help='Only refresh this post incrementally')
+
+    def handle(self, *args, **options):
+        from blogs.models import Blog
+
+        start = time.perf_counter()
+        if options['post_id']:
+            post = Blog.objects.filter(pk=options['post_id']).first()
+            if post is None:
+                self.stdout.write(self.style.ERROR(f'Post {options["post_id"]} not found'))
+                return
+            if not related_posts.update_post(post):
+                self.stdout.write(self.style.WARNING('No index yet; run without --post-id first'))
+                return
+            self.stdout.write(self.style.SUCCESS(f'Updated post {post.pk} in {time.perf_counter() - start:.2f}s'))
+            return
+
+        count = related_posts.build(
+            progress=lambda done, total: self.stdout.write(f'  {done}/{total} posts scored'),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {count} posts in {time.perf_counter() - start:.1f}s ({related_posts.index_dir()})'
+        ))
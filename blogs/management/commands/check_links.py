@@ -0,0 +1,51 @@
+# blogs/management/commands/check_links.py
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from blogs.link_checker import LinkChecker, check_posts
+from blogs.models import Blog
+
+
+class Command(BaseCommand):
+    help = (
+        'Check external links of published posts concurrently and record broken ones in BrokenLink. '
+        'URLs checked recently come from the shared status cache.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--post-id', type=int, help='Only check this post')
+        parser.add_argument(
+            '--url', action='append', default=[], help='Check these URLs only (repeatable, not recorded)',
+        )
+        parser.add_argument('--force', action='store_true', help='Ignore cached statuses')
+        parser.add_argument('--workers', type=int, help='Threads (default: LINK_CHECKER["WORKERS"])')
+
+    def handle(self, *args, **options):
+        checker = LinkChecker(workers=options['workers'])
+        start = time.perf_counter()
+
+        if options['url']:
+            for url, status in checker.check(options['url'], force=options['force']).items():
+                style = self.style.ERROR if status.broken else self.style.SUCCESS
+                source = 'cached' if status.cached else 'checked'
+                self.stdout.write(style(f'  {status.status_code or "ERR"} {url} ({source}) {status.error_message}'))
+            return
+
+        posts = Blog.objects.filter(status='Published').only('pk', 'title', 'blog_body')
+        if options['post_id']:
+            posts = posts.filter(pk=options['post_id'])
+        posts = list(posts)
+
+        broken = check_posts(posts, checker=checker, force=options['force'])
+        titles = {post.pk: post.title for post in posts}
+        total = 0
+        for pk, links in broken.items():
+            for link in links:
+                total += 1
+                self.stdout.write(self.style.ERROR(f'  ✗ {titles[pk]}: {link["url"]} - {link["error_message"]}'))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked {len(posts)} posts in {time.perf_counter() - start:.1f}s, {total} broken links'
+        ))
@@ -0,0 +1,59 @@
+# blogs/management/commands/flush_analytics.py
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from blogs import analytics_buffer
+
+
+class Command(BaseCommand):
+    help = 'Write buffered analytics events to the database in bulk and forward them to GA4'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep flushing every --interval seconds',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=settings.ANALYTICS_BUFFER['FLUSH_INTERVAL'],
+            help='Seconds between flushes with --loop',
+        )
+        parser.add_argument(
+            '--stats',
+            action='store_true',
+            help='Print buffer depth and drop counters and exit',
+        )
+        parser.add_argument(
+            '--replay-dead-letter',
+            action='store_true',
+            help='Move events set aside after repeated write failures back into the buffer first',
+        )
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            for name, value in sorted(analytics_buffer.stats().items()):
+                self.stdout.write(f'{name}: {value}')
+            return
+
+        if options['replay_dead_letter']:
+            replayed = analytics_buffer.replay_dead_letter()
+            self.stdout.write(f'Re-queued {replayed} dead-lettered events')
+
+        try:
+            while True:
+                written = analytics_buffer.flush()
+                if written:
+                    self.stdout.write(self.style.SUCCESS(f'Flushed {written} analytics events'))
+                if not options['loop']:
+                    break
+                connections.close_all()
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Interrupted, flushing once more...'))
+            analytics_buffer.flush()
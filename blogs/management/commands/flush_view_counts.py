@@ -0,0 +1,43 @@
+# blogs/management/commands/flush_view_counts.py
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from blogs import view_counter
+
+
+class Command(BaseCommand):
+    help = 'Write pending Redis view counts into Blog.views with bulk UPDATEs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep flushing every --interval seconds',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=settings.VIEW_COUNTER['FLUSH_INTERVAL'],
+            help='Seconds between flushes with --loop',
+        )
+
+    def handle(self, *args, **options):
+        if settings.VIEW_COUNTER['BACKEND'] != 'redis':
+            self.stdout.write(self.style.WARNING('VIEW_COUNTER backend is not redis; views are written directly'))
+            return
+
+        try:
+            while True:
+                posts, views = view_counter.flush()
+                if posts:
+                    self.stdout.write(self.style.SUCCESS(f'Flushed {views} views across {posts} posts'))
+                if not options['loop']:
+                    break
+                connections.close_all()
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Interrupted'))
@@ -0,0 +1,70 @@
+# blogs/management/commands/manage_analytics_partitions.py
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from blogs import partitions
+
+
+class Command(BaseCommand):
+    help = (
+        'Create upcoming monthly partitions for the analytics tables and drop partitions '
+        'past the retention window (run daily from cron)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, help='Months of partitions to create ahead (default: MONTHS_AHEAD)')
+        parser.add_argument('--retention-months', type=int, help='Months to keep (default: RETENTION_MONTHS)')
+        parser.add_argument('--no-retention', action='store_true', help='Only create partitions, never drop')
+        parser.add_argument('--dry-run', action='store_true', help='List expired partitions without dropping them')
+        parser.add_argument('--copy-legacy', action='store_true', help='Copy rows from the pre-partitioning tables in chunks')
+        parser.add_argument('--drop-legacy', action='store_true', help='Drop the pre-partitioning tables once fully copied')
+        parser.add_argument('--chunk-size', type=int, help='Rows per copy transaction (default: COPY_CHUNK_SIZE)')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Analytics partitioning requires PostgreSQL')
+
+        for model in partitions.PARTITIONED_MODELS:
+            table = model._meta.db_table
+            if not partitions.is_partitioned(table):
+                self.stdout.write(self.style.WARNING(f'{table} is not partitioned; run migrate first'))
+                continue
+
+            for name in partitions.ensure_partitions(table, months_ahead=options['months_ahead']):
+                self.stdout.write(f'Created {name}')
+
+            if options['copy_legacy']:
+                copied = partitions.copy_legacy(
+                    table,
+                    chunk_size=options['chunk_size'],
+                    progress=lambda last, total, copied, table=table: self.stdout.write(
+                        f'  {table}: id {last}/{total} ({copied} rows)'
+                    ),
+                )
+                self.stdout.write(self.style.SUCCESS(f'Copied {copied} legacy rows into {table}'))
+
+            if options['drop_legacy']:
+                try:
+                    if partitions.drop_legacy(table):
+                        self.stdout.write(self.style.SUCCESS(f'Dropped {table}_legacy'))
+                except ValueError as e:
+                    self.stdout.write(self.style.ERROR(str(e)))
+
+            if not options['no_retention']:
+                dropped = partitions.drop_expired(
+                    table,
+                    retention_months=options['retention_months'],
+                    dry_run=options['dry_run'],
+                )
+                verb = 'Would drop' if options['dry_run'] else 'Dropped'
+                for name in dropped:
+                    self.stdout.write(self.style.WARNING(f'{verb} {name}'))
+                purged = partitions.purge_default(
+                    table,
+                    retention_months=options['retention_months'],
+                    dry_run=options['dry_run'],
+                )
+                if purged:
+                    verb = 'Would delete' if options['dry_run'] else 'Deleted'
+                    self.stdout.write(self.style.WARNING(f'{verb} {purged} expired rows from {table}_default'))
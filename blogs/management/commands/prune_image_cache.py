@@ -0,0 +1,33 @@
+# blogs/management/commands/prune_image_cache.py
+
+from django.core.management.base import BaseCommand
+
+from blogs import responsive_images
+
+
+class Command(BaseCommand):
+    help = 'Evict least recently served on-demand image derivatives until the cache fits its size limit'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-mb',
+            type=int,
+            help='Size limit in MB (default: RESPONSIVE_IMAGES["CACHE_MAX_BYTES"])',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report what would be removed',
+        )
+
+    def handle(self, *args, **options):
+        max_bytes = options['max_mb'] * 1024 * 1024 if options['max_mb'] else None
+        removed, freed, remaining = responsive_images.evict(max_bytes, dry_run=options['dry_run'])
+
+        prefix = 'Would remove' if options['dry_run'] else 'Removed'
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'{prefix} {removed} files ({freed / 1024 / 1024:.1f} MB); '
+                f'{remaining / 1024 / 1024:.1f} MB remaining'
+            )
+        )
@@ -0,0 +1,34 @@
+# blogs/management/commands/rollup_analytics.py
+
+from django.core.management.base import BaseCommand
+
+from blogs import analytics_rollup
+
+
+class Command(BaseCommand):
+    help = 'Fold new analytics events into the per-post daily rollup tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild-days',
+            type=int,
+            default=0,
+            help='Recompute every rollup row of the last N days from raw events first',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=0,
+            help='Event ids per transaction (default: ANALYTICS_ROLLUP["CHUNK_SIZE"])',
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild_days']:
+            rows = analytics_rollup.rebuild(options['rebuild_days'])
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} daily rows'))
+
+        covered, rows = analytics_rollup.run(options['chunk_size'] or None)
+        if covered:
+            self.stdout.write(self.style.SUCCESS(f'Rolled up {covered} event ids into {rows} daily rows'))
+        else:
+            self.stdout.write('Rollups are up to date')
@@ -0,0 +1,160 @@
+# blogs/management/commands/run_worker.py
+
+import multiprocessing
+import os
+import socket
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from blogs import analytics_buffer, analytics_rollup, view_counter
+from blogs.jobs import claim_jobs, execute_job, fail_job, init_worker, release_stale_jobs
+
+
+class Command(BaseCommand):
+    help = (
+        'Process queued background jobs (image derivatives, video metadata, content and voice '
+        'analysis, related posts) in a process pool, and periodically flush view counts and '
+        'analytics events and update the analytics rollups. A pool whose worker process dies '
+        'is replaced.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.BACKGROUND_JOBS['WORKERS'],
+            help='Number of worker processes',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=0,
+            help='Jobs claimed per poll (default: 2x workers)',
+        )
+        parser.add_argument(
+            '--kind',
+            action='append',
+            help='Only run jobs of this kind (repeatable)',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=settings.BACKGROUND_JOBS['POLL_INTERVAL'],
+            help='Seconds to sleep when the queue is empty',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Drain the queue and exit instead of polling forever',
+        )
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        batch_size = options['batch_size'] or workers * 2
+        worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        counts = {'done': 0, 'retry': 0, 'failed': 0, 'missing': 0}
+        last_flush = last_analytics_flush = last_rollup = 0
+
+        self.stdout.write(f'Worker {worker_id} started with {workers} processes')
+
+        # Spawned children run django.setup() themselves and never share the
+        # parent's DB connections.
+        context = multiprocessing.get_context('spawn')
+        pool = self.make_pool(workers, context)
+        try:
+            while True:
+                # View counts, analytics events and rollups ride along with the job loop
+                if time.monotonic() - last_flush >= settings.VIEW_COUNTER['FLUSH_INTERVAL']:
+                    last_flush = time.monotonic()
+                    self.flush_views()
+                if time.monotonic() - last_analytics_flush >= settings.ANALYTICS_BUFFER['FLUSH_INTERVAL']:
+                    last_analytics_flush = time.monotonic()
+                    self.flush_analytics()
+                if time.monotonic() - last_rollup >= settings.ANALYTICS_ROLLUP['INTERVAL']:
+                    last_rollup = time.monotonic()
+                    self.rollup_analytics()
+
+                released = release_stale_jobs()
+                if released:
+                    self.stdout.write(self.style.WARNING(f'Re-queued {released} abandoned jobs'))
+
+                job_ids = claim_jobs(batch_size, worker_id, options['kind'])
+                if not job_ids:
+                    if options['once']:
+                        break
+                    connections.close_all()
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                broken = False
+                futures = {}
+                for job_id in job_ids:
+                    try:
+                        futures[pool.submit(execute_job, job_id)] = job_id
+                    except BrokenProcessPool as e:
+                        broken = True
+                        result = fail_job(job_id, f'{type(e).__name__}: {e}')
+                        counts[result] = counts.get(result, 0) + 1
+                for future in as_completed(futures):
+                    job_id = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        # The worker process itself died (e.g. killed for memory)
+                        broken = broken or isinstance(e, BrokenProcessPool)
+                        result = fail_job(job_id, f'{type(e).__name__}: {e}')
+                    counts[result] = counts.get(result, 0) + 1
+                    style = self.style.SUCCESS if result == 'done' else self.style.WARNING
+                    self.stdout.write(style(f'  job {job_id}: {result}'))
+
+                if broken:
+                    self.stdout.write(self.style.ERROR('A worker process died; starting a new pool'))
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = self.make_pool(workers, context)
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Interrupted, waiting for running jobs...'))
+        finally:
+            pool.shutdown(wait=True)
+
+        self.flush_views()
+        self.flush_analytics()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Done: {counts['done']}, retried: {counts['retry']}, failed: {counts['failed']}"
+            )
+        )
+
+    def make_pool(self, workers, context):
+        return ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=init_worker)
+
+    def flush_views(self):
+        try:
+            posts, views = view_counter.flush()
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'View count flush failed: {e}'))
+            return
+        if posts:
+            self.stdout.write(f'Flushed {views} views across {posts} posts')
+
+    def flush_analytics(self):
+        try:
+            written = analytics_buffer.flush()
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'Analytics flush failed: {e}'))
+            return
+        if written:
+            self.stdout.write(f'Flushed {written} analytics events')
+
+    def rollup_analytics(self):
+        try:
+            covered, rows = analytics_rollup.run()
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'Analytics rollup failed: {e}'))
+            return
+        if covered:
+            self.stdout.write(f'Rolled up {covered} event ids into {rows} daily rows')
@@ -0,0 +1,33 @@
+# blogs/management/commands/traffic_stats.py
+
+from django.core.management.base import BaseCommand
+
+from blogs import bot_detection
+
+
+class Command(BaseCommand):
+    help = 'Show how much traffic bot detection filtered out versus counted as human'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Zero the counters after printing them',
+        )
+
+    def handle(self, *args, **options):
+        counts = bot_detection.traffic_counts()
+        human = counts.get('human', 0)
+        bots = counts.get('bot', 0)
+        total = human + bots
+
+        self.stdout.write(f'human: {human}')
+        self.stdout.write(f'bot: {bots} ({bots / total * 100 if total else 0:.1f}% filtered)')
+        for name, value in sorted(counts.items()):
+            if name.startswith('bot:'):
+                self.stdout.write(f'  {name[4:]}: {value}')
+        self.stdout.write(f'crawler ranges loaded: {len(bot_detection.crawler_ranges())}')
+
+        if options['reset']:
+            bot_detection.reset_counts()
+            self.stdout.write(self.style.SUCCESS('Counters reset'))
@@ -3,6 +3,7 @@
 from django.core.management.base import BaseCommand
 from django.core.cache import cache
 from blogs.models import Blog, Category
+from blogs.trending import trending_posts as get_trending_posts
 from django.db.models import Q
 import logging
 
@@ -42,7 +43,7 @@ class Command(BaseCommand):
             featured_post = published_posts.order_by('-created_at').first()
 
         # Trending posts
-        trending_posts = list(published_posts.order_by('-views')[:2])
+        trending_posts = get_trending_posts(2)
 
         # Editor's picks
         editors_picks = list(published_posts.filter(is_editors_pick=True).order_by('-created_at')[:5])
@@ -0,0 +1,41 @@
+# blogs/management/commands/warm_linked_bodies.py
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from blogs.linked_body import RELATED_COUNT, linked_body
+from blogs.models import Blog
+from blogs.related_posts import related_posts as get_related_posts
+
+
+class Command(BaseCommand):
+    help = (
+        'Prefill the auto-linked body cache for the most viewed posts. '
+        'Run after deploys and after bulk edits, which bump the link-graph version.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, help='Posts to warm (default: LINKED_BODIES["WARM_COUNT"])')
+
+    def handle(self, *args, **options):
+        count = options['count'] or settings.LINKED_BODIES['WARM_COUNT']
+        posts = (
+            Blog.objects.select_related('category')
+            .filter(status='Published')
+            .order_by('-views', '-created_at')[:count]
+        )
+
+        start = time.perf_counter()
+        warmed = 0
+        for post in posts:
+            try:
+                linked_body(post, get_related_posts(post, RELATED_COUNT))
+                warmed += 1
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f'  {post.pk} {post.title}: {e}'))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Warmed {warmed} linked bodies in {time.perf_counter() - start:.1f}s'
+        ))
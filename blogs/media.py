@@ -0,0 +1,250 @@
+# blogs/media.py
+"""Featured-image and video processing.
+
+These functions are called either inline from the Blog post_save receivers
+or, when BACKGROUND_JOBS['ASYNC'] is on, from the job worker
+(see blogs/jobs.py and the run_worker management command).
+"""
+import os, re, hashlib
+from io import BytesIO
+from PIL import Image
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from .models import Blog
+from .image_engine import JPEG_QUALITY, SIZES, WEBP_QUALITY, decode, encode_derivatives
+
+# ----------------
+# Helpers
+# ----------------
+def slugify_filename(title):
+    """Convert blog title into SEO-friendly filename."""
+    return re.sub(r'[^a-z0-9]+', '-', title.lower()).strip('-')
+
+def delete_old_files(instance):
+    """Delete old original, WebP, and resized files."""
+    if not instance.featured_image:
+        return
+    try:
+        orig_path = instance.featured_image.path
+        base, _ = os.path.splitext(orig_path)
+        dir_name = os.path.dirname(orig_path)
+        resized_dir = os.path.join(dir_name, "resized")
+
+        if os.path.isfile(orig_path):
+            os.remove(orig_path)
+        if os.path.isfile(f"{base}.webp"):
+            os.remove(f"{base}.webp")
+        if os.path.isdir(resized_dir):
+            for f in os.listdir(resized_dir):
+                if f.startswith(os.path.basename(base)):
+                    os.remove(os.path.join(resized_dir, f))
+    except Exception as e:
+        print(f"[Cleanup error] {e}")
+
+# ----------------
+# Derivative manifest
+# ----------------
+def eager_sizes():
+    """Widths rendered at upload time. Empty when the on-demand endpoint
+    serves resized images (see blogs/responsive_images.py)."""
+    if settings.RESPONSIVE_IMAGES['ENABLED']:
+        return []
+    return list(SIZES)
+
+def derivative_settings(ext):
+    """Settings that affect the generated derivatives. A change in any of
+    these invalidates every manifest and forces re-processing."""
+    return {
+        'sizes': eager_sizes(),
+        'formats': ['PNG' if ext == '.png' else 'JPEG', 'WEBP'],
+        'jpeg_quality': JPEG_QUALITY,
+        'webp_quality': WEBP_QUALITY,
+    }
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """Hash a file in chunks so large uploads are never fully read into memory."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def manifest_is_current(instance, ext):
+    """True when the stored manifest already describes the current
+    featured_image with the current settings. Costs no file I/O."""
+    manifest = instance.image_manifest or {}
+    return (
+        manifest.get('image') == instance.featured_image.name
+        and manifest.get('settings') == derivative_settings(ext)
+    )
+
+# ----------------
+# Image Optimization
+# ----------------
+def process_featured_image(instance, force=False):
+    """Generate the optimized original, main WebP and resized derivatives.
+
+    Skipped entirely when the manifest matches the current image name and
+    settings. When only the name changed (e.g. the same file was uploaded
+    again) the source hash is compared before anything is re-encoded.
+    """
+    if not instance.featured_image:
+        return
+
+    try:
+        image_path = instance.featured_image.path
+    except Exception:
+        return
+
+    ext = os.path.splitext(image_path)[1].lower()
+    if ext not in ['.jpg', '.jpeg', '.png']:
+        return
+
+    if not force and manifest_is_current(instance, ext):
+        return
+
+    if not os.path.isfile(image_path):
+        return
+
+    source_hash = file_sha256(image_path)
+    manifest = instance.image_manifest or {}
+    if (
+        not force
+        and manifest.get('source_hash') == source_hash
+        and manifest.get('settings') == derivative_settings(ext)
+        and manifest.get('image')
+        and default_storage.exists(manifest['image'])
+    ):
+        # Same bytes re-uploaded: point back at the existing derivatives
+        if instance.featured_image.name != manifest['image']:
+            instance.featured_image.name = manifest['image']
+            Blog.objects.filter(pk=instance.pk).update(featured_image=manifest['image'])
+            try:
+                os.remove(image_path)
+            except Exception as e:
+                print(f"[Cleanup duplicate upload error] {e}")
+        return
+
+    # Full-resolution decode: the optimized original and main WebP keep the
+    # source dimensions, so JPEG draft mode can't be used here.
+    img = decode(image_path)
+
+    # Save image dimensions
+    instance.image_width, instance.image_height = img.size
+
+    # SEO-friendly base name
+    base_name = slugify_filename(instance.title)
+    instance.image_base_name = base_name
+
+    original_dir = os.path.dirname(image_path)
+    resized_dir = os.path.join(original_dir, "resized")
+    optimized_path = os.path.join(original_dir, f"{base_name}{ext}")
+
+    # --- 1-3) Optimized original, main WebP and resized versions ---
+    # One decode, cascaded downscales, encodes run in parallel
+    _, errors = encode_derivatives(
+        img, original_dir, resized_dir, base_name, ext, eager_sizes(),
+        jpeg_quality=JPEG_QUALITY, webp_quality=WEBP_QUALITY,
+    )
+    for path, e in errors.items():
+        print(f"[Derivative error] {os.path.basename(path)}: {e}")
+
+    # --- 4) Update featured_image path to optimized file ---
+    if default_storage.exists(optimized_path):
+        instance.featured_image.name = os.path.relpath(optimized_path, settings.MEDIA_ROOT)
+
+    # --- 5) Record what was generated so unchanged saves can skip ---
+    instance.image_manifest = {
+        'image': instance.featured_image.name,
+        'source_hash': source_hash,
+        'base_name': base_name,
+        'settings': derivative_settings(ext),
+    }
+
+    # --- 6) Save updated fields without triggering loop ---
+    Blog.objects.filter(pk=instance.pk).update(
+        featured_image=instance.featured_image.name,
+        image_base_name=base_name,
+        image_width=instance.image_width,
+        image_height=instance.image_height,
+        image_manifest=instance.image_manifest,
+    )
+
+    # --- 7) Delete original uploaded file if different ---
+    if image_path != optimized_path and os.path.exists(image_path):
+        try:
+            os.remove(image_path)
+        except Exception as e:
+            print(f"[Cleanup original error] {e}")
+
+# ----------------
+# Video Processing
+# ----------------
+def extract_video_metadata(instance):
+    """
+    Extract video metadata like duration and generate thumbnail.
+    Only runs if video_file exists and duration is not set; errors are
+    raised so the worker can retry.
+    """
+    if not instance.video_file or instance.video_duration:
+        return
+
+    from moviepy import VideoFileClip
+    from datetime import timedelta
+
+    # Get video file path
+    video_path = instance.video_file.path
+
+    # Check if file exists
+    if not os.path.isfile(video_path):
+        raise FileNotFoundError(f"Video file not found: {video_path}")
+
+    print(f"[Video processing] Processing video for: {instance.title}")
+
+    # Open video
+    clip = VideoFileClip(video_path)
+    
+    # Extract duration
+    duration = timedelta(seconds=int(clip.duration))
+    print(f"[Video processing] Duration: {duration}")
+    
+    # Generate thumbnail at 1 second (if not already set)
+    thumbnail_generated = False
+    if not instance.video_thumbnail:
+        try:
+            # Get frame at 1 second (or 0 if video is shorter)
+            frame_time = min(1, clip.duration - 0.1)
+            frame = clip.get_frame(frame_time)
+            img = Image.fromarray(frame)
+            
+            # Optimize thumbnail
+            img.thumbnail((1280, 720), Image.LANCZOS)
+            
+            # Save thumbnail
+            thumb_io = BytesIO()
+            img.save(thumb_io, format='JPEG', quality=85, optimize=True)
+            thumb_io.seek(0)
+            
+            thumb_name = f"{instance.slug}-video-thumb.jpg"
+            instance.video_thumbnail.save(
+                thumb_name,
+                ContentFile(thumb_io.read()),
+                save=False
+            )
+            thumbnail_generated = True
+            print(f"[Video processing] Thumbnail generated: {thumb_name}")
+        except Exception as thumb_error:
+            print(f"[Video processing] Thumbnail generation failed: {thumb_error}")
+    
+    # Close the video clip
+    clip.close()
+    
+    # Use update() so the post_save receivers don't fire again
+    update_data = {'video_duration': duration}
+    if thumbnail_generated and instance.video_thumbnail:
+        update_data['video_thumbnail'] = instance.video_thumbnail.name
+    
+    Blog.objects.filter(pk=instance.pk).update(**update_data)
+    
+    print(f"[Video processing] Successfully processed video for: {instance.title}")
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogs', '0023_alter_category_meta_description'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blog',
+            name='image_manifest',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Derivative manifest for the featured image (source hash, sizes, formats, quality).'),
+        ),
+    ]
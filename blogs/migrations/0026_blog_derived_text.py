@@ -0,0 +1,85 @@
+# Generated by Django 5.2.3 on 2026-10-17 11:40
+
+import html
+
+from django.db import migrations, models
+from django.utils.html import strip_tags
+
+WORDS_PER_MINUTE = 200
+EXCERPT_MAX_LENGTH = 500
+DERIVED_TEXT_FIELDS = ['plain_text', 'word_count', 'reading_time', 'excerpt', 'auto_meta_description']
+
+
+# Copies of blogs.models.html_to_text / truncate_text, frozen for this migration
+def html_to_text(value):
+    if not value:
+        return ''
+    return html.unescape(strip_tags(value)).strip()
+
+
+def truncate_text(text, length):
+    text = ' '.join(text.split())
+    if len(text) <= length:
+        return text
+    cut = text[:length - 1].rsplit(' ', 1)[0].rstrip(' ,;:.-')
+    return f"{cut}…"
+
+
+def backfill_derived_text(apps, schema_editor):
+    """Fill the new columns for existing posts, as Blog.update_derived_text() does."""
+    Blog = apps.get_model('blogs', 'Blog')
+    posts = Blog.objects.only('id', 'blog_body', 'short_description', 'meta_description').order_by('id')
+
+    batch = []
+    for post in posts.iterator(chunk_size=200):
+        post.plain_text = html_to_text(post.blog_body)
+        post.word_count = len(post.plain_text.split())
+        post.reading_time = max(1, round(post.word_count / WORDS_PER_MINUTE))
+        post.excerpt = truncate_text(
+            html_to_text(post.short_description) or post.plain_text, EXCERPT_MAX_LENGTH
+        )
+        post.auto_meta_description = truncate_text(
+            html_to_text(post.meta_description) or post.excerpt, 160
+        )
+        batch.append(post)
+        if len(batch) >= 200:
+            Blog.objects.bulk_update(batch, DERIVED_TEXT_FIELDS)
+            batch = []
+    if batch:
+        Blog.objects.bulk_update(batch, DERIVED_TEXT_FIELDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogs', '0025_blog_media_status_backgroundjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blog',
+            name='auto_meta_description',
+            field=models.CharField(blank=True, editable=False, help_text='Meta description used in templates (auto fill)', max_length=160),
+        ),
+        migrations.AddField(
+            model_name='blog',
+            name='excerpt',
+            field=models.TextField(blank=True, editable=False, help_text='Plain-text summary for listings (auto fill)'),
+        ),
+        migrations.AddField(
+            model_name='blog',
+            name='plain_text',
+            field=models.TextField(blank=True, editable=False, help_text='Body with HTML stripped (auto fill)'),
+        ),
+        migrations.AddField(
+            model_name='blog',
+            name='reading_time',
+            field=models.PositiveIntegerField(default=1, editable=False, help_text='Minutes, at 200 words per minute'),
+        ),
+        migrations.AddField(
+            model_name='blog',
+            name='word_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_derived_text, migrations.RunPython.noop),
+    ]
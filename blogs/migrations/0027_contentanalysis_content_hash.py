@@ -0,0 +1,28 @@
+# Generated by Django 5.2.3 on 2026-10-17 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogs', '0026_blog_derived_text'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contentanalysis',
+            name='analyzer_version',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='contentanalysis',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='backgroundjob',
+            name='kind',
+            field=models.CharField(choices=[('featured_image', 'Featured image derivatives'), ('video_metadata', 'Video metadata and thumbnail'), ('content_analysis', 'AI content analysis')], max_length=50),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.3 on 2026-10-17 13:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogs', '0027_contentanalysis_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VoiceAnalysis',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('analysis_data', models.JSONField()),
+                ('overall_score', models.FloatField(default=0)),
+                ('content_hash', models.CharField(blank=True, max_length=64)),
+                ('analyzer_version', models.PositiveSmallIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='voice_analysis', to='blogs.blog')),
+            ],
+            options={
+                'verbose_name_plural': 'Voice analyses',
+            },
+        ),
+        migrations.AlterField(
+            model_name='backgroundjob',
+            name='kind',
+            field=models.CharField(choices=[('featured_image', 'Featured image derivatives'), ('video_metadata', 'Video metadata and thumbnail'), ('content_analysis', 'AI content analysis'), ('voice_analysis', 'Voice search analysis')], max_length=50),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.3 on 2026-10-17 14:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogs', '0029_analyticsevent_timestamp_default'),
+        ('contenttypes', '0002_remove_content_type_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalyticsRollupState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_event_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PostDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField()),
+                ('date', models.DateField()),
+                ('total_events', models.PositiveIntegerField(default=0)),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('unique_visitors', models.PositiveIntegerField(default=0)),
+                ('sessions', models.PositiveIntegerField(default=0)),
+                ('bounces', models.PositiveIntegerField(default=0)),
+                ('engaged_sessions', models.PositiveIntegerField(default=0)),
+                ('conversion_sessions', models.PositiveIntegerField(default=0)),
+                ('interaction_events', models.PositiveIntegerField(default=0)),
+                ('scroll_depth_sum', models.FloatField(default=0)),
+                ('scroll_depth_count', models.PositiveIntegerField(default=0)),
+                ('time_on_page_sum', models.FloatField(default=0)),
+                ('time_on_page_count', models.PositiveIntegerField(default=0)),
+                ('mobile', models.PositiveIntegerField(default=0)),
+                ('tablet', models.PositiveIntegerField(default=0)),
+                ('desktop', models.PositiveIntegerField(default=0)),
+                ('referrers', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['content_type', 'date'], name='blogs_postd_content_8133e1_idx')],
+                'constraints': [models.UniqueConstraint(fields=('content_type', 'object_id', 'date'), name='unique_post_daily_stats')],
+            },
+        ),
+    ]
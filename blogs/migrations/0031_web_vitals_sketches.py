@@ -0,0 +1,38 @@
+# Generated by Django 5.2.3 on 2026-10-17 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogs', '0030_postdailystats_analyticsrollupstate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='postdailystats',
+            name='session_hll',
+            field=models.BinaryField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='postdailystats',
+            name='visitor_hll',
+            field=models.BinaryField(blank=True, editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='WebVitalsDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.URLField()),
+                ('date', models.DateField()),
+                ('samples', models.PositiveIntegerField(default=0)),
+                ('metrics', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date'], name='blogs_webvi_date_88498b_idx')],
+                'constraints': [models.UniqueConstraint(fields=('url', 'date'), name='unique_web_vitals_daily_stats')],
+            },
+        ),
+    ]
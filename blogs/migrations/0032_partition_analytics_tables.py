@@ -0,0 +1,74 @@
+# Hand-written: converts the analytics tables to PostgreSQL range partitioning.
+#
+# Each table is renamed to <table>_legacy and replaced by a parent table
+# partitioned by month on "timestamp" (primary key (id, timestamp), since a
+# partitioned table's unique keys must include the partition key), plus a
+# DEFAULT partition. Indexes and foreign keys are recreated on the parent with
+# their original names, so Django's model state is unchanged.
+#
+# No rows are moved here. `python manage.py manage_analytics_partitions
+# --copy-legacy` creates the monthly partitions and copies the legacy rows in
+# chunks; `--drop-legacy` removes the old table afterwards.
+
+from django.db import migrations
+
+TABLES = ['blogs_analyticsevent', 'blogs_corewebvitals']
+
+
+def partition_tables(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        for table in TABLES:
+            legacy = f'{table}_legacy'
+            seq = f'{table}_part_id_seq'
+
+            cursor.execute(
+                "SELECT indexname, indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = %s",
+                [table],
+            )
+            indexes = cursor.fetchall()
+            cursor.execute(
+                "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'",
+                [table],
+            )
+            foreign_keys = cursor.fetchall()
+
+            cursor.execute(f'ALTER TABLE {qn(table)} RENAME TO {qn(legacy)}')
+            for name, _ in indexes:
+                cursor.execute(f'ALTER INDEX {qn(name)} RENAME TO {qn((name + "_legacy")[-63:])}')
+
+            cursor.execute(
+                f'CREATE TABLE {qn(table)} (LIKE {qn(legacy)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+                f'PARTITION BY RANGE ("timestamp")'
+            )
+            # Keep ids increasing past the legacy rows
+            cursor.execute(f'CREATE SEQUENCE {qn(seq)} OWNED BY {qn(table)}.id')
+            cursor.execute(f'SELECT setval(%s, COALESCE((SELECT MAX(id) FROM {qn(legacy)}), 0) + 1, false)', [seq])
+            cursor.execute(f"ALTER TABLE {qn(table)} ALTER COLUMN id SET DEFAULT nextval('{seq}')")
+            cursor.execute(f'ALTER TABLE {qn(table)} ADD PRIMARY KEY (id, "timestamp")')
+
+            for name, definition in indexes:
+                if name == f'{table}_pkey':
+                    continue
+                cursor.execute(definition)
+            for name, definition in foreign_keys:
+                cursor.execute(f'ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(name)} {definition}')
+
+            cursor.execute(f'CREATE TABLE {qn(table + "_default")} PARTITION OF {qn(table)} DEFAULT')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogs', '0031_web_vitals_sketches'),
+    ]
+
+    operations = [
+        # Not reversible in place: the legacy rows may already be copied or
+        # dropped. Rolling back leaves the partitioned tables as they are.
+        migrations.RunPython(partition_tables, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.3 on 2026-10-17 16:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogs', '0032_partition_analytics_tables'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analyticsevent',
+            name='browser_family',
+            field=models.CharField(blank=True, max_length=10),
+        ),
+        migrations.AddField(
+            model_name='analyticsevent',
+            name='device_type',
+            field=models.CharField(blank=True, max_length=10),
+        ),
+        migrations.AddField(
+            model_name='analyticsevent',
+            name='is_bot',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='analyticsevent',
+            index=models.Index(fields=['device_type', 'timestamp'], name='blogs_analy_device__f9160f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='analyticsevent',
+            index=models.Index(fields=['browser_family', 'timestamp'], name='blogs_analy_browser_ba8ad9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='analyticsevent',
+            index=models.Index(condition=models.Q(('is_bot', True)), fields=['timestamp'], name='analyticsevent_bot_idx'),
+        ),
+    ]
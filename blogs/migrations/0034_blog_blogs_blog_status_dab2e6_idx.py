@@ -0,0 +1,17 @@
+# Generated by Django 5.2.3 on 2026-10-17 19:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogs', '0033_analyticsevent_user_agent_fields'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='blog',
+            index=models.Index(fields=['status', '-views'], name='blogs_blog_status_dab2e6_idx'),
+        ),
+    ]
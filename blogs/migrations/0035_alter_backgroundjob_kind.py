@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-17 19:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogs', '0034_blog_blogs_blog_status_dab2e6_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='backgroundjob',
+            name='kind',
+            field=models.CharField(choices=[('featured_image', 'Featured image derivatives'), ('video_metadata', 'Video metadata and thumbnail'), ('content_analysis', 'AI content analysis'), ('voice_analysis', 'Voice search analysis'), ('related_posts', 'Related posts index')], max_length=50),
+        ),
+    ]
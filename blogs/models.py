@@ -7,8 +7,40 @@ from taggit.managers import TaggableManager
 from django.core.exceptions import ValidationError
 from django.core.validators import FileExtensionValidator
 import os
+import html
+from django.utils.html import strip_tags
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
+from django.utils import timezone
+
+
+WORDS_PER_MINUTE = 200
+EXCERPT_MAX_LENGTH = 500
+
+# Blog HTML fields and the plain-text columns derived from them on save
+DERIVED_TEXT_SOURCES = ('blog_body', 'short_description', 'meta_description')
+DERIVED_TEXT_FIELDS = ('plain_text', 'word_count', 'reading_time', 'excerpt', 'auto_meta_description')
+
+# Blog fields the stored content analyses depend on; saves touching none of them skip re-analysis
+ANALYSIS_SOURCE_FIELDS = ('title', 'blog_body', 'focus_keyword', 'meta_description', 'short_description')
+
+
+def html_to_text(value):
+    """Strip tags and decode entities. Line breaks are kept because the
+    analyzers split paragraphs on blank lines."""
+    if not value:
+        return ''
+    return html.unescape(strip_tags(value)).strip()
+
+
+def truncate_text(text, length):
+    """Collapse whitespace and cut `text` to at most `length` characters on a
+    word boundary."""
+    text = ' '.join(text.split())
+    if len(text) <= length:
+        return text
+    cut = text[:length - 1].rsplit(' ', 1)[0].rstrip(' ,;:.-')
+    return f"{cut}…"
 
 
 # Create your models here.
@@ -93,8 +125,17 @@ class Blog(models.Model):
     image_base_name = models.CharField(max_length=255, blank=True, help_text="SEO_friendly base name for the feautred image (auto fill)", editable=False)
     image_width = models.PositiveIntegerField(blank=True, null=True, help_text="Original image width in pixels.", editable=True)
     image_height = models.PositiveIntegerField(blank=True, null=True, help_text="Original image height in pixels.", editable=False)
+    media_status = models.JSONField(default=dict, blank=True, editable=False, help_text="Per-job background processing status, keyed by job kind.")
+    image_manifest = models.JSONField(default=dict, blank=True, editable=False, help_text="Derivative manifest for the featured image (source hash, sizes, formats, quality).")
     short_description = CKEditor5Field('Description', config_name='default')
     blog_body = CKEditor5Field('Content', config_name='default')
+
+    # Derived from the HTML fields on save (see update_derived_text)
+    plain_text = models.TextField(blank=True, editable=False, help_text="Body with HTML stripped (auto fill)")
+    word_count = models.PositiveIntegerField(default=0, editable=False)
+    reading_time = models.PositiveIntegerField(default=1, editable=False, help_text="Minutes, at 200 words per minute")
+    excerpt = models.TextField(blank=True, editable=False, help_text="Plain-text summary for listings (auto fill)")
+    auto_meta_description = models.CharField(max_length=160, blank=True, editable=False, help_text="Meta description used in templates (auto fill)")
     
     # NEW: Video fields
     video_file = models.FileField(
@@ -169,6 +210,10 @@ class Blog(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Trending fallback when Redis has no data (blogs/trending.py)
+            models.Index(fields=['status', '-views']),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -177,12 +222,19 @@ class Blog(models.Model):
         # Auto-generate alt text if not provided
         if not self.image_alt_text and self.featured_image:
             self.image_alt_text = f"Featured image for {self.title}"
+
+        # Recompute derived text unless this is a partial save of unrelated
+        # fields (e.g. the per-view save(update_fields=['views']))
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or set(update_fields) & set(DERIVED_TEXT_SOURCES):
+            self.update_derived_text()
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | set(DERIVED_TEXT_FIELDS) | {'content_type'}
         
         # NEW: Auto-set content_type based on video presence
         if self.video_file or self.video_url:
             # If has substantial text content, it's mixed
-            from django.utils.html import strip_tags
-            text_length = len(strip_tags(self.blog_body)) if self.blog_body else 0
+            text_length = len(self.get_plain_text())
             if text_length > 100:
                 self.content_type = 'mixed'
             else:
@@ -192,6 +244,34 @@ class Blog(models.Model):
             
         super().save(*args, **kwargs)
 
+    def update_derived_text(self):
+        """Fill plain_text, word_count, reading_time, excerpt and
+        auto_meta_description from the HTML fields."""
+        self.plain_text = html_to_text(self.blog_body)
+        self.word_count = len(self.plain_text.split())
+        self.reading_time = max(1, round(self.word_count / WORDS_PER_MINUTE))
+        self.excerpt = truncate_text(
+            html_to_text(self.short_description) or self.plain_text, EXCERPT_MAX_LENGTH
+        )
+        self.auto_meta_description = truncate_text(
+            html_to_text(self.meta_description) or self.excerpt, 160
+        )
+
+    def _derived_text_is_stale(self):
+        # Rows saved before these columns existed (until backfill_derived_text runs)
+        return not self.plain_text and bool(self.blog_body)
+
+    def get_plain_text(self):
+        if self._derived_text_is_stale():
+            self.update_derived_text()
+        return self.plain_text
+
+    @property
+    def live_views(self):
+        """Stored views plus unflushed ones when view_counter.apply_live_views
+        has been called on this instance."""
+        return getattr(self, '_live_views', self.views)
+
     @property
     def featured_image_base_name(self):
         """Base name without extension for responsive image generation."""
@@ -286,22 +366,21 @@ class Blog(models.Model):
         return self.meta_title or self.title
     
     def get_meta_description(self):
-        if self.meta_description:
-            return self.meta_description
-        # Auto-generate from short_description, stripping HTML
-        from django.utils.html import strip_tags
-        return strip_tags(self.short_description)[:160]
+        if self._derived_text_is_stale():
+            self.update_derived_text()
+        return self.auto_meta_description
     
     def get_reading_time(self):
-        """Calculate reading time based on word count"""
-        from django.utils.html import strip_tags
-        word_count = len(strip_tags(self.blog_body).split())
-        return max(1, round(word_count / 200))  # 200 words per minute
+        """Reading time in minutes (200 words per minute)"""
+        if self._derived_text_is_stale():
+            self.update_derived_text()
+        return self.reading_time
     
     def get_word_count(self):
         """Get word count for SEO analysis"""
-        from django.utils.html import strip_tags
-        return len(strip_tags(self.blog_body).split())
+        if self._derived_text_is_stale():
+            self.update_derived_text()
+        return self.word_count
     
     def get_seo_score(self):
         """Calculate basic SEO score"""
@@ -449,10 +528,31 @@ class ContentAnalysis(models.Model):
     post = models.OneToOneField(Blog, on_delete=models.CASCADE)
     analysis_data = models.JSONField()
     overall_score = models.IntegerField()
+    # Hash of the inputs and analyzer version the analysis was computed from;
+    # a mismatch means the row is stale (see ai_content.content_hash)
+    content_hash = models.CharField(max_length=64, blank=True)
+    analyzer_version = models.PositiveSmallIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
 
+class VoiceAnalysis(models.Model):
+    """Stored voice-search readiness report (see voice_search.refresh_voice_analysis)"""
+    post = models.OneToOneField(Blog, on_delete=models.CASCADE, related_name='voice_analysis')
+    analysis_data = models.JSONField()
+    overall_score = models.FloatField(default=0)
+    content_hash = models.CharField(max_length=64, blank=True)
+    analyzer_version = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "Voice analyses"
+
+    def __str__(self):
+        return f"Voice analysis for {self.post}"
+
+
 class LinkOpportunity(models.Model):
     """Model to store internal linking opportunities"""
     content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
@@ -504,3 +604,52 @@ class LinkPerformance(models.Model):
     
     class Meta:
         unique_together = ('link_url', 'source_post', 'date')
+
+
+JOB_STATUS_CHOICES = [
+    ('pending', 'Pending'),
+    ('running', 'Running'),
+    ('done', 'Done'),
+    ('failed', 'Failed'),
+]
+
+class BackgroundJob(models.Model):
+    """Durable DB-backed job queue, drained by `manage.py run_worker`"""
+    KIND_CHOICES = [
+        ('featured_image', 'Featured image derivatives'),
+        ('video_metadata', 'Video metadata and thumbnail'),
+        ('content_analysis', 'AI content analysis'),
+        ('voice_analysis', 'Voice search analysis'),
+        ('related_posts', 'Related posts index'),
+    ]
+
+    kind = models.CharField(max_length=50, choices=KIND_CHOICES)
+    blog = models.ForeignKey(Blog, on_delete=models.CASCADE, related_name='background_jobs')
+    status = models.CharField(max_length=20, choices=JOB_STATUS_CHOICES, default='pending')
+
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['run_after', 'id']
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+        ]
+        constraints = [
+            # At most one queued job per post and kind: re-enqueueing is a no-op
+            models.UniqueConstraint(
+                fields=['blog', 'kind'],
+                condition=models.Q(status='pending'),
+                name='unique_pending_job_per_blog_kind',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} for blog {self.blog_id} ({self.status})"
@@ -0,0 +1,270 @@
+# blogs/partitions.py
+"""Monthly range partitions for the analytics tables (PostgreSQL only).
+
+Migration 0032 turns AnalyticsEvent and CoreWebVitals into tables
+partitioned by month on "timestamp", each with a DEFAULT partition as a
+safety net. This module maintains them:
+
+* ensure_partitions() creates the partition for every month from `start`
+  to MONTHS_AHEAD months ahead. If rows for a month already sit in the
+  DEFAULT partition, they are moved into the new partition first.
+* drop_expired() detaches and drops whole partitions older than
+  RETENTION_MONTHS. Dropping a table frees its space at once, with no
+  row-by-row DELETE, dead tuples or vacuum debt. Expired rows that ended
+  up in the DEFAULT partition are deleted, since it is never dropped.
+* copy_legacy() moves rows from the pre-partitioning <table>_legacy table
+  in id-ordered chunks and can be resumed after an interruption. Columns
+  the legacy table predates get their model default; run
+  backfill_user_agents afterwards to classify the copied events. The
+  rollups of the copied days are rebuilt, since their ids sit below the
+  rollup watermark.
+
+Queries that filter on timestamp (rollups, reports, retention) only touch
+the partitions for their range.
+"""
+import re
+from datetime import date
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .analytics import AnalyticsEvent, CoreWebVitals
+
+PARTITIONED_MODELS = [AnalyticsEvent, CoreWebVitals]
+PARTITION_RE = re.compile(r'_p(\d{4})_(\d{2})$')
+
+
+def conf():
+    return settings.ANALYTICS_PARTITIONS
+
+
+def qn(name):
+    return connection.ops.quote_name(name)
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    return f'{table}_p{month.year:04d}_{month.month:02d}'
+
+
+def is_partitioned(table):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)",
+            [table],
+        )
+        return cursor.fetchone() is not None
+
+
+def existing_partitions(table):
+    """{month: partition_name} for the monthly partitions of `table`."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.oid = to_regclass(%s)
+            """,
+            [table],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    partitions = {}
+    for name in names:
+        match = PARTITION_RE.search(name)
+        if match:
+            partitions[date(int(match.group(1)), int(match.group(2)), 1)] = name
+    return partitions
+
+
+def create_partition(table, month):
+    """Create the partition for `month`, adopting any rows for it that were
+    routed to the DEFAULT partition."""
+    name = partition_name(table, month)
+    default = f'{table}_default'
+    lower, upper = month.isoformat(), add_months(month, 1).isoformat()
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT EXISTS (SELECT 1 FROM {qn(default)} WHERE "timestamp" >= %s AND "timestamp" < %s)',
+            [lower, upper],
+        )
+        if not cursor.fetchone()[0]:
+            cursor.execute(
+                f'CREATE TABLE {qn(name)} PARTITION OF {qn(table)} FOR VALUES FROM (%s) TO (%s)',
+                [lower, upper],
+            )
+            return name
+
+        # A new partition cannot be attached while DEFAULT holds rows in its range
+        cursor.execute(f'CREATE TABLE {qn(name)} (LIKE {qn(table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+        cursor.execute(
+            f'WITH moved AS (DELETE FROM {qn(default)} WHERE "timestamp" >= %s AND "timestamp" < %s RETURNING *) '
+            f'INSERT INTO {qn(name)} SELECT * FROM moved',
+            [lower, upper],
+        )
+        cursor.execute(
+            f'ALTER TABLE {qn(table)} ATTACH PARTITION {qn(name)} FOR VALUES FROM (%s) TO (%s)',
+            [lower, upper],
+        )
+    return name
+
+
+def ensure_partitions(table, start=None, months_ahead=None):
+    """Create the missing monthly partitions from `start` (default: this
+    month) through `months_ahead` months from now. Returns the new names."""
+    months_ahead = conf()['MONTHS_AHEAD'] if months_ahead is None else months_ahead
+    this_month = month_start(date.today())
+    month = month_start(start) if start else this_month
+    last = add_months(this_month, months_ahead)
+    existing = existing_partitions(table)
+
+    created = []
+    while month <= last:
+        if month not in existing:
+            created.append(create_partition(table, month))
+        month = add_months(month, 1)
+    return created
+
+
+def expiry_cutoff(retention_months=None):
+    retention_months = conf()['RETENTION_MONTHS'] if retention_months is None else retention_months
+    return add_months(month_start(date.today()), -retention_months)
+
+
+def purge_default(table, retention_months=None, dry_run=False):
+    """Delete rows older than the retention window from the DEFAULT
+    partition, which drop_expired() never drops. Returns the row count."""
+    default = f'{table}_default'
+    cutoff = expiry_cutoff(retention_months).isoformat()
+    with transaction.atomic(), connection.cursor() as cursor:
+        if dry_run:
+            cursor.execute(f'SELECT COUNT(*) FROM {qn(default)} WHERE "timestamp" < %s', [cutoff])
+            return cursor.fetchone()[0]
+        cursor.execute(f'DELETE FROM {qn(default)} WHERE "timestamp" < %s', [cutoff])
+        return cursor.rowcount
+
+
+def drop_expired(table, retention_months=None, dry_run=False):
+    """Detach and drop partitions whose whole month is older than the
+    retention window. Returns the names dropped (or that would be)."""
+    cutoff = expiry_cutoff(retention_months)
+
+    dropped = []
+    for month, name in sorted(existing_partitions(table).items()):
+        if add_months(month, 1) > cutoff:
+            continue
+        dropped.append(name)
+        if not dry_run:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(f'ALTER TABLE {qn(table)} DETACH PARTITION {qn(name)}')
+                cursor.execute(f'DROP TABLE {qn(name)}')
+    return dropped
+
+
+def legacy_table(table):
+    name = f'{table}_legacy'
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT to_regclass(%s)', [name])
+        return name if cursor.fetchone()[0] else None
+
+
+def _columns(table):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT column_name FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND table_name = %s ORDER BY ordinal_position",
+            [table],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _copy_columns(table, legacy):
+    """(column list, select list, params) for copying `legacy` into `table`.
+
+    Only columns both tables have are copied. Columns added after the
+    legacy table was split off (e.g. AnalyticsEvent.device_type) are filled
+    with their model default, or left to the database default or NULL."""
+    model = next(m for m in PARTITIONED_MODELS if m._meta.db_table == table)
+    fields = {field.column: field for field in model._meta.concrete_fields}
+    legacy_columns = set(_columns(legacy))
+
+    columns, select, params = [], [], []
+    for column in _columns(table):
+        if column in legacy_columns:
+            columns.append(qn(column))
+            select.append(qn(column))
+        elif column in fields and not fields[column].null and not fields[column].has_db_default():
+            columns.append(qn(column))
+            select.append('%s')
+            params.append(fields[column].get_default())
+    return ', '.join(columns), ', '.join(select), params
+
+
+def copy_legacy(table, chunk_size=None, progress=None):
+    """Copy <table>_legacy into the partitioned table in id order, one
+    transaction per chunk. Already-copied ids are skipped, so an
+    interrupted copy can be restarted. Returns rows copied."""
+    chunk_size = chunk_size or conf()['COPY_CHUNK_SIZE']
+    legacy = legacy_table(table)
+    if legacy is None:
+        return 0
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT MIN("timestamp"), MAX(id) FROM {qn(legacy)}')
+        oldest, max_id = cursor.fetchone()
+        if max_id is None:
+            return 0
+        # Ids from the new sequence start above max_id, so this is the resume point
+        cursor.execute(f'SELECT COALESCE(MAX(id), 0) FROM {qn(table)} WHERE id <= %s', [max_id])
+        last_id = cursor.fetchone()[0]
+
+    columns, select, params = _copy_columns(table, legacy)
+    ensure_partitions(table, start=oldest)
+
+    copied = 0
+    while last_id < max_id:
+        upper = min(last_id + chunk_size, max_id)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {qn(table)} ({columns}) SELECT {select} FROM {qn(legacy)} '
+                f'WHERE id > %s AND id <= %s',
+                params + [last_id, upper],
+            )
+            copied += cursor.rowcount
+        last_id = upper
+        if progress:
+            progress(last_id, max_id, copied)
+
+    if copied:
+        from . import analytics_rollup
+
+        model = next(m for m in PARTITIONED_MODELS if m._meta.db_table == table)
+        analytics_rollup.rebuild((date.today() - oldest.date()).days + 1, models=[model])
+    return copied
+
+
+def drop_legacy(table):
+    """Drop <table>_legacy once every row has been copied."""
+    legacy = legacy_table(table)
+    if legacy is None:
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT COUNT(*) FROM {qn(legacy)} l WHERE NOT EXISTS '
+            f'(SELECT 1 FROM {qn(table)} t WHERE t.id = l.id AND t."timestamp" = l."timestamp")'
+        )
+        missing = cursor.fetchone()[0]
+        if missing:
+            raise ValueError(f'{missing} rows of {legacy} have not been copied yet')
+        cursor.execute(f'DROP TABLE {qn(legacy)}')
+    return True
@@ -0,0 +1,59 @@
+# blogs/redis_client.py
+"""Shared Redis connections for the write-behind counters and buffers.
+
+These use redis-py directly (rather than the cache framework) because they
+need hashes, pipelines and atomic RENAME. Timeouts are short so a Redis
+outage costs a request milliseconds, after which callers fall back to the
+database.
+"""
+import secrets
+
+from django.conf import settings
+
+_clients = {}
+
+# Delete the lock only if it still holds our token
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def get_redis(url=None):
+    """Return a process-wide client for `url` (default: settings.REDIS_URL)."""
+    url = url or settings.REDIS_URL
+    client = _clients.get(url)
+    if client is None:
+        import redis
+        client = redis.Redis.from_url(
+            url,
+            decode_responses=True,
+            socket_timeout=0.5,
+            socket_connect_timeout=0.5,
+            health_check_interval=30,
+        )
+        _clients[url] = client
+    return client
+
+
+def redis_errors():
+    """Exception types that mean "Redis unavailable, use the fallback"."""
+    import redis
+    return (redis.RedisError, OSError)
+
+
+def acquire_lock(key, timeout, client=None):
+    """Take the lock `key` for `timeout` seconds. Returns an owner token to
+    pass to release_lock(), or None if someone else holds it."""
+    token = secrets.token_hex(16)
+    if (client or get_redis()).set(key, token, nx=True, ex=timeout):
+        return token
+    return None
+
+
+def release_lock(key, token, client=None):
+    """Release `key` if `token` still owns it; a lock that expired and was
+    taken by another process is left alone."""
+    (client or get_redis()).eval(RELEASE_LOCK_SCRIPT, 1, key, token)
@@ -0,0 +1,382 @@
+# blogs/related_posts.py
+"""Persistent related-posts index.
+
+`build()` fits a TF-IDF model (scikit-learn) over every published post,
+with the title counted twice, and L2-normalises the rows. It then stores
+the top-k neighbours of each post, ranked by a blend of
+
+    TEXT_WEIGHT * cosine(tf-idf) + TAG_WEIGHT * jaccard(tags) + CATEGORY_WEIGHT * same category
+
+The index lives in RELATED_POSTS['INDEX_DIR']:
+
+    manifest.json            -> {"version": "v<n>", ...}
+    v<n>/ids.npy             post id per row
+    v<n>/neighbours.npy      (rows, k) neighbour post ids, -1 padded
+    v<n>/scores.npy          (rows, k) blended scores
+    v<n>/tfidf.npz           the L2-normalised TF-IDF matrix
+    v<n>/vectorizer.pkl      the fitted vectorizer
+
+Readers memory-map the arrays and keep an {id: row} map, so a lookup is a
+dict hit plus one row read. Writers build a new version directory and then
+swap manifest.json, so readers never see a half-written index.
+
+`update_post()` runs as a background job when a post is published or
+edited. It vectorises the post with the existing vocabulary, recomputes
+its neighbours, and inserts it into the lists of the posts it now beats.
+Words that are new since the last full build are ignored until the next
+`manage.py build_related_index`.
+"""
+import fcntl
+import json
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+MANIFEST = 'manifest.json'
+KEEP_VERSIONS = 2
+MIN_POSTS_FOR_MAX_DF = 20  # Below this, terms common to most posts are still kept
+
+_loaded = None
+_load_lock = threading.Lock()
+
+
+def conf():
+    return settings.RELATED_POSTS
+
+
+def index_dir():
+    return str(conf()['INDEX_DIR'])
+
+
+# ----------------
+# Building
+# ----------------
+def _document(post):
+    return f'{post.title}\n{post.title}\n{post.get_plain_text()}'
+
+
+def _vectorizer():
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    import numpy as np
+
+    return TfidfVectorizer(
+        stop_words='english',
+        sublinear_tf=True,
+        ngram_range=(1, 2),
+        max_df=0.8,
+        max_features=conf()['MAX_FEATURES'],
+        dtype=np.float32,
+    )
+
+
+def _post_features(ids):
+    """(category per id, sparse binary tag matrix) aligned with `ids`."""
+    import numpy as np
+    from scipy import sparse
+    from django.contrib.contenttypes.models import ContentType
+    from taggit.models import TaggedItem
+    from .models import Blog
+
+    row = {pk: i for i, pk in enumerate(ids)}
+    categories = np.full(len(ids), -1, dtype=np.int64)
+    for pk, category_id in Blog.objects.filter(pk__in=ids).values_list('pk', 'category_id').iterator():
+        categories[row[pk]] = category_id
+
+    pairs = list(TaggedItem.objects.filter(
+        content_type=ContentType.objects.get_for_model(Blog),
+        object_id__in=ids,
+    ).values_list('object_id', 'tag_id').iterator())
+    tag_columns = {tag_id: i for i, tag_id in enumerate(sorted({tag_id for _, tag_id in pairs}))}
+    tags = sparse.csr_matrix(
+        (
+            np.ones(len(pairs), dtype=np.float32),
+            ([row[pk] for pk, _ in pairs], [tag_columns[tag_id] for _, tag_id in pairs]),
+        ),
+        shape=(len(ids), max(len(tag_columns), 1)),
+    )
+    tags.sum_duplicates()
+    tags.data[:] = 1  # Duplicate tag rows collapse to one
+    return categories, tags
+
+
+def _blended_scores(rows, tfidf, categories, tags):
+    """Dense (len(rows), n) blended similarity of `rows` against every post."""
+    import numpy as np
+
+    text = (tfidf[rows] @ tfidf.T).toarray()
+
+    shared = (tags[rows] @ tags.T).toarray()
+    sizes = np.asarray(tags.sum(axis=1)).ravel()
+    union = sizes[rows][:, None] + sizes[None, :] - shared
+    jaccard = np.divide(shared, union, out=np.zeros_like(shared), where=union > 0)
+
+    same_category = (categories[rows][:, None] == categories[None, :]) & (categories[rows][:, None] >= 0)
+
+    scores = (
+        conf()['TEXT_WEIGHT'] * text
+        + conf()['TAG_WEIGHT'] * jaccard
+        + conf()['CATEGORY_WEIGHT'] * same_category
+    ).astype(np.float32)
+    scores[np.arange(len(rows)), rows] = -np.inf  # Never related to itself
+    return scores
+
+
+def _top_k(scores, ids, k):
+    """Neighbour ids and scores per row, best first, -1 padded below MIN_SCORE."""
+    import numpy as np
+
+    k = min(k, scores.shape[1])
+    neighbours = np.full((scores.shape[0], conf()['TOP_K']), -1, dtype=np.int64)
+    best_scores = np.zeros((scores.shape[0], conf()['TOP_K']), dtype=np.float32)
+    if k <= 0:
+        return neighbours, best_scores
+
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1)
+    top = np.take_along_axis(top, order, axis=1)
+    top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+    keep = top_scores >= conf()['MIN_SCORE']
+    neighbours[:, :k] = np.where(keep, ids[top], -1)
+    best_scores[:, :k] = np.where(keep, top_scores, 0)
+    return neighbours, best_scores
+
+
+def build(progress=None):
+    """Rebuild the whole index from the published posts. Returns the number
+    of posts indexed."""
+    import numpy as np
+    from .models import Blog
+
+    posts = Blog.objects.filter(status='Published').only('id', 'title', 'plain_text', 'blog_body').order_by('pk')
+    ids, documents = [], []
+    for post in posts.iterator(chunk_size=500):
+        ids.append(post.pk)
+        documents.append(_document(post))
+    ids = np.array(ids, dtype=np.int64)
+
+    vectorizer = _vectorizer()
+    if len(ids) < MIN_POSTS_FOR_MAX_DF:
+        vectorizer.set_params(max_df=1.0)
+    tfidf = vectorizer.fit_transform(documents).tocsr() if len(ids) else None
+    categories, tags = _post_features(ids.tolist())
+
+    k = conf()['TOP_K']
+    neighbours = np.full((len(ids), k), -1, dtype=np.int64)
+    scores = np.zeros((len(ids), k), dtype=np.float32)
+    block = conf()['BLOCK_SIZE']
+    for start in range(0, len(ids), block):
+        rows = np.arange(start, min(start + block, len(ids)))
+        neighbours[rows], scores[rows] = _top_k(_blended_scores(rows, tfidf, categories, tags), ids, k)
+        if progress:
+            progress(rows[-1] + 1, len(ids))
+
+    with _write_lock():
+        _write_version(ids, neighbours, scores, tfidf, vectorizer)
+    return len(ids)
+
+
+def update_post(post):
+    """Add, refresh or (for unpublished posts) remove one post in the index."""
+    import numpy as np
+    from scipy import sparse
+
+    with _write_lock():
+        state = _read_current()
+        if state is None:
+            return False
+        ids, neighbours, scores, tfidf, vectorizer = state
+        neighbours, scores = np.array(neighbours), np.array(scores)
+        matches = np.nonzero(ids == post.pk)[0]
+        existing = int(matches[0]) if len(matches) else None
+
+        # Drop the post from every list; it is re-inserted below where it still ranks
+        stale = neighbours == post.pk
+        neighbours[stale], scores[stale] = -1, 0
+        neighbours, scores = _compact(neighbours, scores)
+
+        if post.status != 'Published':
+            if existing is not None:
+                keep = np.arange(len(ids)) != existing
+                ids, neighbours, scores, tfidf = ids[keep], neighbours[keep], scores[keep], tfidf[keep]
+            _write_version(ids, neighbours, scores, tfidf, vectorizer)
+            return True
+
+        vector = vectorizer.transform([_document(post)]).astype(np.float32)
+        if existing is None:
+            ids = np.append(ids, np.int64(post.pk))
+            tfidf = sparse.vstack([tfidf, vector]).tocsr()
+            neighbours = np.vstack([neighbours, np.full((1, neighbours.shape[1]), -1, dtype=np.int64)])
+            scores = np.vstack([scores, np.zeros((1, scores.shape[1]), dtype=np.float32)])
+            existing = len(ids) - 1
+        else:
+            tfidf = sparse.vstack([tfidf[:existing], vector, tfidf[existing + 1:]]).tocsr()
+
+        categories, tags = _post_features(ids.tolist())
+        row_scores = _blended_scores(np.array([existing]), tfidf, categories, tags)[0]
+        own_neighbours, own_scores = _top_k(row_scores[None, :], ids, neighbours.shape[1])
+        neighbours[existing], scores[existing] = own_neighbours[0], own_scores[0]
+
+        # Similarity is symmetric: insert the post into lists whose weakest entry it beats
+        weakest = np.where(neighbours[:, -1] >= 0, scores[:, -1], -np.inf)
+        for row in np.nonzero((row_scores > weakest) & (row_scores >= conf()['MIN_SCORE']))[0]:
+            position = int(np.searchsorted(-scores[row], -row_scores[row], side='right'))
+            neighbours[row, position + 1:] = neighbours[row, position:-1].copy()
+            scores[row, position + 1:] = scores[row, position:-1].copy()
+            neighbours[row, position], scores[row, position] = post.pk, row_scores[row]
+
+        _write_version(ids, neighbours, scores, tfidf, vectorizer)
+    return True
+
+
+def _compact(neighbours, scores):
+    """Move -1 gaps left by removals to the end of each row."""
+    import numpy as np
+
+    order = np.argsort(neighbours < 0, axis=1, kind='stable')
+    return np.take_along_axis(neighbours, order, axis=1), np.take_along_axis(scores, order, axis=1)
+
+
+# ----------------
+# Storage
+# ----------------
+@contextmanager
+def _write_lock():
+    os.makedirs(index_dir(), exist_ok=True)
+    with open(os.path.join(index_dir(), '.lock'), 'w') as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def _manifest():
+    try:
+        with open(os.path.join(index_dir(), MANIFEST)) as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_version(ids, neighbours, scores, tfidf, vectorizer):
+    import joblib
+    import numpy as np
+    from scipy import sparse
+
+    manifest = _manifest() or {'serial': 0}
+    serial = manifest['serial'] + 1
+    version = f'v{serial}'
+    path = os.path.join(index_dir(), version)
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+
+    np.save(os.path.join(path, 'ids.npy'), ids)
+    np.save(os.path.join(path, 'neighbours.npy'), neighbours)
+    np.save(os.path.join(path, 'scores.npy'), scores)
+    if tfidf is not None:
+        sparse.save_npz(os.path.join(path, 'tfidf.npz'), tfidf)
+        joblib.dump(vectorizer, os.path.join(path, 'vectorizer.pkl'))
+
+    tmp = os.path.join(index_dir(), f'{MANIFEST}.tmp')
+    with open(tmp, 'w') as handle:
+        json.dump({'serial': serial, 'version': version, 'posts': len(ids), 'built_at': time.time()}, handle)
+    os.replace(tmp, os.path.join(index_dir(), MANIFEST))
+
+    for name in os.listdir(index_dir()):
+        if name.startswith('v') and name[1:].isdigit() and int(name[1:]) <= serial - KEEP_VERSIONS:
+            shutil.rmtree(os.path.join(index_dir(), name), ignore_errors=True)
+
+
+def _read_current():
+    """The current version fully loaded (for writers), or None."""
+    import joblib
+    import numpy as np
+    from scipy import sparse
+
+    manifest = _manifest()
+    if manifest is None:
+        return None
+    path = os.path.join(index_dir(), manifest['version'])
+    try:
+        return (
+            np.load(os.path.join(path, 'ids.npy')),
+            np.load(os.path.join(path, 'neighbours.npy')),
+            np.load(os.path.join(path, 'scores.npy')),
+            sparse.load_npz(os.path.join(path, 'tfidf.npz')),
+            joblib.load(os.path.join(path, 'vectorizer.pkl')),
+        )
+    except OSError:
+        return None
+
+
+# ----------------
+# Lookups
+# ----------------
+def _index():
+    """The memory-mapped neighbour lists, reloaded when a new version is
+    published (checked at most every RELOAD_SECONDS)."""
+    global _loaded
+    now = time.monotonic()
+    if _loaded is not None and now - _loaded['checked'] < conf()['RELOAD_SECONDS']:
+        return _loaded
+
+    with _load_lock:
+        manifest = _manifest()
+        if manifest is None:
+            _loaded = {'checked': now, 'version': None, 'rows': {}}
+            return _loaded
+        if _loaded is None or _loaded['version'] != manifest['version']:
+            import numpy as np
+
+            path = os.path.join(index_dir(), manifest['version'])
+            try:
+                ids = np.load(os.path.join(path, 'ids.npy'))
+                _loaded = {
+                    'version': manifest['version'],
+                    'rows': {int(pk): row for row, pk in enumerate(ids)},
+                    'neighbours': np.load(os.path.join(path, 'neighbours.npy'), mmap_mode='r'),
+                    'scores': np.load(os.path.join(path, 'scores.npy'), mmap_mode='r'),
+                }
+            except OSError as e:
+                print(f"[Related posts] Could not load index {manifest['version']}: {e}")
+                _loaded = {'version': None, 'rows': {}}
+        _loaded['checked'] = now
+    return _loaded
+
+
+def neighbours(post_id, limit=None):
+    """[(post_id, score), ...] best first, or [] if the post is not indexed."""
+    index = _index()
+    row = index['rows'].get(post_id)
+    if row is None:
+        return []
+    pairs = [
+        (int(pk), float(score))
+        for pk, score in zip(index['neighbours'][row], index['scores'][row])
+        if pk >= 0
+    ]
+    return pairs[:limit] if limit else pairs
+
+
+def related_posts(post, limit=4):
+    """Published related posts for `post` from the index, falling back to
+    the newest posts in its category when it is not indexed yet."""
+    from .models import Blog
+
+    published = Blog.objects.select_related('category', 'author').filter(status='Published')
+    ids = [pk for pk, _ in neighbours(post.pk)]
+    by_id = published.in_bulk(ids) if ids else {}
+    posts = [by_id[pk] for pk in ids if pk in by_id][:limit]
+
+    if len(posts) < limit:
+        shown = {post.pk, *(related.pk for related in posts)}
+        posts += list(
+            published.filter(category_id=post.category_id).exclude(pk__in=shown).order_by('-created_at')[:limit - len(posts)]
+        )
+    return posts
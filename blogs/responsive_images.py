@@ -0,0 +1,239 @@
+# blogs/responsive_images.py
+"""On-demand responsive images.
+
+Derivatives are rendered the first time a browser asks for them through the
+signed `img/` endpoint (see views.resized_image) and kept in a size-bounded
+disk cache. Least recently served files are evicted first: every cache hit
+bumps the file's mtime, and evict() (run by the prune_image_cache command
+from cron) deletes the oldest mtimes.
+
+URLs carry a signature over (path, width, version) so only widths listed in
+RESPONSIVE_IMAGES['WIDTHS'] can be requested, and a version token so a
+replaced source gets a new URL (responses are cached as immutable).
+"""
+import hashlib
+import os
+import re
+import time
+from urllib.parse import unquote
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.urls import reverse
+from django.utils.crypto import constant_time_compare, salted_hmac
+from django.utils._os import safe_join
+from PIL import Image
+
+from .image_engine import decode, downscale_cascade, encode_to_file
+
+SOURCE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+FORMATS = {
+    'avif': ('AVIF', 'image/avif'),
+    'webp': ('WEBP', 'image/webp'),
+    'jpeg': ('JPEG', 'image/jpeg'),
+    'png': ('PNG', 'image/png'),
+}
+URL_FORMATS = ('auto',) + tuple(FORMATS)
+
+# Only touch a cached file's mtime if it is older than this, so hot images
+# don't cost a metadata write on every hit
+TOUCH_INTERVAL = 3600
+
+
+def conf(key):
+    return settings.RESPONSIVE_IMAGES[key]
+
+
+def is_enabled():
+    return conf('ENABLED')
+
+
+# ----------------
+# Format support
+# ----------------
+_avif_supported = None
+
+def avif_supported():
+    """Pillow 11.3+ ships AVIF when built with libavif; older versions need
+    the optional pillow-avif-plugin package."""
+    global _avif_supported
+    if _avif_supported is None:
+        try:
+            import pillow_avif  # noqa: F401  (registers the plugin)
+        except ImportError:
+            pass
+        Image.init()
+        _avif_supported = 'AVIF' in Image.SAVE
+    return _avif_supported
+
+
+def negotiate_format(fmt, accept, source_ext):
+    """Resolve 'auto' against the Accept header. Explicit formats are kept,
+    except AVIF falls back to WebP when this server can't encode it."""
+    if fmt == 'auto':
+        accept = accept or ''
+        if 'image/avif' in accept and avif_supported():
+            return 'avif'
+        if 'image/webp' in accept:
+            return 'webp'
+        return 'png' if source_ext == '.png' else 'jpeg'
+    if fmt == 'avif' and not avif_supported():
+        return 'webp'
+    return fmt
+
+
+# ----------------
+# Signed URLs
+# ----------------
+def sign(path, width, version=''):
+    value = f"{path}:{width}:{version}"
+    return salted_hmac('blogs.responsive_images', value).hexdigest()[:16]
+
+
+def verify(signature, path, width, version=''):
+    return constant_time_compare(signature, sign(path, width, version))
+
+
+def image_url(path, width, fmt='auto', version=''):
+    """URL of `path` (relative to MEDIA_ROOT) resized to `width`."""
+    url = reverse('resized_image', args=[sign(path, width, version), width, fmt, path])
+    return f"{url}?v={version}" if version else url
+
+
+def media_path_from_url(url):
+    """Map a /media/... URL to a MEDIA_ROOT-relative path, or None."""
+    media_url = settings.MEDIA_URL
+    if not url or not url.startswith(media_url):
+        return None
+    path = unquote(url[len(media_url):].split('?', 1)[0])
+    if not path.lower().endswith(SOURCE_EXTENSIONS):
+        return None
+    return path
+
+
+def srcset(path, widths, fmt='auto', version=''):
+    return ", ".join(f"{image_url(path, w, fmt, version)} {w}w" for w in widths)
+
+
+def source_version(path):
+    """Version token for a MEDIA_ROOT-relative source: its mtime, so an
+    upload replaced at the same path gets new URLs ('' if unreadable)."""
+    try:
+        return str(int(os.path.getmtime(safe_join(settings.MEDIA_ROOT, path))))
+    except (OSError, ValueError, SuspiciousFileOperation):
+        return ''
+
+
+# ----------------
+# Disk cache
+# ----------------
+def cache_path(path, width, fmt, mtime):
+    """Cache file for a derivative. The source mtime and encode quality are
+    part of the key so edits and quality changes never serve stale bytes."""
+    quality = conf('QUALITY').get(fmt)
+    key = hashlib.sha256(f"{path}:{width}:{fmt}:{quality}:{mtime}".encode()).hexdigest()
+    return os.path.join(conf('CACHE_DIR'), key[:2], f"{key}.{fmt}")
+
+
+def get_or_render(path, width, fmt):
+    """Return the cache file for `path` at `width` in `fmt`, rendering it if
+    needed. Raises FileNotFoundError for a missing or unsafe source."""
+    source = safe_join(settings.MEDIA_ROOT, path)
+    if not os.path.isfile(source):
+        raise FileNotFoundError(path)
+
+    target = cache_path(path, width, fmt, int(os.path.getmtime(source)))
+    try:
+        age = time.time() - os.path.getmtime(target)
+    except FileNotFoundError:
+        age = None
+
+    if age is not None:
+        if age > TOUCH_INTERVAL:
+            try:
+                os.utime(target)
+            except OSError:
+                pass
+        return target
+
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    # Draft mode: JPEG sources are decoded at the smallest scale >= width
+    img = decode(source, target_width=width)
+    for _, level in downscale_cascade(img, [width]):
+        img = level
+    pil_format = FORMATS[fmt][0]
+    encode_to_file(img, target, pil_format, conf('QUALITY').get(fmt))
+    # The cache is trimmed by prune_image_cache, never inside a request
+    return target
+
+
+def evict(max_bytes=None, dry_run=False):
+    """Delete least recently used files until the cache is under 90% of
+    `max_bytes`. Returns (files_removed, bytes_removed, bytes_remaining)."""
+    max_bytes = max_bytes or conf('CACHE_MAX_BYTES')
+    cache_dir = conf('CACHE_DIR')
+    if not os.path.isdir(cache_dir):
+        return 0, 0, 0
+
+    entries, total = [], 0
+    for root, _, files in os.walk(cache_dir):
+        for name in files:
+            full = os.path.join(root, name)
+            try:
+                st = os.stat(full)
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, full))
+            total += st.st_size
+
+    if total <= max_bytes:
+        return 0, 0, total
+
+    goal = int(max_bytes * 0.9)
+    removed = freed = 0
+    for _, size, full in sorted(entries):
+        if total - freed <= goal:
+            break
+        if not dry_run:
+            try:
+                os.remove(full)
+            except FileNotFoundError:
+                pass
+        removed += 1
+        freed += size
+    return removed, freed, total - freed
+
+
+# ----------------
+# Body HTML
+# ----------------
+IMG_TAG_RE = re.compile(r'<img\b[^>]*>', re.IGNORECASE)
+SRC_ATTR_RE = re.compile(r'\ssrc\s*=\s*(["\'])(.*?)\1', re.IGNORECASE | re.DOTALL)
+
+
+def rewrite_body_images(html, widths=None, sizes="(max-width: 768px) 100vw, 768px"):
+    """Add an on-demand srcset to every uploaded <img> in post body HTML
+    (CKEditor uploads have no pre-generated derivatives)."""
+    widths = widths or conf('BODY_WIDTHS')
+    fallback = max((w for w in widths if w <= 768), default=min(widths))
+
+    def replace(match):
+        tag = match.group(0)
+        lower = tag.lower()
+        if 'srcset=' in lower:
+            return tag
+        src = SRC_ATTR_RE.search(tag)
+        path = media_path_from_url(src.group(2)) if src else None
+        if not path:
+            return tag
+        version = source_version(path)
+        attrs = (
+            f' src="{image_url(path, fallback, version=version)}"'
+            f' srcset="{srcset(path, widths, version=version)}" sizes="{sizes}"'
+        )
+        if 'loading=' not in lower:
+            attrs += ' loading="lazy"'
+        if 'decoding=' not in lower:
+            attrs += ' decoding="async"'
+        return tag[:src.start()] + attrs + tag[src.end():]
+
+    return IMG_TAG_RE.sub(replace, html)
@@ -1,20 +1,21 @@
 #from django.db.models.signals import post_save, pre_delete
-from django.db.models.signals import post_save, pre_save, pre_delete
+from django.db.models.signals import post_save, pre_save, pre_delete, post_delete, m2m_changed
 from django.dispatch import receiver
 from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
 from django.contrib.auth.models import User
 from django.conf import settings
 from accounts.models import Profile
-from .models import Blog
-from django.core.files.storage import default_storage
-import os, re
-from io import BytesIO
-from PIL import Image, ImageOps
-from moviepy import VideoFileClip
-from django.core.files.base import ContentFile
-from pathlib import Path
+from .models import Blog, Category, ANALYSIS_SOURCE_FIELDS
+import os
 from django.db.models.signals import post_save
+from .media import (
+    delete_old_files, manifest_is_current, process_featured_image, extract_video_metadata,
+)
+from .jobs import enqueue_job
+from .keyword_index import bump_version as bump_keyword_version
+from .linked_body import bump_graph_version
+from taggit.models import Tag
 from comments.models import Comment
 from notifications.views import create_notification, send_push_notification, NotificationPreference, notify_users_new_post
 from django.db import transaction
@@ -74,52 +75,7 @@ def send_new_post_email(sender, instance, created, raw=False, **kwargs):
         except Exception as e:
             print(f"Error sending newsletter email: {e}")
 
-    transaction.on_commit(_dispatch)    
-WEBP_QUALITY = 80
-JPEG_QUALITY = 80
-SIZES = [150, 320, 480, 768, 1024]  # includes sidebar sizes
-
-# ----------------
-# Helpers
-# ----------------
-def slugify_filename(title):
-    """Convert blog title into SEO-friendly filename."""
-    return re.sub(r'[^a-z0-9]+', '-', title.lower()).strip('-')
-
-def resize_and_save(img, base_name, ext, width, quality, fmt):
-    """Resize image to given width and return ContentFile."""
-    img_copy = img.copy()
-    img_copy.thumbnail(
-        (width, width * img_copy.height // img_copy.width),
-        Image.LANCZOS
-    )
-    img_io = BytesIO()
-    save_kwargs = {"optimize": True}
-    if fmt != "PNG":
-        save_kwargs["quality"] = quality
-    img_copy.save(img_io, format=fmt, **save_kwargs)
-    return ContentFile(img_io.getvalue(), name=f"{base_name}-{width}{ext}")
-
-def delete_old_files(instance):
-    """Delete old original, WebP, and resized files."""
-    if not instance.featured_image:
-        return
-    try:
-        orig_path = instance.featured_image.path
-        base, _ = os.path.splitext(orig_path)
-        dir_name = os.path.dirname(orig_path)
-        resized_dir = os.path.join(dir_name, "resized")
-
-        if os.path.isfile(orig_path):
-            os.remove(orig_path)
-        if os.path.isfile(f"{base}.webp"):
-            os.remove(f"{base}.webp")
-        if os.path.isdir(resized_dir):
-            for f in os.listdir(resized_dir):
-                if f.startswith(os.path.basename(base)):
-                    os.remove(os.path.join(resized_dir, f))
-    except Exception as e:
-        print(f"[Cleanup error] {e}")
+    transaction.on_commit(_dispatch)
 
 # ----------------
 # Cleanup - UPDATED to handle video files
@@ -150,192 +106,164 @@ def cleanup_media_on_delete(sender, instance, raw=False, **kwargs):
 # Image Optimization
 # ----------------
 @receiver(post_save, sender=Blog)
-def optimize_images(sender, instance, created, raw=False, **kwargs):
+def optimize_images(sender, instance, created, update_fields=None, raw=False, **kwargs):
     if raw:
         return
     """Optimize and resize featured images"""
-    if not instance.featured_image:
+    # Partial saves (views counter, slug fix-ups, ...) never touch the image
+    if update_fields is not None and 'featured_image' not in update_fields:
         return
-
-    try:
-        image_path = instance.featured_image.path
-    except Exception:
+    if not instance.featured_image:
         return
-
-    ext = os.path.splitext(image_path)[1].lower()
-    if ext not in ['.jpg', '.jpeg', '.png']:
+    ext = os.path.splitext(instance.featured_image.name)[1].lower()
+    if manifest_is_current(instance, ext):
         return
 
-    img = ImageOps.exif_transpose(Image.open(image_path))
-    img = img.convert("RGB")
-
-    # Save image dimensions
-    instance.image_width, instance.image_height = img.size
-
-    # SEO-friendly base name
-    base_name = slugify_filename(instance.title)
-    instance.image_base_name = base_name
-
-    original_dir = os.path.dirname(image_path)
-    resized_dir = os.path.join(original_dir, "resized")
-    os.makedirs(resized_dir, exist_ok=True)
-
-    optimized_path = os.path.join(original_dir, f"{base_name}{ext}")
-
-    # --- 1) Compress & save optimized original ---
-    img_io = BytesIO()
-    if ext == ".png":
-        img.save(img_io, format="PNG", optimize=True)
+    if settings.BACKGROUND_JOBS['ASYNC']:
+        transaction.on_commit(lambda: enqueue_job(instance, 'featured_image'))
     else:
-        img.save(img_io, format="JPEG", quality=JPEG_QUALITY, optimize=True)
-    with open(optimized_path, "wb") as f:
-        f.write(img_io.getvalue())
-
-    # --- 2) Main WebP ---
-    try:
-        webp_path = os.path.join(original_dir, f"{base_name}.webp")
-        webp_io = BytesIO()
-        img.save(webp_io, format="WEBP", quality=WEBP_QUALITY, optimize=True)
-        with open(webp_path, "wb") as f:
-            f.write(webp_io.getvalue())
-    except Exception as e:
-        print(f"[WebP generation error] {e}")
-
-    # --- 3) Resized versions ---
-    for size in SIZES:
-        try:
-            resized_file = resize_and_save(
-                img, base_name, ext, size, JPEG_QUALITY,
-                "JPEG" if ext != ".png" else "PNG"
-            )
-            with open(os.path.join(resized_dir, resized_file.name), "wb") as f:
-                f.write(resized_file.read())
-        except Exception as e:
-            print(f"[Resize error JPG/PNG] {e}")
-
-        try:
-            resized_webp = resize_and_save(img, base_name, ".webp", size, WEBP_QUALITY, "WEBP")
-            with open(os.path.join(resized_dir, resized_webp.name), "wb") as f:
-                f.write(resized_webp.read())
-        except Exception as e:
-            print(f"[Resize error WebP] {e}")
-
-    # --- 4) Update featured_image path to optimized file ---
-    if default_storage.exists(optimized_path):
-        instance.featured_image.name = os.path.relpath(optimized_path, settings.MEDIA_ROOT)
-
-    # --- 5) Save updated fields without triggering loop ---
-    Blog.objects.filter(pk=instance.pk).update(
-        featured_image=instance.featured_image.name,
-        image_base_name=base_name,
-        image_width=instance.image_width,
-        image_height=instance.image_height
-    )
-
-    # --- 6) Delete original uploaded file if different ---
-    if image_path != optimized_path and os.path.exists(image_path):
-        try:
-            os.remove(image_path)
-        except Exception as e:
-            print(f"[Cleanup original error] {e}")
+        process_featured_image(instance)
 
 # ----------------
-# Video Processing - FIXED VERSION
+# Video Processing
 # ----------------
 @receiver(post_save, sender=Blog)
-def process_video_metadata(sender, instance, created, update_fields, raw=False, **kwargs):
+def process_video_metadata(sender, instance, created, update_fields=None, raw=False, **kwargs):
     if raw:
         return
     """
     Extract video metadata like duration and generate thumbnail
     Only runs if video_file exists and duration is not set
-    
-    FIXED ISSUES:
-    1. Added update_fields parameter to prevent infinite loop
-    2. Added check to skip if already processing
-    3. Import errors handled gracefully
     """
-    # CRITICAL FIX 1: Skip if this save was triggered by our update
-    if update_fields is not None and 'video_duration' in update_fields:
+    # Skip partial saves that don't touch the video
+    if update_fields is not None and 'video_file' not in update_fields:
         return
-    
+
     # Skip if no video or already processed
     if not instance.video_file or instance.video_duration:
         return
-    
-    # CRITICAL FIX 2: Check if moviepy is installed
+
+    if settings.BACKGROUND_JOBS['ASYNC']:
+        transaction.on_commit(lambda: enqueue_job(instance, 'video_metadata'))
+        return
+
     try:
-        from moviepy import VideoFileClip
+        extract_video_metadata(instance)
     except ImportError:
         print("[Video processing] moviepy not installed. Run: pip install moviepy")
-        return
-    
-    try:
-        from datetime import timedelta
-        
-        # Get video file path
-        video_path = instance.video_file.path
-        
-        # Check if file exists
-        if not os.path.isfile(video_path):
-            print(f"[Video processing] Video file not found: {video_path}")
-            return
-        
-        print(f"[Video processing] Processing video for: {instance.title}")
-        
-        # Open video
-        clip = VideoFileClip(video_path)
-        
-        # Extract duration
-        duration = timedelta(seconds=int(clip.duration))
-        print(f"[Video processing] Duration: {duration}")
-        
-        # Generate thumbnail at 1 second (if not already set)
-        thumbnail_generated = False
-        if not instance.video_thumbnail:
-            try:
-                # Get frame at 1 second (or 0 if video is shorter)
-                frame_time = min(1, clip.duration - 0.1)
-                frame = clip.get_frame(frame_time)
-                img = Image.fromarray(frame)
-                
-                # Optimize thumbnail
-                img.thumbnail((1280, 720), Image.LANCZOS)
-                
-                # Save thumbnail
-                thumb_io = BytesIO()
-                img.save(thumb_io, format='JPEG', quality=85, optimize=True)
-                thumb_io.seek(0)
-                
-                thumb_name = f"{instance.slug}-video-thumb.jpg"
-                instance.video_thumbnail.save(
-                    thumb_name,
-                    ContentFile(thumb_io.read()),
-                    save=False
-                )
-                thumbnail_generated = True
-                print(f"[Video processing] Thumbnail generated: {thumb_name}")
-            except Exception as thumb_error:
-                print(f"[Video processing] Thumbnail generation failed: {thumb_error}")
-        
-        # Close the video clip
-        clip.close()
-        
-        # CRITICAL FIX 3: Use update_fields to prevent triggering signal again
-        update_data = {'video_duration': duration}
-        if thumbnail_generated and instance.video_thumbnail:
-            update_data['video_thumbnail'] = instance.video_thumbnail.name
-        
-        Blog.objects.filter(pk=instance.pk).update(**update_data)
-        
-        print(f"[Video processing] Successfully processed video for: {instance.title}")
-        
     except Exception as e:
         print(f"[Video processing error] {e}")
         import traceback
         traceback.print_exc()
         # Don't fail the save if video processing fails
 
+# ----------------
+# Content Analysis
+# ----------------
+@receiver(post_save, sender=Blog)
+def queue_content_analysis(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    """Recompute the stored AI content analysis in the background when the
+    analyzed fields change. The worker skips it if the hash still matches."""
+    if raw or not settings.AI_CONTENT_SETTINGS['ENABLE_CONTENT_ANALYSIS']:
+        return
+    if update_fields is not None and not set(update_fields) & set(ANALYSIS_SOURCE_FIELDS):
+        return
+    # Inline mode has no worker: the view or dashboard computes it on next use
+    if settings.BACKGROUND_JOBS['ASYNC']:
+        transaction.on_commit(lambda: enqueue_job(instance, 'content_analysis'))
+
+@receiver(post_save, sender=Blog)
+def queue_voice_analysis(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    """Same as above for the stored voice-search report."""
+    if raw or not settings.VOICE_SEARCH_SETTINGS['ENABLE_VOICE_SEARCH']:
+        return
+    if update_fields is not None and not set(update_fields) & set(ANALYSIS_SOURCE_FIELDS):
+        return
+    if settings.BACKGROUND_JOBS['ASYNC']:
+        transaction.on_commit(lambda: enqueue_job(instance, 'voice_analysis'))
+
+# ----------------
+# Related Posts Index
+# ----------------
+RELATED_SOURCE_FIELDS = ('title', 'blog_body', 'status', 'category', 'tags')
+
+@receiver(post_save, sender=Blog)
+def queue_related_posts(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    """Add, refresh or remove the post in the related-posts index when it is
+    published, edited while published, or unpublished."""
+    if raw or not settings.BACKGROUND_JOBS['ASYNC']:
+        return
+    if update_fields is not None and not set(update_fields) & set(RELATED_SOURCE_FIELDS):
+        return
+    if instance.status != 'Published' and not getattr(instance, '_was_published', False):
+        return
+    transaction.on_commit(lambda: enqueue_job(instance, 'related_posts'))
+
+# ----------------
+# Auto-link Keyword Index
+# ----------------
+KEYWORD_SOURCE_FIELDS = ('title', 'seo_keywords', 'status')
+
+@receiver(post_save, sender=Blog)
+def refresh_keyword_index(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    """Bump the keyword index version when a published post's keywords may
+    have changed. Processes only rebuild if the keyword set really did."""
+    if raw:
+        return
+    if update_fields is not None and not set(update_fields) & set(KEYWORD_SOURCE_FIELDS):
+        return
+    if instance.status != 'Published' and not getattr(instance, '_was_published', False):
+        return
+    transaction.on_commit(bump_keyword_version)
+
+@receiver(post_delete, sender=Blog)
+def refresh_keyword_index_on_delete(sender, instance, **kwargs):
+    if instance.status == 'Published':
+        transaction.on_commit(bump_keyword_version)
+
+@receiver(m2m_changed, sender=Blog.tags.through)
+def refresh_keyword_index_on_tags(sender, instance, action, **kwargs):
+    """Tags are saved after the post itself (form.save_m2m)."""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if isinstance(instance, Blog) and instance.status == 'Published':
+        transaction.on_commit(bump_keyword_version)
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def refresh_keyword_index_on_tag_rename(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(bump_keyword_version)
+
+# ----------------
+# Linked Body Cache
+# ----------------
+LINK_GRAPH_SOURCE_FIELDS = ('title', 'slug', 'blog_body', 'seo_keywords', 'short_description', 'status', 'category')
+
+@receiver(post_save, sender=Blog)
+def refresh_link_graph(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    """Publishing, editing or unpublishing a post can change what every
+    other body links to, so all cached linked bodies go stale."""
+    if raw:
+        return
+    if update_fields is not None and not set(update_fields) & set(LINK_GRAPH_SOURCE_FIELDS):
+        return
+    if instance.status != 'Published' and not getattr(instance, '_was_published', False):
+        return
+    transaction.on_commit(bump_graph_version)
+
+@receiver(post_delete, sender=Blog)
+def refresh_link_graph_on_delete(sender, instance, **kwargs):
+    if instance.status == 'Published':
+        transaction.on_commit(bump_graph_version)
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def refresh_link_graph_on_category(sender, instance, raw=False, **kwargs):
+    """Category names and slugs appear in linked bodies' URLs and anchors."""
+    if not raw:
+        transaction.on_commit(bump_graph_version)
+
 # ----------------
 # Comment Notifications
 # ----------------
@@ -0,0 +1,191 @@
+# blogs/sketches.py
+"""Mergeable sketches for the analytics rollups.
+
+HyperLogLog estimates distinct counts (unique visitors, sessions) and
+t-digest estimates percentiles (Core Web Vitals). Each one summarises a
+single day in a few KB. Any number of days can be merged into a new
+sketch without revisiting raw rows, so a report over a date range uses
+constant memory.
+
+Pure Python and no Django imports, so they can be used from scripts and
+worker processes alike.
+"""
+import hashlib
+import math
+import struct
+
+HLL_PRECISION = 12  # 4096 registers, ~1.6% standard error
+TDIGEST_COMPRESSION = 100  # ~100 centroids, tightest at the tails
+
+
+class HyperLogLog:
+    """Distinct-count estimator. `add()` strings, `merge()` other sketches."""
+
+    def __init__(self, precision=HLL_PRECISION, registers=None):
+        self.precision = precision
+        self.m = 1 << precision
+        self.registers = bytearray(registers) if registers is not None else bytearray(self.m)
+
+    def add(self, value):
+        digest = hashlib.blake2b(str(value).encode(), digest_size=8).digest()
+        x = int.from_bytes(digest, 'big')
+        index = x >> (64 - self.precision)
+        rest = x & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, values):
+        for value in values:
+            self.add(value)
+        return self
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError('Cannot merge HyperLogLogs of different precision')
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self):
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Small-range correction (linear counting)
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def to_bytes(self):
+        """Sparse (index, rank) pairs while that is smaller, else all registers."""
+        nonzero = [(i, r) for i, r in enumerate(self.registers) if r]
+        header = struct.pack('>cB', b'S' if len(nonzero) * 3 < self.m else b'D', self.precision)
+        if header[:1] == b'S':
+            return header + b''.join(struct.pack('>HB', i, r) for i, r in nonzero)
+        return header + bytes(self.registers)
+
+    @classmethod
+    def from_bytes(cls, data):
+        data = bytes(data)
+        kind, precision = struct.unpack('>cB', data[:2])
+        if kind == b'D':
+            return cls(precision, data[2:])
+        sketch = cls(precision)
+        for i, r in struct.iter_unpack('>HB', data[2:]):
+            sketch.registers[i] = r
+        return sketch
+
+    @classmethod
+    def merged(cls, blobs):
+        """Union of serialised sketches (None entries are skipped)."""
+        result = cls()
+        for blob in blobs:
+            if blob:
+                result.merge(cls.from_bytes(blob))
+        return result
+
+
+class TDigest:
+    """Merging t-digest (Dunning) for streaming quantiles."""
+
+    def __init__(self, compression=TDIGEST_COMPRESSION):
+        self.compression = compression
+        self.centroids = []  # [(mean, weight)], sorted after compress()
+        self.buffer = []
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value, weight=1.0):
+        value = float(value)
+        self.buffer.append((value, weight))
+        self.total += weight
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if len(self.buffer) >= self.compression * 10:
+            self.compress()
+
+    def update(self, values):
+        for value in values:
+            if value is not None:
+                self.add(value)
+        return self
+
+    def merge(self, other):
+        if not other.total:
+            return self
+        self.buffer.extend(other.centroids)
+        self.buffer.extend(other.buffer)
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        if len(self.buffer) >= self.compression * 10:
+            self.compress()
+        return self
+
+    def _k(self, q):
+        return self.compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+    def compress(self):
+        if not self.buffer:
+            return
+        points = sorted(self.centroids + self.buffer)
+        self.buffer = []
+        merged = []
+        mean, weight = points[0]
+        cumulative = 0.0
+        limit = self._k(0) + 1
+        for next_mean, next_weight in points[1:]:
+            if self._k(min(1.0, (cumulative + weight + next_weight) / self.total)) <= limit:
+                weight += next_weight
+                mean += (next_mean - mean) * next_weight / weight
+            else:
+                merged.append((mean, weight))
+                cumulative += weight
+                limit = self._k(cumulative / self.total) + 1
+                mean, weight = next_mean, next_weight
+        merged.append((mean, weight))
+        self.centroids = merged
+
+    def quantile(self, q):
+        """Estimated value at quantile `q` (0..1), or None when empty."""
+        self.compress()
+        if not self.centroids:
+            return None
+        if len(self.centroids) == 1:
+            return self.centroids[0][0]
+
+        target = q * self.total
+        first_mean, first_weight = self.centroids[0]
+        if target <= first_weight / 2:
+            return self.min + (first_mean - self.min) * target / (first_weight / 2)
+
+        cumulative = 0.0
+        for (left, left_w), (right, right_w) in zip(self.centroids, self.centroids[1:]):
+            left_center = cumulative + left_w / 2
+            right_center = cumulative + left_w + right_w / 2
+            if target <= right_center:
+                return left + (right - left) * (target - left_center) / (right_center - left_center)
+            cumulative += left_w
+
+        last_mean, last_weight = self.centroids[-1]
+        tail = (target - (self.total - last_weight / 2)) / (last_weight / 2)
+        return last_mean + (self.max - last_mean) * min(1.0, tail)
+
+    def to_dict(self):
+        self.compress()
+        return {
+            'c': self.compression,
+            'min': self.min if self.total else None,
+            'max': self.max if self.total else None,
+            'centroids': [[round(m, 6), w] for m, w in self.centroids],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        digest = cls(data.get('c', TDIGEST_COMPRESSION))
+        digest.centroids = [(m, w) for m, w in data.get('centroids', [])]
+        digest.total = float(sum(w for _, w in digest.centroids))
+        if digest.total:
+            digest.min, digest.max = data['min'], data['max']
+        return digest
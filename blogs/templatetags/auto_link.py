@@ -1,9 +1,13 @@
 import re
+from bisect import bisect_right
+from collections import defaultdict
 from django import template
 from django.urls import reverse
 from django.utils.safestring import mark_safe
 from django.utils.html import escape
 
+from blogs.keyword_index import automaton_for, fold, split_keywords
+
 register = template.Library()
 
 # Regex to split content but keep <a> tags and also headings/bold tags
@@ -12,12 +16,29 @@ ANCHOR_HEADING_BOLD_SPLIT_RE = re.compile(
     re.IGNORECASE | re.DOTALL
 )
 
-def _link_once(text: str, keyword: str, url: str) -> str:
-    """Link the first occurrence of keyword in text."""
-    if not keyword:
-        return text
-    pattern = re.compile(r'\b(' + re.escape(keyword) + r')\b', re.IGNORECASE)
-    return pattern.sub(rf'<a href="{url}">\1</a>', text, count=1)
+# Markup inside a segment (<p>, <img alt="...">, ...), never linked into
+HTML_TAG_RE = re.compile(r'<[^>]*>')
+
+
+def _anchor_candidates(segments, automaton, keys):
+    """{key: [(segment index, start, end), ...]} in document order for the
+    whole-word matches of `keys` outside skipped segments and HTML tags.
+    One automaton pass per segment, whatever the number of keywords."""
+    candidates = {}
+    for i, seg in enumerate(segments):
+        if i % 2 == 1:  # These are skipped tags
+            continue
+        tags = [(m.start(), m.end()) for m in HTML_TAG_RE.finditer(seg)]
+        tag_starts = [start for start, _ in tags]
+        for start, end, key in automaton.find_all(seg):
+            if key not in keys:
+                continue
+            inside = bisect_right(tag_starts, start) - 1
+            if inside >= 0 and start < tags[inside][1]:
+                continue
+            candidates.setdefault(key, []).append((i, start, end))
+    return candidates
+
 
 @register.simple_tag
 def auto_link_bundle(content, related_posts):
@@ -36,20 +57,7 @@ def auto_link_bundle(content, related_posts):
     linked_ids = []
     related_links = []
 
-    def link_in_segments(keywords, url):
-        """Insert one link in non-anchor, non-heading, non-bold segments."""
-        for i, seg in enumerate(segments):
-            if i % 2 == 1:  # These are skipped tags
-                continue
-            before = seg
-            for kw in keywords:
-                new = _link_once(before, kw, url)
-                if new != before:
-                    segments[i] = new
-                    return True
-        return False
-
-    # Auto-link from related posts and build related_links list
+    posts = []
     for p in related_posts:
         if not getattr(p, 'slug', None) or not getattr(p, 'category', None):
             continue
@@ -58,9 +66,33 @@ def auto_link_bundle(content, related_posts):
         except Exception as e:
             print(f"Error generating URL for {p.title}: {e}")
             continue
+        keywords = split_keywords(getattr(p, 'seo_keywords', None)) or [p.title.strip()]
+        posts.append((p, url, [fold(kw) for kw in keywords]))
+
+    # Every keyword of every related post, found in one pass over the content
+    keys = {key for _, _, keywords in posts for key in keywords}
+    candidates = _anchor_candidates(segments, automaton_for(keys), keys)
+    links = defaultdict(list)  # segment index -> [(start, end, url), ...]
 
-        # Try to link keywords in content
-        keywords = [k.strip() for k in str(p.seo_keywords).split(',')] if getattr(p, 'seo_keywords', None) else [p.title.strip()]
+    def link_in_segments(keywords, url):
+        """Link the first free occurrence, taking the earliest segment and
+        then the first keyword that occurs in it."""
+        best = None
+        for rank, key in enumerate(keywords):
+            for i, start, end in candidates.get(key, ()):
+                if any(start < e and s < end for s, e, _ in links[i]):
+                    continue  # Overlaps a link placed for another post
+                if best is None or (i, rank) < best[:2]:
+                    best = (i, rank, start, end)
+                break
+        if best is None:
+            return False
+        i, _, start, end = best
+        links[i].append((start, end, url))
+        return True
+
+    # Auto-link from related posts and build related_links list
+    for p, url, keywords in posts:
         if link_in_segments(keywords, url):
             linked_ids.append(p.id)
 
@@ -72,6 +104,12 @@ def auto_link_bundle(content, related_posts):
             'post': p
         })
 
+    for i, spans in links.items():
+        seg = segments[i]
+        for start, end, url in sorted(spans, reverse=True):
+            seg = f'{seg[:start]}<a href="{url}">{seg[start:end]}</a>{seg[end:]}'
+        segments[i] = seg
+
     # DON'T insert inline content - let the template handle it
     # This prevents the layout breaking issue
     processed_content = ''.join(segments)
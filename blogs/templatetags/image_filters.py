@@ -1,9 +1,11 @@
 from django import template
 from django.utils.html import format_html, escape
+from django.utils.safestring import mark_safe
 from urllib.parse import urljoin
 import os
 from blogs.models import Blog
-from blogs.signals import SIZES
+from blogs.media import SIZES
+from blogs import responsive_images
 
 register = template.Library()
 
@@ -45,6 +47,11 @@ def seo_responsive_image(context, source, alt="", css_class="", context_name="de
     sizes_attr = SIZES_ATTRS.get(context_name, "100vw")
     fallback_width = max(w for w in widths if w <= 768) if any(w <= 768 for w in widths) else min(widths)
 
+    if responsive_images.is_enabled():
+        html = _on_demand_img(source, alt, css_class, loading, widths, sizes_attr, fallback_width)
+        if html is not None:
+            return html
+
     # Case 1: Source is a Blog object
     if isinstance(source, Blog):
         if not source.featured_image:
@@ -105,6 +112,48 @@ def seo_responsive_image(context, source, alt="", css_class="", context_name="de
     return html
 
 
+def _on_demand_img(source, alt, css_class, loading, widths, sizes_attr, fallback_width):
+    """<img srcset> pointing at the on-demand resize endpoint. The endpoint
+    picks AVIF/WebP/JPEG per browser, so no <picture> sources are needed.
+    Returns None for sources the endpoint can't serve."""
+    if isinstance(source, Blog):
+        if not source.featured_image:
+            return _placeholder_img(alt, css_class, loading)
+        path = source.featured_image.name
+        # Re-uploads change the hash, so URLs stay safe to cache as immutable
+        version = (source.image_manifest or {}).get('source_hash', '')[:12]
+        width_attr = f' width="{source.image_width}"' if source.image_width else ""
+        height_attr = f' height="{source.image_height}"' if source.image_height else ""
+    elif isinstance(source, str):
+        path = responsive_images.media_path_from_url(source)
+        version = responsive_images.source_version(path) if path else ""
+        width_attr = height_attr = ""
+    else:
+        return None
+
+    widths = [w for w in widths if w in responsive_images.conf('WIDTHS')]
+    if not path or not widths:
+        return None
+    if fallback_width not in widths:
+        fallback_width = widths[0]
+
+    return format_html(
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" loading="{}" decoding="async" class="{}"{}>',
+        responsive_images.image_url(path, fallback_width, version=version),
+        responsive_images.srcset(path, widths, version=version),
+        sizes_attr, escape(alt), loading, css_class or "",
+        mark_safe(f"{width_attr}{height_attr}"),
+    )
+
+
+@register.filter(is_safe=True)
+def responsive_body_images(html):
+    """Give uploaded images inside post body HTML an on-demand srcset."""
+    if not html or not responsive_images.is_enabled():
+        return html
+    return mark_safe(responsive_images.rewrite_body_images(str(html)))
+
+
 def _placeholder_img(alt, css_class, loading):
     return format_html(
         '<img src="{}" alt="{}" class="{}" loading="{}">',
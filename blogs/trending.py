@@ -0,0 +1,122 @@
+# blogs/trending.py
+"""Time-decayed trending posts backed by Redis sorted sets.
+
+Every counted view does one ZINCRBY per scope (the site, the post's
+category and each of its tags) on the sorted set for the current hour:
+
+    trending:h:<hour>:site      trending:h:<hour>:cat:<id>      trending:h:<hour>:tag:<id>
+
+Hourly sets expire once they fall out of the WINDOW_HOURS window. The
+trending score of a post is its hourly hits weighted by
+exp(-ln 2 * age_hours / HALF_LIFE_HOURS). ZUNIONSTORE computes it into
+trending:score:<scope> with those weights, and that set is reused for
+REFRESH_SECONDS. Top-N is then a ZREVRANGE, O(log N + N).
+
+With TRENDING['BACKEND'] = 'db', when Redis is unreachable, or while a
+scope has too few hits, the list is filled from the database by all-time
+views.
+"""
+import math
+import time
+
+from django.conf import settings
+
+from .models import Blog
+from .redis_client import get_redis, redis_errors
+
+HOUR_KEY = 'trending:h:{hour}:{scope}'
+SCORE_KEY = 'trending:score:{scope}'
+
+
+def conf():
+    return settings.TRENDING
+
+
+def _use_redis():
+    return conf()['BACKEND'] == 'redis'
+
+
+def _scopes(post, tag_ids=None):
+    scopes = ['site', f'cat:{post.category_id}']
+    if tag_ids is None:
+        tag_ids = [tag.id for tag in post.tags.all()]
+    scopes += [f'tag:{tag_id}' for tag_id in tag_ids]
+    return scopes
+
+
+def scope_for(category=None, tag=None):
+    if category is not None:
+        return f'cat:{category.pk}'
+    if tag is not None:
+        return f'tag:{tag.pk}'
+    return 'site'
+
+
+def record_hit(post, tag_ids=None):
+    """Count one view of `post` towards trending in every scope it is in."""
+    if not _use_redis():
+        return
+    hour = int(time.time() // 3600)
+    ttl = (conf()['WINDOW_HOURS'] + 1) * 3600
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for scope in _scopes(post, tag_ids):
+            key = HOUR_KEY.format(hour=hour, scope=scope)
+            pipe.zincrby(key, 1, post.pk)
+            pipe.expire(key, ttl)
+        pipe.execute()
+    except redis_errors() as e:
+        print(f"[Trending] Redis unavailable, hit not recorded: {e}")
+
+
+def decay_weights():
+    """ZUNIONSTORE weight per hour of the window, by age in hours (0 = now)."""
+    half_life = conf()['HALF_LIFE_HOURS']
+    return [math.exp(-math.log(2) * age / half_life) for age in range(conf()['WINDOW_HOURS'])]
+
+
+def top_ids(scope='site', limit=10):
+    """Post ids by decayed score for `scope`, best first ([] on failure)."""
+    if not _use_redis():
+        return []
+    client = get_redis()
+    score_key = SCORE_KEY.format(scope=scope)
+    try:
+        if not client.exists(score_key):
+            hour = int(time.time() // 3600)
+            weights = {
+                HOUR_KEY.format(hour=hour - age, scope=scope): weight
+                for age, weight in enumerate(decay_weights())
+            }
+            pipe = client.pipeline(transaction=True)
+            pipe.zunionstore(score_key, weights, aggregate='SUM')
+            pipe.expire(score_key, conf()['REFRESH_SECONDS'])
+            pipe.execute()
+        return [int(pk) for pk in client.zrevrange(score_key, 0, limit - 1)]
+    except redis_errors() as e:
+        print(f"[Trending] Redis unavailable, using the database: {e}")
+        return []
+
+
+def trending_posts(limit=5, category=None, tag=None, exclude=()):
+    """Published trending posts (with category loaded), best first.
+
+    Over-fetches from Redis to make up for excluded or unpublished ids,
+    and tops up from the database by views when there are too few."""
+    exclude = set(exclude)
+    published = Blog.objects.select_related('category').filter(status='Published')
+    if category is not None:
+        published = published.filter(category=category)
+    if tag is not None:
+        published = published.filter(tags=tag)
+
+    ids = [pk for pk in top_ids(scope_for(category, tag), limit * 2 + len(exclude)) if pk not in exclude]
+    by_id = published.in_bulk(ids) if ids else {}
+    posts = [by_id[pk] for pk in ids if pk in by_id][:limit]
+
+    if len(posts) < limit:
+        shown = exclude | {post.pk for post in posts}
+        posts += list(
+            published.exclude(pk__in=shown).order_by('-views', '-created_at')[:limit - len(posts)]
+        )
+    return posts
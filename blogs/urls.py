@@ -11,6 +11,7 @@ urlpatterns = [
      path('category/<slug:category_slug>/', views.posts_by_category, name="posts_by_category"),
      path('tag/<slug:tag_slug>/', views.tagged_posts, name='tagged_posts'),
      path('tags/suggestions/', views.tag_suggestions, name='tag_suggestions'),
+     path('img/<str:signature>/<int:width>/<str:fmt>/<path:path>', views.resized_image, name='resized_image'),
      path("sitemap.xml", sitemap, {'sitemaps': sitemaps}, name='django.contrib.sitemaps.views.sitemap'),
      #path("robots.txt", views.robots_txt),
      # News sitemap
@@ -0,0 +1,63 @@
+# blogs/user_agents.py
+"""User-agent classification, parsed once per distinct UA string.
+
+`classify()` maps a UA string to (device class, browser family, bot flag)
+with a handful of precompiled regexes. Results are memoised in an LRU
+cache, because a site sees the same few hundred UA strings over and over.
+The result is stored on AnalyticsEvent at ingest, so reports group by
+columns instead of re-scanning user_agent text.
+"""
+import re
+from functools import lru_cache
+from typing import NamedTuple
+
+DEVICE_TYPES = ('mobile', 'tablet', 'desktop', 'bot')
+BROWSER_FAMILIES = ('edge', 'opera', 'samsung', 'chrome', 'firefox', 'safari', 'ie', 'other')
+
+BOT_RE = re.compile(
+    r'bot\b|bot/|crawl|spider|slurp|mediapartners|facebookexternalhit|embedly|'
+    r'headless|phantomjs|lighthouse|curl/|wget/|python-requests|python-urllib|'
+    r'httpclient|okhttp|go-http-client|java/|libwww|scrapy|feedfetcher|'
+    r'preview|monitor|uptime|pingdom',
+    re.IGNORECASE,
+)
+TABLET_RE = re.compile(r'ipad|tablet|kindle|silk/|playbook|android(?!.*mobile)', re.IGNORECASE)
+MOBILE_RE = re.compile(r'mobi|iphone|ipod|android|windows phone|blackberry|opera mini', re.IGNORECASE)
+
+# Order matters: Chromium derivatives also say "Chrome", and Chrome says "Safari"
+BROWSER_RES = [
+    ('edge', re.compile(r'edg(e|a|ios)?/', re.IGNORECASE)),
+    ('opera', re.compile(r'opr/|opera', re.IGNORECASE)),
+    ('samsung', re.compile(r'samsungbrowser/', re.IGNORECASE)),
+    ('chrome', re.compile(r'chrome/|crios/|chromium/', re.IGNORECASE)),
+    ('firefox', re.compile(r'firefox/|fxios/', re.IGNORECASE)),
+    ('safari', re.compile(r'safari/', re.IGNORECASE)),
+    ('ie', re.compile(r'msie |trident/', re.IGNORECASE)),
+]
+
+
+class UserAgentInfo(NamedTuple):
+    device_type: str
+    browser_family: str
+    is_bot: bool
+
+
+@lru_cache(maxsize=4096)
+def classify(user_agent):
+    """UserAgentInfo for a raw User-Agent header (empty counts as a bot)."""
+    user_agent = (user_agent or '').strip()
+    if not user_agent or BOT_RE.search(user_agent):
+        return UserAgentInfo('bot', 'other', True)
+
+    if TABLET_RE.search(user_agent):
+        device_type = 'tablet'
+    elif MOBILE_RE.search(user_agent):
+        device_type = 'mobile'
+    else:
+        device_type = 'desktop'
+
+    browser_family = next(
+        (family for family, pattern in BROWSER_RES if pattern.search(user_agent)),
+        'other',
+    )
+    return UserAgentInfo(device_type, browser_family, False)
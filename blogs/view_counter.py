@@ -0,0 +1,149 @@
+# blogs/view_counter.py
+"""Write-behind view counter.
+
+A page view does one HINCRBY on a Redis hash instead of a read-modify-write
+save() on the Blog row. `flush()` (run by `manage.py flush_view_counts` or
+the run_worker loop) moves the pending deltas into Blog.views with a single
+UPDATE ... CASE per batch.
+
+Flushing first RENAMEs the pending hash to a flushing key, so increments
+that arrive during a flush go into a fresh hash and are never lost. A flush
+that crashes before committing leaves the flushing key in place and the next
+flush retries it.
+
+Each snapshot gets an increasing number, stored in the flushing hash. The
+UPDATE records it in AnalyticsRollupState('view_counter') in the same
+transaction, and a snapshot at or below that number is not applied again.
+So if deleting the flushing key fails after the commit, the retry only
+discards it. The flush lock carries an owner token and is released with a
+compare-and-delete.
+
+With VIEW_COUNTER['BACKEND'] = 'db' (or when Redis is unreachable) views are
+counted with an atomic UPDATE views = views + 1, which never fires signals.
+"""
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from .models import Blog
+from .redis_client import acquire_lock, get_redis, redis_errors, release_lock
+
+PENDING_KEY = 'blog:views:pending'
+FLUSHING_KEY = 'blog:views:flushing'
+FLUSH_LOCK_KEY = 'blog:views:flush-lock'
+SNAPSHOT_SEQ_KEY = 'blog:views:snapshot-seq'
+SNAPSHOT_FIELD = '_snapshot'  # Field of the flushing hash holding its number
+STATE_NAME = 'view_counter'
+
+
+def _use_redis():
+    return settings.VIEW_COUNTER['BACKEND'] == 'redis'
+
+
+def record_view(blog_id):
+    """Count one view of `blog_id`."""
+    if _use_redis():
+        try:
+            get_redis().hincrby(PENDING_KEY, blog_id, 1)
+            return
+        except redis_errors() as e:
+            print(f"[View counter] Redis unavailable, counting in DB: {e}")
+    Blog.objects.filter(pk=blog_id).update(views=F('views') + 1)
+
+
+def pending_counts(blog_ids):
+    """Views recorded but not yet flushed, as {blog_id: delta}."""
+    blog_ids = [int(pk) for pk in blog_ids]
+    if not blog_ids or not _use_redis():
+        return {}
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.hmget(PENDING_KEY, blog_ids)
+        pipe.hmget(FLUSHING_KEY, blog_ids)
+        pending, flushing = pipe.execute()
+    except redis_errors():
+        return {}
+
+    counts = {}
+    for pk, a, b in zip(blog_ids, pending, flushing):
+        delta = int(a or 0) + int(b or 0)
+        if delta:
+            counts[pk] = delta
+    return counts
+
+
+def apply_live_views(posts):
+    """Attach live counts (DB value + pending delta) to `posts` with one
+    Redis round trip; read them back through Blog.live_views."""
+    posts = [post for post in posts if post is not None]
+    pending = pending_counts(post.pk for post in posts)
+    for post in posts:
+        post._live_views = post.views + pending.get(post.pk, 0)
+    return posts
+
+
+def flush(batch_size=None):
+    """Write pending deltas to Blog.views. Returns (posts_updated, views_added)."""
+    if not _use_redis():
+        return 0, 0
+
+    batch_size = batch_size or settings.VIEW_COUNTER['FLUSH_BATCH_SIZE']
+    client = get_redis()
+
+    # Only one flusher at a time, or two could apply the same snapshot
+    token = acquire_lock(FLUSH_LOCK_KEY, 300, client)
+    if token is None:
+        return 0, 0
+    try:
+        # A leftover flushing hash is from a flush that never committed, or
+        # whose cleanup failed: retry it before taking a new snapshot.
+        if not client.exists(FLUSHING_KEY):
+            if not client.exists(PENDING_KEY):
+                return 0, 0
+            client.rename(PENDING_KEY, FLUSHING_KEY)
+        client.hsetnx(FLUSHING_KEY, SNAPSHOT_FIELD, _next_snapshot(client))
+
+        snapshot = client.hgetall(FLUSHING_KEY)
+        number = int(snapshot.pop(SNAPSHOT_FIELD))
+        deltas = {int(pk): int(n) for pk, n in snapshot.items() if int(n)}
+        items = sorted(deltas.items())  # Stable row lock order
+
+        if not _apply(items, number, batch_size):
+            items, deltas = [], {}
+        client.delete(FLUSHING_KEY)
+    finally:
+        release_lock(FLUSH_LOCK_KEY, token, client)
+
+    return len(items), sum(deltas.values())
+
+
+def _next_snapshot(client):
+    # Start from the clock so a lost counter never reuses an applied number
+    client.set(SNAPSHOT_SEQ_KEY, time.time_ns() // 1000, nx=True)
+    return client.incr(SNAPSHOT_SEQ_KEY)
+
+
+def _apply(items, number, batch_size):
+    """Add `items` to Blog.views unless snapshot `number` was already
+    applied. Returns False for an already applied snapshot."""
+    from .analytics import AnalyticsRollupState
+
+    with transaction.atomic():
+        AnalyticsRollupState.objects.get_or_create(name=STATE_NAME)
+        state = AnalyticsRollupState.objects.select_for_update().get(name=STATE_NAME)
+        if number <= state.last_event_id:
+            return False
+        for start in range(0, len(items), batch_size):
+            batch = items[start:start + batch_size]
+            Blog.objects.filter(pk__in=[pk for pk, _ in batch]).update(
+                views=F('views') + Case(
+                    *[When(pk=pk, then=Value(n)) for pk, n in batch],
+                    default=Value(0),
+                    output_field=IntegerField(),
+                )
+            )
+        state.last_event_id = number
+        state.save(update_fields=['last_event_id', 'updated_at'])
+    return True
@@ -1,6 +1,6 @@
 from django.shortcuts import get_object_or_404, render, redirect
 from django.core.paginator import Paginator
-from django.http import HttpResponse, HttpResponseRedirect
+from django.http import HttpResponse, HttpResponseRedirect, FileResponse, Http404
 from taggit.models import Tag
 from .models import Blog, Category
 #from .forms import CommentForm
@@ -17,10 +17,19 @@ from django.views.decorators.cache import cache_page
 from django.views.decorators.cache import never_cache, cache_control
 from django.views.decorators.vary import vary_on_cookie
 from .sitemaps import NewsSitemap
-from blogs.ai_content import AIContentIntelligence
-from blogs.voice_search import VoiceSearchOptimizer
+from blogs.ai_content import get_content_analysis
+from blogs.voice_search import get_voice_analysis
 from blogs.analytics import UserBehaviorAnalytics
 from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.core.exceptions import SuspiciousFileOperation
+from blogs import responsive_images
+from blogs.view_counter import record_view, apply_live_views
+from blogs.bot_detection import is_bot
+from blogs.trending import record_hit, trending_posts as get_trending_posts
+from blogs.related_posts import related_posts as get_related_posts
+from blogs.linked_body import RELATED_COUNT, linked_body
+import os
 
 
 
@@ -76,26 +85,8 @@ def tagged_posts(request, tag_slug):
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
 
-    # FIXED: Trending posts using views instead of comment count
-    # Since you don't have a direct comment relationship, use views or created_at
-    trending_posts = Blog.objects.select_related('category').filter(
-        status='Published'
-    ).order_by('-views', '-created_at')[:5]  # Order by views instead
-
-    # Alternative: If you want to count comments properly, use this approach:
-    """
-    from django.contrib.contenttypes.models import ContentType
-    blog_content_type = ContentType.objects.get_for_model(Blog)
-    
-    trending_posts = Blog.objects.select_related('category').filter(
-        status='Published'
-    ).annotate(
-        comment_count=Count(
-            'comment_set',
-            filter=Q(comment_set__content_type=blog_content_type)
-        )
-    ).order_by('-comment_count', '-created_at')[:5]
-    """
+    # Trending within this tag (time-decayed, see blogs/trending.py)
+    trending_posts = get_trending_posts(5, tag=tag)
 
     # Editor's Picks: Recently published posts - OPTIMIZED
     editors_picks = Blog.objects.select_related('category').filter(
@@ -180,27 +171,28 @@ def blogs(request, category_slug, slug):
         status='Published'
     ).exclude(id=single_blog.id).order_by('-created_at')[:5]
 
+    # Crawlers get the same page but skip every write below
+    human = not is_bot(request, page_view=True)
+
     # AI Content Analysis
+    # Stored analysis, recomputed in the background when the content changes
+    # (crawlers never trigger the recomputation)
     if settings.AI_CONTENT_SETTINGS['ENABLE_CONTENT_ANALYSIS']:
-        ai_analyzer = AIContentIntelligence(single_blog)
-        content_analysis = ai_analyzer.analyze_content()
+        content_analysis = get_content_analysis(single_blog, refresh=human)
     else:
         content_analysis = None
     
     # Voice Search Optimization
     if settings.VOICE_SEARCH_SETTINGS['ENABLE_VOICE_SEARCH']:
-        voice_optimizer = VoiceSearchOptimizer(single_blog)
-        voice_analysis = voice_optimizer.analyze_voice_readiness()
+        voice_analysis = get_voice_analysis(single_blog, refresh=human)
     else:
         voice_analysis = None
     
-    # Track analytics
-    if settings.ANALYTICS_ENABLED:
+    # Track analytics (cookieless visitor/session ids, no session row is created)
+    if settings.ANALYTICS_ENABLED and human:
         analytics = UserBehaviorAnalytics()
         analytics.track_custom_event(
             'page_view',
-            user_id=request.session.session_key,
-            session_id=request.session.session_key,
             content_object=single_blog,
             event_data={
                 'category': category.category_name,
@@ -210,17 +202,16 @@ def blogs(request, category_slug, slug):
             request=request
         )
 
-    # Increase view count
-    single_blog.views += 1
-    single_blog.save(update_fields=['views'])
+    # Count the view in Redis; flushed to Blog.views by flush_view_counts
+    if human:
+        record_view(single_blog.pk)
+        record_hit(single_blog)
 
-    # OPTIMIZED: Related posts with select_related
-    related_posts = Blog.objects.select_related('category', 'author').filter(
-        category=single_blog.category,
-        status='Published'
-    ).exclude(
-        id=single_blog.id
-    ).order_by('-created_at')[:4]
+    # Related posts from the precomputed TF-IDF neighbour index
+    related_posts = get_related_posts(single_blog, RELATED_COUNT)
+
+    # Auto-linked body, cached until the post or the link graph changes
+    auto = linked_body(single_blog, related_posts)
 
     # Get content type for comments
     content_type = ContentType.objects.get_for_model(Blog)
@@ -239,9 +230,8 @@ def blogs(request, category_slug, slug):
     categories = Category.objects.all().order_by('category_name')
 
     # Trending posts for sidebar
-    trending_posts = Blog.objects.select_related('category').filter(
-        status='Published'
-    ).order_by('-views', '-created_at')[:5]
+    trending_posts = get_trending_posts(5)
+    apply_live_views([single_blog, *trending_posts])
 
     # Breadcrumbs
     breadcrumbs = [
@@ -256,6 +246,7 @@ def blogs(request, category_slug, slug):
         'single_blog': single_blog,
         'post': post,  # Backward compatibility
         'related_posts': related_posts,
+        'auto': auto,
         'content_type_id': content_type.id,
         'comment_form': CommentForm(content_object=post),
         'comments': comments,  # Add fresh comments to context
@@ -347,3 +338,32 @@ def news_sitemap_view(request):
         xmlns:news="http://www.google.com/schemas/sitemap-news/0.9">
 </urlset>'''
         return HttpResponse(empty_sitemap, content_type='application/xml')
+
+
+def resized_image(request, signature, width, fmt, path):
+    """Serve `path` resized to `width`, rendering and caching it on first
+    request. 'auto' picks AVIF, WebP or JPEG/PNG from the Accept header."""
+    version = request.GET.get('v', '')
+    if (
+        width not in responsive_images.conf('WIDTHS')
+        or fmt not in responsive_images.URL_FORMATS
+        or not responsive_images.verify(signature, path, width, version)
+    ):
+        raise Http404("Unknown image variant")
+
+    source_ext = os.path.splitext(path)[1].lower()
+    resolved = responsive_images.negotiate_format(fmt, request.headers.get('Accept'), source_ext)
+    try:
+        cached = responsive_images.get_or_render(path, width, resolved)
+    except (FileNotFoundError, SuspiciousFileOperation):
+        raise Http404("Image not found")
+
+    response = FileResponse(open(cached, 'rb'), content_type=responsive_images.FORMATS[resolved][1])
+    if version:
+        response['Cache-Control'] = f"public, max-age={responsive_images.conf('MAX_AGE')}, immutable"
+    else:
+        # Unversioned URLs keep serving the same path after a re-upload
+        response['Cache-Control'] = "public, max-age=3600"
+    if fmt == 'auto':
+        patch_vary_headers(response, ['Accept'])
+    return response
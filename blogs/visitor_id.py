@@ -0,0 +1,77 @@
+# blogs/visitor_id.py
+"""Cookieless visitor and session ids for analytics and ad tracking.
+
+Anonymous readers are identified without a cookie, a session row or any
+other storage:
+
+    visitor_id = HMAC(daily key, IP prefix + User-Agent)
+    session_id = HMAC(daily key, visitor_id + time bucket)
+
+The daily key is derived from SECRET_KEY and the UTC date, so ids rotate
+at midnight and yesterday's visitor cannot be linked to today's. Only the
+network prefix of the address is used (/24 for IPv4, /48 for IPv6), and
+the raw values never leave this module. A session is a SESSION_MINUTES
+time bucket per visitor, offset by a per-visitor number of minutes.
+
+Nothing here touches request.session, so reading articles never writes to
+the session backend.
+"""
+import ipaddress
+from datetime import timezone as dt_timezone
+from typing import NamedTuple
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+
+from .bot_detection import get_client_ip
+
+
+class VisitorIds(NamedTuple):
+    visitor_id: str
+    session_id: str
+
+
+def conf():
+    return settings.VISITOR_IDS
+
+
+def ip_prefix(ip):
+    """The network part of `ip` that identifies a visitor ('' if invalid)."""
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        return ''
+    if address.version == 6 and address.ipv4_mapped:
+        address = address.ipv4_mapped
+    prefix = conf()['IPV4_PREFIX'] if address.version == 4 else conf()['IPV6_PREFIX']
+    return str(ipaddress.ip_network(f'{address}/{prefix}', strict=False))
+
+
+def _digest(day, value):
+    return salted_hmac(f'blogs.visitor_id:{day.isoformat()}', value, algorithm='sha256').hexdigest()[:32]
+
+
+def compute(ip, user_agent, now=None):
+    """VisitorIds for a client address and User-Agent at `now`."""
+    now = now or timezone.now()
+    if timezone.is_aware(now):
+        now = now.astimezone(dt_timezone.utc)
+    day = now.date()
+    visitor_id = 'v' + _digest(day, f'{ip_prefix(ip)}|{user_agent}')
+
+    # Offset the buckets per visitor, so sessions do not all split at the same minute
+    session_minutes = conf()['SESSION_MINUTES']
+    minutes = now.hour * 60 + now.minute
+    bucket = (minutes + int(visitor_id[1:5], 16) % session_minutes) // session_minutes
+    session_id = 's' + _digest(day, f'{visitor_id}|{bucket}')
+    return VisitorIds(visitor_id, session_id)
+
+
+def visitor_ids(request):
+    """VisitorIds for `request`, computed once per request."""
+    ids = getattr(request, '_visitor_ids', None)
+    if ids is None:
+        ids = compute(get_client_ip(request), request.META.get('HTTP_USER_AGENT', ''))
+        request._visitor_ids = ids
+    return ids
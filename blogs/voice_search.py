@@ -1,17 +1,53 @@
 # blogs/voice_search.py
 import re
 import json
+import hashlib
 from collections import Counter
-from django.utils.html import strip_tags
+from django.conf import settings
 from django.template.loader import render_to_string
+from .document import Document, count_syllables
+
+# Bump when the analysis output changes so every stored VoiceAnalysis is recomputed
+VOICE_ANALYZER_VERSION = 2
+
+# Patterns are compiled once per process instead of on every analysis
+FAQ_RE = re.compile(
+    r'(?:^|\n)(?:Q:|Question:|Query:|\d+\.)\s*([^?\n]*\?)\s*(?:\n|$)(?:A:|Answer:|Response:)?\s*([^\n]+(?:\n[^\n]+)*?)(?=\n(?:Q:|Question:|Query:|\d+\.)|$)',
+    re.MULTILINE | re.IGNORECASE,
+)
+VOICE_PATTERNS = [
+    # Question patterns
+    re.compile(r'\b(?:what|how|why|when|where|who|which)\s+(?:is|are|do|does|can|will|would|should)\b.*?[.?!]', re.IGNORECASE),
+    # Local search patterns
+    re.compile(r'\b(?:near me|nearby|close to|in my area|local)\b', re.IGNORECASE),
+    # Action patterns
+    re.compile(r'\b(?:how to|ways to|steps to|guide to|tutorial)\b', re.IGNORECASE),
+    # Comparison patterns
+    re.compile(r'\b(?:best|top|compare|vs|versus|better than|alternatives to)\b', re.IGNORECASE),
+]
+DEFINITION_PATTERNS = [
+    re.compile(r'(?:is|are|means|refers to|defined as|known as)\s+([^.!?]+[.!?])', re.IGNORECASE),
+    re.compile(r'(\w+)\s+(?:is|are)\s+(?:a|an|the)?\s*([^.!?]+[.!?])', re.IGNORECASE),
+]
+LIST_PATTERNS = [
+    re.compile(r'(?:^|\n)(?:\d+\.|[-*•])\s+([^\n]+)', re.MULTILINE | re.IGNORECASE),  # Numbered or bulleted lists
+    re.compile(r'(?:first|second|third|fourth|fifth|next|finally),?\s+([^.!?]+[.!?])', re.MULTILINE | re.IGNORECASE),  # Sequential items
+]
+COMPARISON_RE = re.compile(r'([A-Z][^.!?]*(?:vs|versus|compared to)[^.!?]*[.!?])')
+STEP_PATTERNS = [
+    re.compile(r'(?:step\s*\d+:?|first|second|third|fourth|fifth|next|finally)[:\s]*([^.!?]+[.!?])', re.MULTILINE | re.IGNORECASE),
+    re.compile(r'(?:^|\n)\d+\.\s*([^\n]+)', re.MULTILINE | re.IGNORECASE),
+]
 
 class VoiceSearchOptimizer:
     """Voice search optimization and featured snippet preparation"""
     
-    def __init__(self, blog_post):
+    def __init__(self, blog_post, document=None):
         self.post = blog_post
-        self.content = strip_tags(blog_post.blog_body)
+        self.document = document or Document.for_post(blog_post)
+        self.content = self.document.text
         self.title = blog_post.title
+        self._qa_pairs = None  # Used by both the analysis and the FAQ schema
         
     def analyze_voice_readiness(self):
         """Comprehensive voice search readiness analysis"""
@@ -52,11 +88,12 @@ class VoiceSearchOptimizer:
     
     def _extract_question_answers(self):
         """Extract question-answer pairs for voice search"""
+        if self._qa_pairs is not None:
+            return self._qa_pairs
         qa_pairs = []
         
         # Find FAQ-style content
-        faq_pattern = r'(?:^|\n)(?:Q:|Question:|Query:|\d+\.)\s*([^?\n]*\?)\s*(?:\n|$)(?:A:|Answer:|Response:)?\s*([^\n]+(?:\n[^\n]+)*?)(?=\n(?:Q:|Question:|Query:|\d+\.)|$)'
-        faq_matches = re.findall(faq_pattern, self.content, re.MULTILINE | re.IGNORECASE)
+        faq_matches = FAQ_RE.findall(self.content)
         
         for question, answer in faq_matches:
             qa_pairs.append({
@@ -78,6 +115,7 @@ class VoiceSearchOptimizer:
                         'type': 'header_based'
                     })
         
+        self._qa_pairs = qa_pairs
         return qa_pairs
     
     def _calculate_conversational_score(self):
@@ -92,13 +130,14 @@ class VoiceSearchOptimizer:
         
         # Personal pronouns (you, we, I, etc.)
         personal_pronouns = ['you', 'your', 'we', 'our', 'us', 'i', 'my', 'me']
-        content_words = self.content.lower().split()
-        pronoun_count = sum(1 for word in content_words if word in personal_pronouns)
+        content_words = self.document.lower_words
+        counts = self.document.word_counts
+        pronoun_count = sum(counts[word] for word in personal_pronouns)
         score_factors['personal_pronouns'] = min(pronoun_count / len(content_words) * 100, 10)
         
         # Question words
         question_words = ['what', 'how', 'why', 'when', 'where', 'who', 'which']
-        question_count = sum(1 for word in content_words if word in question_words)
+        question_count = sum(counts[word] for word in question_words)
         score_factors['question_words'] = min(question_count / len(content_words) * 200, 15)
         
         # Conversational phrases
@@ -106,7 +145,7 @@ class VoiceSearchOptimizer:
             'let me', 'you should', 'here\'s how', 'the thing is', 'believe it or not',
             'to be honest', 'in my opinion', 'as you can see', 'simply put', 'in other words'
         ]
-        content_lower = self.content.lower()
+        content_lower = self.document.lower_text
         phrase_count = sum(1 for phrase in conversational_phrases if phrase in content_lower)
         score_factors['conversational_phrases'] = min(phrase_count * 5, 20)
         
@@ -114,15 +153,14 @@ class VoiceSearchOptimizer:
         natural_starters = [
             'now', 'so', 'well', 'also', 'plus', 'however', 'meanwhile', 'furthermore'
         ]
-        sentences = self.content.split('.')
+        sentences = self.document.sentences
         starter_count = sum(1 for sentence in sentences 
                           if any(sentence.strip().lower().startswith(starter) 
                                 for starter in natural_starters))
-        score_factors['sentence_starters'] = min(starter_count / len(sentences) * 50, 15)
+        score_factors['sentence_starters'] = min(starter_count / len(sentences) * 50, 15) if sentences else 0
         
         # Readability for voice (simpler is better for voice)
-        from textstat import flesch_reading_ease
-        flesch_score = flesch_reading_ease(self.content)
+        flesch_score = self.document.flesch_reading_ease
         if flesch_score >= 80:
             score_factors['readability'] = 20
         elif flesch_score >= 70:
@@ -214,26 +252,14 @@ class VoiceSearchOptimizer:
     
     def _identify_voice_keywords(self):
         """Identify keywords that are likely to be used in voice search"""
-        voice_patterns = [
-            # Question patterns
-            r'\b(?:what|how|why|when|where|who|which)\s+(?:is|are|do|does|can|will|would|should)\b.*?[.?!]',
-            # Local search patterns
-            r'\b(?:near me|nearby|close to|in my area|local)\b',
-            # Action patterns
-            r'\b(?:how to|ways to|steps to|guide to|tutorial)\b',
-            # Comparison patterns
-            r'\b(?:best|top|compare|vs|versus|better than|alternatives to)\b',
-        ]
-        
         voice_keywords = []
-        content_lower = self.content.lower()
+        content_lower = self.document.lower_text
         
-        for pattern in voice_patterns:
-            matches = re.findall(pattern, content_lower, re.IGNORECASE)
-            voice_keywords.extend(matches)
+        for pattern in VOICE_PATTERNS:
+            voice_keywords.extend(pattern.findall(content_lower))
         
         # Extract long-tail keywords (3+ words)
-        words = content_lower.split()
+        words = self.document.lower_words
         long_tail_phrases = []
         for i in range(len(words) - 2):
             phrase = ' '.join(words[i:i+3])
@@ -253,7 +279,7 @@ class VoiceSearchOptimizer:
     
     def _analyze_voice_readability(self):
         """Analyze readability specifically for voice search"""
-        sentences = self.content.split('.')
+        sentences = self.document.sentences
         
         analysis = {
             'avg_sentence_length': 0,
@@ -269,9 +295,11 @@ class VoiceSearchOptimizer:
             analysis['avg_sentence_length'] = total_words / len(sentences)
             
             # Complex words (3+ syllables)
-            words = self.content.lower().split()
-            complex_words = [word for word in words if self._count_syllables(word) >= 3]
-            analysis['complex_words'] = len(complex_words)
+            words = self.document.lower_words
+            syllables = self.document.syllables
+            analysis['complex_words'] = sum(
+                count for word, count in self.document.word_counts.items() if syllables[word] >= 3
+            )
             
             # Passive voice detection (simplified)
             passive_indicators = ['was', 'were', 'been', 'being', 'is', 'are', 'am']
@@ -342,29 +370,18 @@ class VoiceSearchOptimizer:
     # Helper methods
     def _find_definition_paragraphs(self):
         """Find paragraphs that define concepts"""
-        definition_patterns = [
-            r'(?:is|are|means|refers to|defined as|known as)\s+([^.!?]+[.!?])',
-            r'(\w+)\s+(?:is|are)\s+(?:a|an|the)?\s*([^.!?]+[.!?])'
-        ]
-        
         definitions = []
-        for pattern in definition_patterns:
-            matches = re.findall(pattern, self.content, re.IGNORECASE)
-            definitions.extend(matches)
+        for pattern in DEFINITION_PATTERNS:
+            definitions.extend(pattern.findall(self.content))
         
         return definitions[:3]  # Return top 3
     
     def _find_list_content(self):
         """Find list-style content"""
         # Look for numbered lists or bullet points
-        list_patterns = [
-            r'(?:^|\n)(?:\d+\.|[-*•])\s+([^\n]+)',  # Numbered or bulleted lists
-            r'(?:first|second|third|fourth|fifth|next|finally),?\s+([^.!?]+[.!?])',  # Sequential items
-        ]
-        
         lists = []
-        for pattern in list_patterns:
-            matches = re.findall(pattern, self.content, re.MULTILINE | re.IGNORECASE)
+        for pattern in LIST_PATTERNS:
+            matches = pattern.findall(self.content)
             if matches:
                 lists.extend(matches[:5])  # Max 5 items
         
@@ -375,10 +392,9 @@ class VoiceSearchOptimizer:
         # This is simplified - you might want to parse actual HTML tables
         table_indicators = ['comparison', 'vs', 'versus', 'price', 'cost', 'features']
         
-        if any(indicator in self.content.lower() for indicator in table_indicators):
+        if any(indicator in self.document.lower_text for indicator in table_indicators):
             # Extract comparison-like content
-            comparison_pattern = r'([A-Z][^.!?]*(?:vs|versus|compared to)[^.!?]*[.!?])'
-            comparisons = re.findall(comparison_pattern, self.content)
+            comparisons = COMPARISON_RE.findall(self.content)
             return comparisons[:3]
         
         return []
@@ -393,7 +409,7 @@ class VoiceSearchOptimizer:
             'instructions'
         ]
         
-        content_lower = self.content.lower()
+        content_lower = self.document.lower_text
         return any(pattern in content_lower for pattern in how_to_patterns)
     
     def _score_snippet_content(self, content, snippet_type):
@@ -454,9 +470,7 @@ class VoiceSearchOptimizer:
     def _extract_content_headers(self):
         """Extract headers from the content"""
         # This assumes headers are marked in the original content
-        header_pattern = r'<h[1-6][^>]*>([^<]+)</h[1-6]>'
-        headers = re.findall(header_pattern, self.post.blog_body, re.IGNORECASE)
-        return [strip_tags(header).strip() for header in headers]
+        return [header.text for header in self.document.headers if header.text]
     
     def _get_content_after_header(self, header):
         """Get content that follows a specific header"""
@@ -484,37 +498,100 @@ class VoiceSearchOptimizer:
     
     def _extract_steps_from_content(self):
         """Extract step-by-step instructions"""
-        step_patterns = [
-            r'(?:step\s*\d+:?|first|second|third|fourth|fifth|next|finally)[:\s]*([^.!?]+[.!?])',
-            r'(?:^|\n)\d+\.\s*([^\n]+)',
-        ]
-        
         steps = []
-        for pattern in step_patterns:
-            matches = re.findall(pattern, self.content, re.MULTILINE | re.IGNORECASE)
-            steps.extend(matches)
+        for pattern in STEP_PATTERNS:
+            steps.extend(pattern.findall(self.content))
         
         return steps[:10]  # Max 10 steps
     
     def _count_syllables(self, word):
         """Simple syllable counting"""
-        word = word.lower()
-        vowels = 'aeiouy'
-        syllable_count = 0
-        prev_was_vowel = False
-        
-        for char in word:
-            if char in vowels:
-                if not prev_was_vowel:
-                    syllable_count += 1
-                prev_was_vowel = True
-            else:
-                prev_was_vowel = False
-        
-        # Handle silent 'e'
-        if word.endswith('e') and syllable_count > 1:
-            syllable_count -= 1
-        
-        return max(syllable_count, 1)
+        return count_syllables(word)
+
 
+# ----------------
+# Stored analysis
+# ----------------
+def voice_content_hash(post):
+    """Hash of everything analyze_voice_readiness() reads, plus the analyzer
+    version. Author and publish date are included because the schema embeds
+    them; updated_at is not, since every save changes it (see with_current_dates)."""
+    parts = [
+        str(VOICE_ANALYZER_VERSION), post.title or '', post.blog_body or '',
+        post.focus_keyword or '', post.get_meta_description() or '',
+        str(post.author_id), post.created_at.isoformat() if post.created_at else '',
+    ]
+    return hashlib.sha256('\x1f'.join(parts).encode()).hexdigest()
 
+
+def with_current_dates(report, post):
+    """`report` with the article schema's dateModified set from the post as
+    it is now, rather than when the report was computed."""
+    article = ((report or {}).get('schema_markup') or {}).get('article')
+    if article and post.updated_at:
+        article['dateModified'] = post.updated_at.isoformat()
+    return report
+
+
+def refresh_voice_analysis(post, force=False):
+    """Analyze `post` and store the report unless the stored one is current.
+    Returns the report dict."""
+    from .models import VoiceAnalysis
+
+    digest = voice_content_hash(post)
+    record = VoiceAnalysis.objects.filter(post_id=post.pk).first()
+    if record and not force and record.content_hash == digest:
+        return with_current_dates(record.analysis_data, post)
+
+    analysis = VoiceSearchOptimizer(post).analyze_voice_readiness()
+    VoiceAnalysis.objects.update_or_create(
+        post_id=post.pk,
+        defaults={
+            'analysis_data': analysis,
+            'overall_score': analysis['overall_voice_score'],
+            'content_hash': digest,
+            'analyzer_version': VOICE_ANALYZER_VERSION,
+        },
+    )
+    return analysis
+
+
+def get_voice_analysis(post, refresh=True):
+    """Stored report for `post`, for the request path. Missing or stale
+    reports are queued for the worker and the stale one (or None) is returned
+    meanwhile; without a worker it is recomputed inline once. refresh=False
+    returns whatever is stored without queueing anything."""
+    from .models import VoiceAnalysis
+    from .jobs import enqueue_job
+
+    record = (
+        VoiceAnalysis.objects.filter(post_id=post.pk)
+        .only('analysis_data', 'content_hash')
+        .first()
+    )
+    if record and record.content_hash == voice_content_hash(post):
+        return with_current_dates(record.analysis_data, post)
+    if not refresh:
+        return with_current_dates(record.analysis_data, post) if record else None
+
+    if not settings.BACKGROUND_JOBS['ASYNC']:
+        return refresh_voice_analysis(post)
+
+    enqueue_job(post, 'voice_analysis')
+    return with_current_dates(record.analysis_data, post) if record else None
+
+
+def refresh_voice_batch(post_ids, force=False):
+    """Recompute a batch of posts. Runs in run_worker-style spawned processes
+    (see the analyze_voice command); returns (refreshed, failed) counts."""
+    from .models import Blog
+
+    refreshed = failed = 0
+    for post in Blog.objects.select_related('author').filter(pk__in=post_ids):
+        try:
+            refresh_voice_analysis(post, force=force)
+            refreshed += 1
+        except Exception as e:
+            print(f"[Voice analysis error] post {post.pk}: {e}")
+            failed += 1
+    return refreshed, failed
@@ -1,5 +1,5 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from blogs.models import Blog, Category
+from blogs.models import Blog, Category, html_to_text
 from django.contrib.auth.decorators import login_required,  user_passes_test
 from . forms import BlogPostForm, CategoryForm, AddUserForm, EditUserForm
 from django.template.defaultfilters import slugify
@@ -14,7 +14,7 @@ from django.core.cache import cache
 from django.views.decorators.cache import never_cache
 from django.utils.decorators import method_decorator
 from ads.models import Advertisement, AdPosition
-from blogs.ai_content import AIContentIntelligence
+from blogs.ai_content import AIContentIntelligence, refresh_content_analysis
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 import json
@@ -218,8 +218,7 @@ def add_post(request):
             
             # Run AI analysis after saving
             try:
-                ai_analyzer = AIContentIntelligence(post)
-                ai_analysis = ai_analyzer.analyze_content()
+                ai_analysis = dict(refresh_content_analysis(post))
                 # Store analysis in session
                 #request.session['ai_analysis'] = ai_analysis
 
@@ -268,9 +267,8 @@ def edit_post(request, pk):
     post = get_object_or_404(Blog, pk=pk)
     was_published = getattr(post, 'status', 'Draft') == 'Published'
 
-    # Run AI analysis on existing content
-    ai_analyzer = AIContentIntelligence(post)
-    ai_analysis = ai_analyzer.analyze_content()
+    # Stored AI analysis; only recomputed if the content changed
+    ai_analysis = dict(refresh_content_analysis(post))
 
     # OPTIONAL: Run link building analysis
     link_builder = AILinkBuilder()
@@ -346,6 +344,9 @@ def analyze_content_ajax(request):
                     
                 def get_meta_description(self):
                     return data.get('meta_description', '')
+
+                def get_plain_text(self):
+                    return html_to_text(self.blog_body)
             
             temp_post = TempPost(
                 title=data.get('title', ''),
@@ -374,8 +375,7 @@ def analyze_existing_post(request, post_id):
     """Analyze an existing post and return results"""
     post = get_object_or_404(Blog, id=post_id)
     
-    ai_analyzer = AIContentIntelligence(post)
-    analysis = ai_analyzer.analyze_content()
+    analysis = refresh_content_analysis(post)
     
     return JsonResponse({ 
         'success': True,
@@ -1,54 +1,34 @@
 class AnalyticsManager {
     constructor() {
-        this.sessionId = this.generateSessionId();
-        this.userId = this.getUserId();
         this.startTime = Date.now();
         this.maxScroll = 0;
         this.events = [];
+        this.vitals = {};
+        this.finalReported = false;
+        const target = document.querySelector('[data-analytics-object]');
+        this.contentRef = target ? target.dataset.analyticsObject : null;
         
         this.init();
     }
 
     init() {
-        this.trackPageView();
+        // Page views are recorded server-side; everything else is queued and
+        // sent in one beacon when the page is hidden. The server derives the
+        // visitor and session ids, so nothing is stored in the browser.
         this.setupScrollTracking();
-        this.setupTimeTracking();
         this.setupCoreWebVitals();
         this.setupInteractionTracking();
         this.setupPerformanceTracking();
-    }
-
-    trackPageView() {
-        this.trackEvent('page_view', {
-            url: window.location.href,
-            title: document.title,
-            referrer: document.referrer
-        });
+        this.setupBeacon();
     }
 
     setupScrollTracking() {
         let ticking = false;
         
         const updateScrollDepth = () => {
-            const scrolled = window.pageYOffset;
             const totalHeight = document.documentElement.scrollHeight - window.innerHeight;
-            const scrollPercent = Math.round((scrolled / totalHeight) * 100);
-            
-            if (scrollPercent > this.maxScroll) {
-                this.maxScroll = scrollPercent;
-                
-                // Track significant scroll milestones
-                if (scrollPercent >= 25 && this.maxScroll < 25) {
-                    this.trackEvent('scroll_depth', { depth: 25 });
-                } else if (scrollPercent >= 50 && this.maxScroll < 50) {
-                    this.trackEvent('scroll_depth', { depth: 50 });
-                } else if (scrollPercent >= 75 && this.maxScroll < 75) {
-                    this.trackEvent('scroll_depth', { depth: 75 });
-                } else if (scrollPercent >= 90 && this.maxScroll < 90) {
-                    this.trackEvent('scroll_depth', { depth: 90 });
-                }
-            }
-            
+            const scrollPercent = totalHeight > 0 ? Math.round((window.pageYOffset / totalHeight) * 100) : 100;
+            this.maxScroll = Math.max(this.maxScroll, Math.min(scrollPercent, 100));
             ticking = false;
         };
 
@@ -57,60 +37,47 @@ class AnalyticsManager {
                 requestAnimationFrame(updateScrollDepth);
                 ticking = true;
             }
-        });
+        }, { passive: true });
     }
 
-    setupTimeTracking() {
-        // Track time on page when user leaves
-        const trackTimeOnPage = () => {
-            const duration = Date.now() - this.startTime;
-            this.trackEvent('time_on_page', { duration: Math.round(duration / 1000) });
-        };
-
-        window.addEventListener('beforeunload', trackTimeOnPage);
-        
-        // Also track at intervals for active users
-        setInterval(() => {
-            if (document.visibilityState === 'visible') {
-                const duration = Date.now() - this.startTime;
-                this.trackEvent('time_on_page', { duration: Math.round(duration / 1000) });
+    setupCoreWebVitals() {
+        const observe = (type, callback) => {
+            try {
+                new PerformanceObserver((entryList) => callback(entryList.getEntries()))
+                    .observe({ type: type, buffered: true });
+            } catch (e) {
+                // Entry type not supported by this browser
             }
-        }, 30000); // Every 30 seconds
-    }
+        };
 
-    setupCoreWebVitals() {
-        // Largest Contentful Paint
-        new PerformanceObserver((entryList) => {
-            const entries = entryList.getEntries();
-            const lastEntry = entries[entries.length - 1];
-            this.trackCoreWebVital('lcp', lastEntry.startTime);
-        }).observe({ entryTypes: ['largest-contentful-paint'] });
+        // Largest Contentful Paint (seconds)
+        observe('largest-contentful-paint', (entries) => {
+            this.vitals.lcp = entries[entries.length - 1].startTime / 1000;
+        });
 
-        // First Input Delay
-        new PerformanceObserver((entryList) => {
-            const firstInput = entryList.getEntries()[0];
-            this.trackCoreWebVital('fid', firstInput.processingStart - firstInput.startTime);
-        }).observe({ entryTypes: ['first-input'] });
+        // First Input Delay (milliseconds)
+        observe('first-input', (entries) => {
+            this.vitals.fid = entries[0].processingStart - entries[0].startTime;
+        });
 
         // Cumulative Layout Shift
         let clsValue = 0;
-        new PerformanceObserver((entryList) => {
-            for (const entry of entryList.getEntries()) {
+        observe('layout-shift', (entries) => {
+            for (const entry of entries) {
                 if (!entry.hadRecentInput) {
                     clsValue += entry.value;
                 }
             }
-            this.trackCoreWebVital('cls', clsValue);
-        }).observe({ entryTypes: ['layout-shift'] });
+            this.vitals.cls = clsValue;
+        });
 
-        // First Contentful Paint
-        new PerformanceObserver((entryList) => {
-            const entries = entryList.getEntries();
+        // First Contentful Paint (seconds)
+        observe('paint', (entries) => {
             const fcp = entries.find(entry => entry.name === 'first-contentful-paint');
             if (fcp) {
-                this.trackCoreWebVital('fcp', fcp.startTime);
+                this.vitals.fcp = fcp.startTime / 1000;
             }
-        }).observe({ entryTypes: ['paint'] });
+        });
     }
 
     setupInteractionTracking() {
@@ -120,22 +87,12 @@ class AnalyticsManager {
             if (link) {
                 this.trackEvent('link_clicked', {
                     url: link.href,
-                    text: link.textContent.trim(),
+                    text: link.textContent.trim().slice(0, 100),
                     internal: link.hostname === window.location.hostname
                 });
             }
         });
 
-        // Track form submissions
-        document.addEventListener('submit', (e) => {
-            const form = e.target;
-            this.trackEvent('form_submitted', {
-                form_id: form.id,
-                form_class: form.className,
-                action: form.action
-            });
-        });
-
         // Track comment posting
         const commentForms = document.querySelectorAll('.comment-form');
         commentForms.forEach(form => {
@@ -149,103 +106,60 @@ class AnalyticsManager {
 
     setupPerformanceTracking() {
         window.addEventListener('load', () => {
-            setTimeout(() => {
-                const navTiming = performance.getEntriesByType('navigation')[0];
-                
-                this.trackEvent('performance_metrics', {
-                    dom_content_loaded: navTiming.domContentLoadedEventEnd - navTiming.navigationStart,
-                    load_complete: navTiming.loadEventEnd - navTiming.navigationStart,
-                    ttfb: navTiming.responseStart - navTiming.requestStart,
-                    dns_lookup: navTiming.domainLookupEnd - navTiming.domainLookupStart,
-                    connection_time: navTiming.connectEnd - navTiming.connectStart
-                });
-            }, 1000);
+            const navTiming = performance.getEntriesByType('navigation')[0];
+            if (navTiming) {
+                // Time to First Byte (seconds)
+                this.vitals.ttfb = navTiming.responseStart / 1000;
+            }
         });
     }
 
-    trackCoreWebVital(metric, value) {
-        fetch('/api/analytics/core-web-vitals/', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-                'X-CSRFToken': this.getCSRFToken()
-            },
-            body: JSON.stringify({
-                url: window.location.href,
-                session_id: this.sessionId,
-                [metric]: value,
-                device_type: this.getDeviceType(),
-                connection_type: this.getConnectionType()
-            })
-        }).catch(() => {}); // Fail silently
+    setupBeacon() {
+        // visibilitychange is the last event reliably delivered on mobile;
+        // pagehide covers browsers that skip it on unload.
+        document.addEventListener('visibilitychange', () => {
+            if (document.visibilityState === 'hidden') {
+                this.flush();
+            }
+        });
+        window.addEventListener('pagehide', () => this.flush());
     }
 
     trackEvent(eventType, eventData = {}) {
-        const event = {
-            event_type: eventType,
-            session_id: this.sessionId,
-            user_id: this.userId,
-            event_data: eventData,
-            timestamp: new Date().toISOString(),
-            url: window.location.href
-        };
-
-        // Store locally and send in batches
-        this.events.push(event);
-        
-        if (this.events.length >= 10 || eventType === 'page_view') {
-            this.sendEvents();
-        }
-    }
-
-    sendEvents() {
-        if (this.events.length === 0) return;
-
-        fetch('/api/analytics/events/', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-                'X-CSRFToken': this.getCSRFToken()
-            },
-            body: JSON.stringify({ events: this.events })
-        }).then(() => {
-            this.events = [];
-        }).catch(() => {
-            // Keep events for retry
-        });
+        this.events.push([eventType, Date.now(), eventData]);
     }
 
-    generateSessionId() {
-        return Date.now().toString(36) + Math.random().toString(36).substr(2);
-    }
+    flush() {
+        const page = {
+            url: window.location.href,
+            o: this.contentRef,
+            c: this.getConnectionType(),
+            e: this.events
+        };
 
-    getUserId() {
-        let userId = localStorage.getItem('analytics_user_id');
-        if (!userId) {
-            userId = 'user_' + Date.now().toString(36) + Math.random().toString(36).substr(2);
-            localStorage.setItem('analytics_user_id', userId);
+        // Reading time, scroll depth and Web Vitals are final the first time
+        // the page is hidden; later flushes only carry new interactions.
+        if (!this.finalReported) {
+            this.finalReported = true;
+            page.e.push(['time_on_page', Date.now(), { duration: Math.round((Date.now() - this.startTime) / 1000) }]);
+            page.e.push(['scroll_depth', Date.now(), { depth: this.maxScroll }]);
+            page.w = this.vitals;
+        } else if (page.e.length === 0) {
+            return;
         }
-        return userId;
-    }
 
-    getDeviceType() {
-        const userAgent = navigator.userAgent.toLowerCase();
-        if (/mobile|android|iphone|ipad|phone/i.test(userAgent)) {
-            return 'mobile';
-        } else if (/tablet|ipad/i.test(userAgent)) {
-            return 'tablet';
+        this.events = [];
+        const body = JSON.stringify([page]);
+        // text/plain keeps sendBeacon a "simple" request (no CORS preflight)
+        const blob = new Blob([body], { type: 'text/plain' });
+        if (!(navigator.sendBeacon && navigator.sendBeacon('/api/analytics/beacon/', blob))) {
+            fetch('/api/analytics/beacon/', { method: 'POST', body: body, keepalive: true }).catch(() => {});
         }
-        return 'desktop';
     }
 
     getConnectionType() {
         return navigator.connection ? navigator.connection.effectiveType : 'unknown';
     }
-
-    getCSRFToken() {
-        const token = document.querySelector('[name=csrfmiddlewaretoken]');
-        return token ? token.value : '';
-    }
 }
 
 // Initialize analytics